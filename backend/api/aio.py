@@ -0,0 +1,142 @@
+"""
+Асинхронная точка входа API с тем же контрактом event → response, что и index.handler.
+Маршруты с несколькими запросами работают на psycopg 3 через общий AsyncConnectionPool:
+независимые чтения уходят одним пакетом в режиме pipeline. Остальные маршруты выполняет
+синхронный dispatch в потоке. Пул живёт в цикле событий модуля и переживает тёплые вызовы.
+Соединения пула в autocommit: запрос из одного оператора не тратит круги на BEGIN и COMMIT,
+транзакция открывается явно только там, где операторов несколько.
+    handler: aio.handler (синхронная обёртка) или await aio.async_handler(event, context)
+"""
+import asyncio
+import atexit
+import os
+
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from db import POOL_MAX_SIZE, POOL_MAX_LIFETIME
+from index import (
+    ADD_BOTS_SQL, JOIN_ROOM_SQL, LOCK_ROOM_FOR_START_SQL, ROOM_PLAYERS_SQL, ROOM_SQL, START_GAME_SQL,
+    add_bots_args, add_bots_response, internal_error, join_room_args, join_room_response, room_info_response,
+    start_game_args,
+)
+from responses import PREFLIGHT_RESPONSE, error_response, json_response
+from router import ASYNC_ROUTES, async_route, conditional, dispatch, parse
+
+_loop = asyncio.new_event_loop()
+_pool = None
+
+
+async def get_pool() -> AsyncConnectionPool:
+    """Пул асинхронных соединений; открывается при первом обращении к базе"""
+    global _pool
+    if _pool is None:
+        pool = AsyncConnectionPool(
+            os.environ['DATABASE_URL'],
+            min_size=1,
+            max_size=POOL_MAX_SIZE,
+            max_lifetime=POOL_MAX_LIFETIME,
+            kwargs={'row_factory': dict_row, 'autocommit': True},
+            open=False,
+        )
+        await pool.open()
+        _pool = pool
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+atexit.register(lambda: _loop.run_until_complete(close_pool()))
+
+
+def handler(event: dict, context) -> dict:
+    """Синхронная обёртка для платформы: запрос выполняется в постоянном цикле событий модуля"""
+    return _loop.run_until_complete(async_handler(event, context))
+
+
+async def async_handler(event: dict, context) -> dict:
+    if event.get('httpMethod', 'GET') == 'OPTIONS':
+        return PREFLIGHT_RESPONSE
+
+    try:
+        return await dispatch_async(event)
+    except Exception:
+        return internal_error(event, context)
+
+
+async def dispatch_async(event: dict) -> dict:
+    """Асинхронный маршрут, если он есть; иначе синхронный dispatch в потоке, не блокируя цикл"""
+    query = event.get('queryStringParameters') or {}
+    if (event.get('httpMethod', 'GET'), query.get('path', '')) not in ASYNC_ROUTES:
+        return await asyncio.to_thread(dispatch, event)
+
+    func, params = parse(event, ASYNC_ROUTES)
+    if func is None:
+        return params
+    return conditional(event, await func(params))
+
+
+@async_route('GET', 'room/info')
+async def get_room_info(params: dict) -> dict:
+    """Комната и игроки: оба чтения одним пакетом pipeline за один сетевой круг"""
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        async with conn.pipeline():
+            room_cur = await conn.execute(ROOM_SQL, (params['id'],))
+            players_cur = await conn.execute(ROOM_PLAYERS_SQL, (params['id'],))
+        room = await room_cur.fetchone()
+        players = await players_cur.fetchall()
+    return room_info_response(room, players)
+
+
+@async_route('POST', 'room/join')
+async def join_room(params: dict) -> dict:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(JOIN_ROOM_SQL, join_room_args(params))
+        room = await cur.fetchone()
+    return join_room_response(room)
+
+
+@async_route('POST', 'room/add-bot')
+async def add_bot_to_room(params: dict) -> dict:
+    try:
+        args = add_bots_args(params)
+    except (TypeError, ValueError):
+        return error_response(400, 'Invalid count')
+
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(ADD_BOTS_SQL, args)
+        room = await cur.fetchone()
+    return add_bots_response(room)
+
+
+@async_route('POST', 'game/start')
+async def start_game(params: dict) -> dict:
+    """
+    Блокировка комнаты и назначение ролей в одной транзакции за два сетевых круга:
+    BEGIN уходит одним пакетом с чтением под FOR UPDATE, COMMIT - вместе с записью ролей.
+    """
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        async with conn.pipeline() as pipeline:
+            await conn.execute("BEGIN")
+            cur = await conn.execute(LOCK_ROOM_FOR_START_SQL, (params['room_id'],))
+            await pipeline.sync()
+            error, args = start_game_args(params['room_id'], await cur.fetchone())
+            if error:
+                await conn.execute("ROLLBACK")
+                return error
+
+            cur = await conn.execute(START_GAME_SQL, args)
+            await conn.execute("COMMIT")
+        if await cur.fetchone() is None:
+            return error_response(400, 'Game already started or finished')
+
+    return json_response(200, {'success': True, 'message': f"Game started with {len(args['roles'])} players"})
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHES = {}
+
+
+class TTLCache:
+    """Кэш в памяти процесса: время жизни записей и вытеснение по LRU"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl
+        }
+
+
+leaderboard_cache = TTLCache('leaderboard', float(os.environ.get('LEADERBOARD_CACHE_TTL', '30')), 64)
+achievements_cache = TTLCache('achievements', float(os.environ.get('ACHIEVEMENTS_CACHE_TTL', '3600')), 1)
+user_achievements_cache = TTLCache(
+    'user_achievements',
+    float(os.environ.get('USER_ACHIEVEMENTS_CACHE_TTL', '60')),
+    int(os.environ.get('USER_ACHIEVEMENTS_CACHE_SIZE', '1024'))
+)
+
+
+def invalidate_game_results(user_ids) -> None:
+    """Хук для записи итогов игры: сбрасывает кэши, зависящие от статистики игроков"""
+    leaderboard_cache.clear()
+    for user_id in user_ids:
+        user_achievements_cache.delete(str(user_id))
+
+
+def cache_stats() -> dict:
+    """Счётчики попаданий и промахов всех кэшей"""
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -0,0 +1,243 @@
+"""
+Игровой движок Мафии: фазы ночь → день → голосование и разрешение действий ролей.
+Модуль не обращается к базе данных: на вход состояние комнаты и действия фазы,
+на выход переходы, которые нужно сохранить.
+"""
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+
+NEXT_PHASE = {'night': 'day', 'day': 'voting', 'voting': 'night'}
+PHASE_SECONDS = {'night': 60, 'day': 120, 'voting': 60}
+MAX_ROUNDS = 30
+
+FACTIONS = {
+    'mafia': 'mafia',
+    'lawyer': 'mafia',
+    'maniac': 'maniac',
+    'suicide': 'suicide',
+}
+
+NIGHT_ACTIONS = {
+    'mafia': 'kill',
+    'maniac': 'maniac_kill',
+    'doctor': 'heal',
+    'commissar': 'check',
+    'sergeant': 'check',
+    'prostitute': 'visit',
+    'lawyer': 'defend',
+    'homeless': 'watch',
+    'kamikaze': 'blast',
+}
+
+
+def faction_of(role: str) -> str:
+    return FACTIONS.get(role, 'town')
+
+
+@dataclass(slots=True)
+class GameState:
+    """Компактное состояние комнаты: порядок мест, роли, живые игроки"""
+    room_id: int
+    phase: str
+    round: int
+    seats: list
+    roles: dict
+    alive: set
+    luck_used: set = field(default_factory=set)
+    winner: str | None = None
+
+
+@dataclass(slots=True)
+class PhaseResult:
+    """Переходы после разрешения фазы"""
+    phase: str
+    round: int
+    deaths: list = field(default_factory=list)
+    luck_used: list = field(default_factory=list)
+    log: list = field(default_factory=list)
+    lynched: int | None = None
+    winner: str | None = None
+
+
+def load_state(room_id: int, phase: str, round_number: int, players: list[dict]) -> GameState:
+    """Состояние из строк room_players в порядке мест"""
+    return GameState(
+        room_id=room_id,
+        phase=phase,
+        round=round_number,
+        seats=[p['user_id'] for p in players],
+        roles={p['user_id']: p['role'] for p in players},
+        alive={p['user_id'] for p in players if p['is_alive']},
+        luck_used={p['user_id'] for p in players if p.get('luck_used')},
+    )
+
+
+def check_winner(state: GameState) -> str | None:
+    """Победитель по живым игрокам или None, если игра продолжается"""
+    mafia = maniac = 0
+    for user_id in state.alive:
+        faction = faction_of(state.roles[user_id])
+        if faction == 'mafia':
+            mafia += 1
+        elif faction == 'maniac':
+            maniac += 1
+
+    alive = len(state.alive)
+    if maniac and alive <= 2:
+        return 'maniac'
+    if not mafia and not maniac:
+        return 'town'
+    if mafia and not maniac and mafia >= alive - mafia:
+        return 'mafia'
+    return None
+
+
+def _effective_actions(state: GameState, actions, expected) -> dict:
+    """Последнее допустимое действие каждого живого игрока против живой цели"""
+    effective = {}
+    for actor, action_type, target in actions:
+        if actor not in state.alive or target not in state.alive or actor == target:
+            continue
+        if expected(state.roles[actor]) != action_type:
+            continue
+        effective[actor] = (action_type, target)
+    return effective
+
+
+def _mafia_target(state: GameState, kills: dict) -> int | None:
+    """Жертва мафии по большинству голосов; ничья решается по старшему по месту мафиози"""
+    votes = Counter(target for _, target in kills.values())
+    if not votes:
+        return None
+    best = max(votes.values())
+    for user_id in state.seats:
+        if user_id in kills and votes[kills[user_id][1]] == best:
+            return kills[user_id][1]
+    return None
+
+
+def _resolve_night(state: GameState, actions, result: PhaseResult) -> None:
+    effective = _effective_actions(state, actions, NIGHT_ACTIONS.get)
+
+    blocked = {target for action_type, target in effective.values() if action_type == 'visit'}
+    effective = {a: act for a, act in effective.items() if a not in blocked or act[0] == 'visit'}
+
+    by_type = {}
+    for actor, (action_type, target) in effective.items():
+        by_type.setdefault(action_type, {})[actor] = (action_type, target)
+
+    healed = {t for _, t in by_type.get('heal', {}).values()}
+    defended = {t for _, t in by_type.get('defend', {}).values()}
+
+    commissar_alive = any(state.roles[u] == 'commissar' for u in state.alive)
+    for actor, (_, target) in by_type.get('check', {}).items():
+        if state.roles[actor] == 'sergeant' and commissar_alive:
+            continue
+        is_mafia = faction_of(state.roles[target]) == 'mafia' and target not in defended
+        result.log.append((actor, target, 'reveal_mafia' if is_mafia else 'reveal_innocent'))
+
+    attempts = []
+    kills = by_type.get('kill', {})
+    victim = _mafia_target(state, kills)
+    if victim is not None:
+        attempts.append(([a for a, (_, t) in kills.items() if t == victim], victim))
+    for actor, (_, target) in by_type.get('maniac_kill', {}).items():
+        attempts.append(([actor], target))
+
+    deaths = []
+    for killers, target in attempts:
+        if target in healed or target in deaths:
+            continue
+        if state.roles[target] == 'lucky' and target not in state.luck_used:
+            state.luck_used.add(target)
+            result.luck_used.append(target)
+            continue
+        deaths.append(target)
+        result.log.extend((killer, target, 'killed') for killer in killers)
+
+    for actor, (_, target) in by_type.get('blast', {}).items():
+        if faction_of(state.roles[target]) == 'mafia':
+            for user_id in (target, actor):
+                if user_id not in deaths:
+                    deaths.append(user_id)
+            result.log.append((actor, target, 'killed'))
+
+    for actor, (_, target) in by_type.get('watch', {}).items():
+        for visitor, (_, visited) in effective.items():
+            if visited == target and visitor != actor:
+                result.log.append((actor, visitor, 'witnessed'))
+
+    result.deaths.extend(deaths)
+
+
+def _resolve_voting(state: GameState, actions, result: PhaseResult) -> None:
+    votes = _effective_actions(state, actions, lambda role: 'vote')
+    tally = Counter(target for _, target in votes.values()).most_common(2)
+    if not tally or (len(tally) == 2 and tally[0][1] == tally[1][1]):
+        return
+
+    lynched = tally[0][0]
+    result.lynched = lynched
+    result.deaths.append(lynched)
+    if state.roles[lynched] == 'suicide':
+        result.winner = 'suicide'
+
+
+def resolve_phase(state: GameState, actions) -> PhaseResult:
+    """
+    Разрешение текущей фазы за O(игроков + действий) и переход к следующей.
+    actions - последовательность (actor_id, action_type, target_id) в порядке поступления.
+    """
+    next_phase = NEXT_PHASE[state.phase]
+    next_round = state.round + 1 if next_phase == 'night' else state.round
+    result = PhaseResult(phase=next_phase, round=next_round)
+
+    if state.phase == 'night':
+        _resolve_night(state, actions, result)
+    elif state.phase == 'voting':
+        _resolve_voting(state, actions, result)
+
+    state.alive.difference_update(result.deaths)
+    result.winner = result.winner or check_winner(state)
+    if result.winner is None and next_round > MAX_ROUNDS:
+        result.winner = 'draw'
+
+    if result.winner is not None:
+        result.phase = 'finished'
+    state.phase, state.round, state.winner = result.phase, result.round, result.winner
+    return result
+
+
+def awaiting_actors(state: GameState, actions, user_ids) -> set:
+    """Живые игроки из user_ids, от которых в текущей фазе ждут действия, но его ещё нет; днём - никто"""
+    if state.phase == 'day':
+        return set()
+    acted = {actor for actor, _, _ in actions}
+    return {user_id for user_id in user_ids
+            if user_id in state.alive and user_id not in acted
+            and (state.phase == 'voting' or NIGHT_ACTIONS.get(state.roles[user_id]) is not None)}
+
+
+def bot_actions(state: GameState, bot_ids, rng: random.Random) -> list[tuple]:
+    """Случайные действия ботов в текущей фазе; мафия не выбирает своих"""
+    if state.phase == 'day':
+        return []
+
+    alive = [u for u in state.seats if u in state.alive]
+    actions = []
+    for bot_id in bot_ids:
+        if bot_id not in state.alive:
+            continue
+        role = state.roles[bot_id]
+        action_type = 'vote' if state.phase == 'voting' else NIGHT_ACTIONS.get(role)
+        if action_type is None:
+            continue
+        mafia = faction_of(role) == 'mafia'
+        if action_type == 'defend':
+            targets = [u for u in alive if u != bot_id and faction_of(state.roles[u]) == 'mafia']
+        else:
+            targets = [u for u in alive if u != bot_id and not (mafia and faction_of(state.roles[u]) == 'mafia')]
+        if targets:
+            actions.append((bot_id, action_type, rng.choice(targets)))
+    return actions
@@ -0,0 +1,122 @@
+"""
+Журнал событий партии: назначение ролей, действия фазы, исходы, смерти и смены фаз.
+Событие - запись фиксированной длины из малых целых кодов (EVENT, 13 байт), пачки событий
+одного запроса дописываются в game_events строкой BYTEA. Модуль не обращается к базе данных.
+Коды - индексы в кортежах ниже: новые значения добавляются только в конец.
+"""
+import struct
+from enum import IntEnum
+from typing import NamedTuple
+
+from engine import GameState
+
+PHASES = ('lobby', 'night', 'day', 'voting', 'finished')
+ROLES = ('citizen', 'mafia', 'lawyer', 'maniac', 'suicide', 'doctor', 'commissar',
+         'sergeant', 'prostitute', 'homeless', 'lucky', 'kamikaze')
+ACTIONS = ('unknown', 'vote', 'kill', 'maniac_kill', 'heal', 'check', 'visit', 'defend', 'watch', 'blast',
+           'killed', 'reveal_mafia', 'reveal_innocent', 'witnessed')
+WINNERS = ('town', 'mafia', 'maniac', 'suicide', 'draw')
+
+PHASE_CODE = {name: code for code, name in enumerate(PHASES)}
+ROLE_CODE = {name: code for code, name in enumerate(ROLES)}
+ACTION_CODE = {name: code for code, name in enumerate(ACTIONS)}
+WINNER_CODE = {name: code for code, name in enumerate(WINNERS)}
+
+# тип, фаза, круг, actor, target, аргумент (код роли, действия, победителя или причины смерти)
+EVENT = struct.Struct('<BBHiiB')
+
+DEATH_NIGHT, DEATH_LYNCH = 0, 1
+
+
+class EventType(IntEnum):
+    ROLE_ASSIGNED = 1
+    ACTION = 2
+    OUTCOME = 3
+    LUCK_USED = 4
+    DEATH = 5
+    PHASE = 6
+    GAME_OVER = 7
+
+
+class Event(NamedTuple):
+    type: int
+    phase: int
+    round: int
+    actor: int
+    target: int
+    arg: int
+
+
+def encode(events) -> bytes:
+    """Упаковка последовательности Event (или кортежей тех же полей) в байты"""
+    return b''.join(EVENT.pack(*event) for event in events)
+
+
+def decode(data: bytes) -> list[Event]:
+    return [Event(*fields) for fields in EVENT.iter_unpack(data)]
+
+
+def start_events(phase: str, round_number: int, seats: list[int], roles: list[str]) -> list[Event]:
+    """События начала игры: роли по местам и первая фаза"""
+    events = [Event(EventType.ROLE_ASSIGNED, PHASE_CODE['lobby'], 0, user_id, 0, ROLE_CODE[role])
+              for user_id, role in zip(seats, roles)]
+    events.append(Event(EventType.PHASE, PHASE_CODE[phase], round_number, 0, 0, 0))
+    return events
+
+
+def phase_events(phase: str, round_number: int, actions, result) -> list[Event]:
+    """
+    События разрешённой фазы: поступившие действия (включая ботов) в порядке разрешения,
+    исходы движка, сработавшая удача, смерти, следующая фаза и победитель.
+    """
+    code = PHASE_CODE[phase]
+    events = [Event(EventType.ACTION, code, round_number, actor, target, ACTION_CODE.get(action_type, 0))
+              for actor, action_type, target in actions]
+    events.extend(Event(EventType.OUTCOME, code, round_number, actor, target, ACTION_CODE[outcome])
+                  for actor, target, outcome in result.log)
+    events.extend(Event(EventType.LUCK_USED, code, round_number, 0, user_id, 0) for user_id in result.luck_used)
+    events.extend(Event(EventType.DEATH, code, round_number, 0, user_id,
+                        DEATH_LYNCH if user_id == result.lynched else DEATH_NIGHT)
+                  for user_id in result.deaths)
+    events.append(Event(EventType.PHASE, PHASE_CODE[result.phase], result.round, 0, 0, 0))
+    if result.winner is not None:
+        events.append(Event(EventType.GAME_OVER, PHASE_CODE['finished'], result.round, 0, 0,
+                            WINNER_CODE[result.winner]))
+    return events
+
+
+def replay(room_id: int, events: list[Event], offset: int | None = None) -> GameState:
+    """Состояние комнаты после первых offset событий журнала (по умолчанию после всех)"""
+    state = GameState(room_id=room_id, phase='lobby', round=0, seats=[], roles={}, alive=set())
+    for event in events[:offset]:
+        kind = event.type
+        if kind == EventType.ROLE_ASSIGNED:
+            state.seats.append(event.actor)
+            state.roles[event.actor] = ROLES[event.arg]
+            state.alive.add(event.actor)
+        elif kind == EventType.DEATH:
+            state.alive.discard(event.target)
+        elif kind == EventType.LUCK_USED:
+            state.luck_used.add(event.target)
+        elif kind == EventType.PHASE:
+            state.phase, state.round = PHASES[event.phase], event.round
+        elif kind == EventType.GAME_OVER:
+            state.phase, state.winner = 'finished', WINNERS[event.arg]
+    return state
+
+
+def describe(event: Event) -> dict:
+    """Событие с именами вместо кодов - для выгрузок и отладки"""
+    kind = EventType(event.type)
+    if kind == EventType.ROLE_ASSIGNED:
+        arg = ROLES[event.arg]
+    elif kind in (EventType.ACTION, EventType.OUTCOME):
+        arg = ACTIONS[event.arg]
+    elif kind == EventType.GAME_OVER:
+        arg = WINNERS[event.arg]
+    elif kind == EventType.DEATH:
+        arg = 'lynch' if event.arg == DEATH_LYNCH else 'night'
+    else:
+        arg = None
+    return {'type': kind.name.lower(), 'phase': PHASES[event.phase], 'round': event.round,
+            'actor': event.actor or None, 'target': event.target or None, 'arg': arg}
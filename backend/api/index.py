@@ -1,542 +1,897 @@
+import hmac
 import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from utils import assign_roles
+import random
+import traceback
+import db
+import instrument
+import ratelimit
+from cache import leaderboard_cache, achievements_cache, user_achievements_cache, cache_stats
+from db import get_db, release_db
+from engine import NIGHT_ACTIONS, PHASE_SECONDS, awaiting_actors, bot_actions, load_state, resolve_phase
+from events import EventType, decode, describe, encode, phase_events, replay, start_events
+from leaderboard import PAGE_SIZE, MAX_PAGE_SIZE, fetch_page, fetch_rank, make_cursor, parse_cursor
+from lobby import ROOMS_PAGE_SIZE, ROOMS_MAX_PAGE_SIZE, fetch_rooms, make_room_cursor, parse_room_cursor
+from responses import PREFLIGHT_RESPONSE, NOT_FOUND_RESPONSE, NOT_MODIFIED_RESPONSE, json_response, error_response, etag_response
+from room_state import ROOM_EVENTS_CHANNEL, LONG_POLL_MAX_WAIT, bump_state_version, wait_for_room_change
+from router import route, dispatch
+from session import issue_session
+from stats import finalize_game
+from utils import DEFAULT_ROLE_SET, ROLE_SETS, assign_roles, new_role_seed, normalize_role_limits
 
-def get_db():
-    """Подключение к базе данных"""
-    return psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=RealDictCursor)
+MAX_PLAYERS = 20
+NIGHT_ACTION_TYPES = sorted(set(NIGHT_ACTIONS.values()))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+if instrument.ENABLED:
+    instrument.install(db)
 
 def handler(event: dict, context) -> dict:
     """API для игры Мафия - управление пользователями, комнатами и игровым процессом"""
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id'
-            },
-            'body': ''
-        }
-    
-    path = event.get('queryStringParameters', {}).get('path', '')
-    
+    if event.get('httpMethod', 'GET') == 'OPTIONS':
+        return PREFLIGHT_RESPONSE
+
     try:
-        if path == 'register' and method == 'POST':
-            return register_user(event)
-        elif path == 'user' and method == 'GET':
-            return get_user(event)
-        elif path == 'rooms' and method == 'GET':
-            return list_rooms(event)
-        elif path == 'room/create' and method == 'POST':
-            return create_room(event)
-        elif path == 'room/join' and method == 'POST':
-            return join_room(event)
-        elif path == 'room/info' and method == 'GET':
-            return get_room_info(event)
-        elif path == 'leaderboard' and method == 'GET':
-            return get_leaderboard(event)
-        elif path == 'achievements' and method == 'GET':
-            return get_user_achievements(event)
-        elif path == 'game/vote' and method == 'POST':
-            return vote_player(event)
-        elif path == 'room/add-bot' and method == 'POST':
-            return add_bot_to_room(event)
-        elif path == 'game/start' and method == 'POST':
-            return start_game(event)
-        else:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Endpoint not found'})
-            }
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
-
-def register_user(event: dict) -> dict:
-    """Регистрация нового пользователя"""
-    body = json.loads(event.get('body', '{}'))
-    username = body.get('username')
-    telegram_id = body.get('telegram_id')
-    
-    if not username:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Username required'})
-        }
-    
+        return dispatch(event)
+    except Exception:
+        return internal_error(event, context)
+
+def internal_error(event: dict, context) -> dict:
+    """Запись трассировки необработанной ошибки в лог и ответ 500 с request_id"""
+    request_id = getattr(context, 'request_id', None)
+    print(json.dumps({
+        'event': 'api_error',
+        'route': (event.get('queryStringParameters') or {}).get('path'),
+        'request_id': request_id,
+        'traceback': traceback.format_exc(),
+    }), flush=True)
+    return json_response(500, {'error': 'Internal server error', 'request_id': request_id})
+
+@route('POST', 'register', required=('username',), optional=('telegram_id',), error='Username required')
+def register_user(params: dict) -> dict:
+    """Регистрация нового пользователя; при заданном SESSION_SECRET - с токеном сессии для маршрутов игры"""
     conn = get_db()
     cur = conn.cursor()
-    
+
     cur.execute(
         "INSERT INTO users (username, telegram_id) VALUES (%s, %s) RETURNING id, username, total_games, total_wins",
-        (username, telegram_id)
+        (params['username'], params.get('telegram_id'))
     )
-    user = cur.fetchone()
+    user = dict(cur.fetchone())
     conn.commit()
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 201,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps(dict(user))
-    }
-
-def get_user(event: dict) -> dict:
+    release_db(conn)
+
+    session = issue_session(user['id'])
+    if session:
+        user['session_token'], user['session_expires_at'] = session
+    return json_response(201, user)
+
+@route('GET', 'user', required=('id',), error='User ID required')
+def get_user(params: dict) -> dict:
     """Получение информации о пользователе"""
-    user_id = event.get('queryStringParameters', {}).get('id')
-    
-    if not user_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'User ID required'})
-        }
-    
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute("SELECT id, username, total_games, total_wins, created_at FROM users WHERE id = %s", (user_id,))
+
+    cur.execute(USER_SQL, (params['id'],))
     user = cur.fetchone()
     cur.close()
-    conn.close()
-    
+    release_db(conn)
+
     if not user:
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'User not found'})
-        }
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps(dict(user), default=str)
-    }
-
-def list_rooms(event: dict) -> dict:
-    """Список доступных комнат"""
+        return error_response(404, 'User not found')
+
+    return json_response(200, dict(user))
+
+USER_SQL = "SELECT id, username, total_games, total_wins, created_at FROM users WHERE id = %s"
+
+@route('GET', 'rooms', optional=('limit', 'cursor', 'joinable', 'min_count', 'max_count'))
+def list_rooms(params: dict) -> dict:
+    """Список доступных комнат постранично: cursor из заголовка X-Next-Cursor, фильтры joinable и min_count/max_count"""
+    try:
+        limit = min(int(params.get('limit', ROOMS_PAGE_SIZE)), ROOMS_MAX_PAGE_SIZE)
+        cursor = parse_room_cursor(params['cursor']) if params.get('cursor') else None
+        min_count = int(params['min_count']) if params.get('min_count') else None
+        max_count = int(params['max_count']) if params.get('max_count') else None
+    except ValueError:
+        return error_response(400, 'Invalid limit, cursor or player count range')
+    if limit < 1:
+        return error_response(400, 'Invalid limit, cursor or player count range')
+    joinable = params.get('joinable') in ('1', 'true', True)
+
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT r.id, r.name, r.status, r.max_players, r.created_at,
-               COUNT(rp.id) as player_count
-        FROM rooms r
-        LEFT JOIN room_players rp ON r.id = rp.room_id
-        WHERE r.status IN ('waiting', 'playing')
-        GROUP BY r.id
-        ORDER BY r.created_at DESC
-    """)
-    rooms = cur.fetchall()
+    rooms = fetch_rooms(cur, limit, cursor, joinable, min_count, max_count, MAX_PLAYERS)
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps([dict(r) for r in rooms], default=str)
-    }
-
-def create_room(event: dict) -> dict:
-    """Создание новой комнаты"""
-    body = json.loads(event.get('body', '{}'))
-    name = body.get('name')
-    host_user_id = body.get('host_user_id')
-    max_players = body.get('max_players', 12)
-    
-    if not name or not host_user_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Name and host_user_id required'})
-        }
-    
+    release_db(conn)
+
+    next_cursor = make_room_cursor(rooms[-1]) if len(rooms) == limit else ''
+    return etag_response(200, rooms, {'X-Next-Cursor': next_cursor})
+
+@route('POST', 'room/create', required=('name', 'host_user_id'), optional=('max_players', 'role_set', 'role_limits'),
+       error='Name and host_user_id required')
+def create_room(params: dict) -> dict:
+    """Создание новой комнаты с набором ролей и ограничениями числа ролей"""
+    role_set = params.get('role_set') or DEFAULT_ROLE_SET
+    if role_set not in ROLE_SETS:
+        return error_response(400, f"Unknown role_set, expected one of: {', '.join(ROLE_SETS)}")
+    try:
+        role_limits = normalize_role_limits(params.get('role_limits'))
+    except ValueError as e:
+        return error_response(400, str(e))
+
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute(
-        "INSERT INTO rooms (name, host_user_id, max_players) VALUES (%s, %s, %s) RETURNING id, name, status, max_players",
-        (name, host_user_id, max_players)
-    )
+
+    cur.execute("""
+        WITH room AS (
+            INSERT INTO rooms (name, host_user_id, max_players, player_count, role_set, role_limits)
+            VALUES (%(name)s, %(host_user_id)s, %(max_players)s, 1, %(role_set)s, %(role_limits)s::jsonb)
+            RETURNING id, name, status, max_players
+        ), host AS (
+            INSERT INTO room_players (room_id, user_id)
+            SELECT id, %(host_user_id)s FROM room
+        )
+        SELECT * FROM room
+    """, {'name': params['name'], 'host_user_id': params['host_user_id'], 'max_players': params.get('max_players', 12),
+          'role_set': role_set, 'role_limits': json.dumps(role_limits) if role_limits else None})
     room = cur.fetchone()
-    
-    cur.execute(
-        "INSERT INTO room_players (room_id, user_id) VALUES (%s, %s)",
-        (room['id'], host_user_id)
-    )
-    
+
     conn.commit()
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 201,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps(dict(room))
-    }
-
-def join_room(event: dict) -> dict:
-    """Присоединение к комнате"""
-    body = json.loads(event.get('body', '{}'))
-    room_id = body.get('room_id')
-    user_id = body.get('user_id')
-    
-    if not room_id or not user_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'room_id and user_id required'})
-        }
-    
+    release_db(conn)
+
+    return json_response(201, dict(room))
+
+@route('POST', 'room/join', required=('room_id', 'user_id'), error='room_id and user_id required')
+def join_room(params: dict) -> dict:
+    """Присоединение к комнате: проверка вместимости и вставка одним запросом под блокировкой комнаты"""
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute("SELECT status, max_players FROM rooms WHERE id = %s", (room_id,))
+    cur.execute(JOIN_ROOM_SQL, join_room_args(params))
     room = cur.fetchone()
-    
-    if not room:
-        cur.close()
-        conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Room not found'})
-        }
-    
-    if room['status'] == 'playing':
-        cur.close()
-        conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Game already started'})
-        }
-    
-    cur.execute("SELECT COUNT(*) as count FROM room_players WHERE room_id = %s", (room_id,))
-    player_count = cur.fetchone()['count']
-    
-    if player_count >= room['max_players']:
-        cur.close()
-        conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Room is full'})
-        }
-    
-    cur.execute(
-        "INSERT INTO room_players (room_id, user_id) VALUES (%s, %s) ON CONFLICT (room_id, user_id) DO NOTHING RETURNING id",
-        (room_id, user_id)
-    )
-    result = cur.fetchone()
     conn.commit()
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True, 'joined': result is not None})
-    }
-
-def get_room_info(event: dict) -> dict:
+    release_db(conn)
+
+    return join_room_response(room)
+
+JOIN_ROOM_SQL = """
+    WITH room AS (
+        SELECT id, status, max_players, player_count, state_version
+        FROM rooms
+        WHERE id = %(room_id)s
+        FOR UPDATE
+    ), joined AS (
+        INSERT INTO room_players (room_id, user_id, state_version)
+        SELECT id, %(user_id)s, state_version + 1 FROM room
+        WHERE status = 'waiting' AND player_count < LEAST(max_players, %(cap)s)
+        ON CONFLICT (room_id, user_id) DO NOTHING
+        RETURNING room_id
+    ), counted AS (
+        UPDATE rooms SET player_count = rooms.player_count + 1, state_version = rooms.state_version + 1
+        FROM joined
+        WHERE rooms.id = joined.room_id
+        RETURNING pg_notify(%(channel)s, rooms.id || ':' || rooms.state_version || ':join')
+    )
+    SELECT status, max_players, player_count, EXISTS (SELECT 1 FROM joined) AS joined
+    FROM room
+"""
+
+def join_room_args(params: dict) -> dict:
+    return {'room_id': params['room_id'], 'user_id': params['user_id'], 'cap': MAX_PLAYERS, 'channel': ROOM_EVENTS_CHANNEL}
+
+def join_room_response(room) -> dict:
+    if not room:
+        return error_response(404, 'Room not found')
+
+    if room['status'] != 'waiting':
+        return error_response(400, 'Game already started')
+
+    if not room['joined'] and room['player_count'] >= min(room['max_players'], MAX_PLAYERS):
+        return error_response(400, 'Room is full')
+
+    return json_response(200, {'success': True, 'joined': room['joined']})
+
+@route('GET', 'room/info', required=('id',), error='Room ID required')
+def get_room_info(params: dict) -> dict:
     """Получение информации о комнате и игроках"""
-    room_id = event.get('queryStringParameters', {}).get('id')
-    
-    if not room_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Room ID required'})
-        }
-    
+    room_id = params['id']
+
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute("SELECT id, name, status, max_players, current_phase, phase_ends_at FROM rooms WHERE id = %s", (room_id,))
+
+    cur.execute(ROOM_SQL, (room_id,))
     room = cur.fetchone()
-    
+
     if not room:
         cur.close()
-        conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Room not found'})
-        }
-    
-    cur.execute("""
-        SELECT u.id, u.username, rp.role, rp.is_alive
-        FROM room_players rp
-        JOIN users u ON rp.user_id = u.id
-        WHERE rp.room_id = %s
-        ORDER BY rp.joined_at
-    """, (room_id,))
+        release_db(conn)
+        return error_response(404, 'Room not found')
+
+    cur.execute(ROOM_PLAYERS_SQL, (room_id,))
     players = cur.fetchall()
-    
+
     cur.close()
-    conn.close()
-    
+    release_db(conn)
+
+    return room_info_response(room, players)
+
+ROOM_SQL = "SELECT id, name, status, max_players, current_phase, phase_ends_at, state_version FROM rooms WHERE id = %s"
+
+ROOM_PLAYERS_SQL = """
+    SELECT u.id, u.username, rp.role, rp.is_alive
+    FROM room_players rp
+    JOIN users u ON rp.user_id = u.id
+    WHERE rp.room_id = %s
+    ORDER BY rp.joined_at
+"""
+
+def room_info_response(room, players) -> dict:
+    if not room:
+        return error_response(404, 'Room not found')
+
     result = dict(room)
     result['players'] = [dict(p) for p in players]
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps(result, default=str)
-    }
-
-def get_leaderboard(event: dict) -> dict:
-    """Получение таблицы лидеров"""
+
+    return json_response(200, result)
+
+@route('GET', 'room/changes', required=('id',), optional=('since', 'wait'), error='Room ID required')
+def get_room_changes(params: dict) -> dict:
+    """Изменения комнаты после версии since; при wait > 0 - long-poll через LISTEN/NOTIFY"""
+    room_id = params['id']
+    try:
+        since = int(params.get('since', 0))
+        wait = min(float(params.get('wait', 0)), LONG_POLL_MAX_WAIT)
+    except (TypeError, ValueError):
+        return error_response(400, 'since and wait must be numbers')
+
     conn = get_db()
+    if wait > 0:
+        conn.autocommit = True
     cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT id, username, total_games, total_wins,
-               CASE WHEN total_games > 0 THEN ROUND((total_wins::numeric / total_games) * 100) ELSE 0 END as win_rate
-        FROM users
-        WHERE total_games > 0
-        ORDER BY total_wins DESC, win_rate DESC
-        LIMIT 50
-    """)
-    leaderboard = cur.fetchall()
+    if wait > 0:
+        cur.execute(f"LISTEN {ROOM_EVENTS_CHANNEL}")
+    cur.execute(ROOM_CHANGES_SQL, (since, room_id))
+    room = cur.fetchone()
+
+    if room and room['state_version'] <= since and wait > 0:
+        if wait_for_room_change(conn, room_id, since, wait):
+            cur.execute(ROOM_CHANGES_SQL, (since, room_id))
+            room = cur.fetchone()
+
+    if wait > 0:
+        cur.execute(f"UNLISTEN {ROOM_EVENTS_CHANNEL}")
+        conn.notifies.clear()
+        conn.autocommit = False
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps([dict(l) for l in leaderboard])
-    }
-
-def get_user_achievements(event: dict) -> dict:
+    release_db(conn)
+
+    if not room:
+        return error_response(404, 'Room not found')
+
+    if room['state_version'] <= since:
+        return NOT_MODIFIED_RESPONSE
+
+    result = dict(room)
+    result['players'] = result['players'] or []
+    return json_response(200, result)
+
+ROOM_CHANGES_SQL = """
+    SELECT r.id, r.name, r.status, r.max_players, r.current_phase, r.phase_ends_at, r.state_version,
+           (SELECT json_agg(json_build_object('id', u.id, 'username', u.username, 'role', rp.role, 'is_alive', rp.is_alive)
+                            ORDER BY rp.joined_at)
+            FROM room_players rp
+            JOIN users u ON rp.user_id = u.id
+            WHERE rp.room_id = r.id AND rp.state_version > %s) AS players
+    FROM rooms r
+    WHERE r.id = %s
+"""
+
+@route('GET', 'leaderboard', optional=('limit', 'offset', 'cursor'))
+def get_leaderboard(params: dict) -> dict:
+    """Получение таблицы лидеров постранично: offset или cursor из заголовка X-Next-Cursor"""
+    try:
+        limit = min(int(params.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE)
+        offset = int(params.get('offset', 0))
+        cursor = parse_cursor(params['cursor']) if params.get('cursor') else None
+    except ValueError:
+        return error_response(400, 'Invalid limit, offset or cursor')
+    if limit < 1 or offset < 0:
+        return error_response(400, 'Invalid limit, offset or cursor')
+
+    cache_key = (limit, offset, cursor)
+    response = leaderboard_cache.get(cache_key)
+    if response is not None:
+        return response
+
+    conn = get_db()
+    cur = conn.cursor()
+    leaderboard = fetch_page(cur, limit, offset, cursor)
+    cur.close()
+    release_db(conn)
+
+    next_cursor = make_cursor(leaderboard[-1]) if len(leaderboard) == limit else ''
+    response = etag_response(200, leaderboard, {'X-Next-Cursor': next_cursor})
+    leaderboard_cache.set(cache_key, response)
+    return response
+
+@route('GET', 'leaderboard/rank', required=('user_id',), error='user_id required')
+def get_leaderboard_rank(params: dict) -> dict:
+    """Место пользователя в таблице лидеров"""
+    conn = get_db()
+    cur = conn.cursor()
+    rank = fetch_rank(cur, params['user_id'])
+    cur.close()
+    release_db(conn)
+
+    if not rank:
+        return error_response(404, 'User is not ranked')
+
+    return json_response(200, rank)
+
+@route('GET', 'achievements', required=('user_id',), error='user_id required')
+def get_user_achievements(params: dict) -> dict:
     """Получение достижений пользователя"""
-    user_id = event.get('queryStringParameters', {}).get('user_id')
-    
-    if not user_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'user_id required'})
-        }
-    
+    user_id = str(params['user_id'])
+    response = user_achievements_cache.get(user_id)
+    if response is not None:
+        return response
+
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT a.id, a.name, a.description, a.icon,
-               ua.unlocked_at IS NOT NULL as unlocked
-        FROM achievements a
-        LEFT JOIN user_achievements ua ON a.id = ua.achievement_id AND ua.user_id = %s
-        ORDER BY a.id
-    """, (user_id,))
-    achievements = cur.fetchall()
+
+    catalogue = achievements_cache.get('all')
+    if catalogue is None:
+        cur.execute("SELECT id, name, description, icon FROM achievements ORDER BY id")
+        catalogue = [dict(a) for a in cur.fetchall()]
+        achievements_cache.set('all', catalogue)
+
+    cur.execute(USER_ACHIEVEMENTS_SQL, (user_id,))
+    unlocked = {row['achievement_id'] for row in cur.fetchall()}
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps([dict(a) for a in achievements], default=str)
-    }
-
-def vote_player(event: dict) -> dict:
+    release_db(conn)
+
+    response = etag_response(200, [{**a, 'unlocked': a['id'] in unlocked} for a in catalogue])
+    user_achievements_cache.set(user_id, response)
+    return response
+
+USER_ACHIEVEMENTS_SQL = "SELECT achievement_id FROM user_achievements WHERE user_id = %s AND unlocked_at IS NOT NULL"
+
+@route('GET', 'cache/stats')
+def get_cache_stats(params: dict) -> dict:
+    """Счётчики попаданий и промахов кэшей процесса"""
+    return json_response(200, cache_stats())
+
+@route('GET', 'metrics', optional=('token',))
+def get_metrics(params: dict) -> dict:
+    """Счётчики маршрутов процесса, кэшей и ограничения частоты по token; без ADMIN_TOKEN маршрута нет"""
+    if not ADMIN_TOKEN:
+        return NOT_FOUND_RESPONSE
+    if not hmac.compare_digest(str(params.get('token', '')), ADMIN_TOKEN):
+        return error_response(403, 'Forbidden')
+    return json_response(200, {**instrument.metrics(), 'caches': cache_stats(),
+                               'rate_limits': ratelimit.buckets.stats()})
+
+@route('POST', 'game/vote', required=('room_id', 'actor_id', 'target_id'),
+       error='room_id, actor_id and target_id required', session=True)
+def vote_player(params: dict) -> dict:
     """Голосование за игрока"""
-    body = json.loads(event.get('body', '{}'))
-    room_id = body.get('room_id')
-    actor_id = body.get('actor_id')
-    target_id = body.get('target_id')
-    
-    if not all([room_id, actor_id, target_id]):
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'room_id, actor_id and target_id required'})
-        }
-    
+    if not acts_for_self(params):
+        return error_response(403, 'Cannot act for another player')
+    response, action_ids = upsert_votes(params['room_id'], {params['actor_id']: params['target_id']})
+    if response:
+        return response
+    return json_response(200, {'success': True, 'action_id': action_ids[0]})
+
+@route('POST', 'game/votes', required=('room_id', 'votes'), error='room_id and votes required', session=True)
+def vote_players(params: dict) -> dict:
+    """Пакет голосов [{actor_id, target_id}, ...] одним запросом; повторный голос заменяет прежний"""
+    votes = params['votes']
+    if not isinstance(votes, list) or len(votes) > MAX_PLAYERS or not all(
+            isinstance(v, dict) and v.get('actor_id') and v.get('target_id') for v in votes):
+        return error_response(400, f'votes must be a list of up to {MAX_PLAYERS} {{actor_id, target_id}} objects')
+    if not all(acts_for_self({**params, 'actor_id': v['actor_id']}) for v in votes):
+        return error_response(403, 'Cannot act for another player')
+
+    response, action_ids = upsert_votes(params['room_id'], {v['actor_id']: v['target_id'] for v in votes})
+    if response:
+        return response
+    return json_response(200, {'success': True, 'action_ids': action_ids})
+
+def acts_for_self(params: dict) -> bool:
+    """
+    Игрок с токеном сессии может действовать только от своего имени. Без токена маршруты игры
+    доходят сюда, только если SESSION_SECRET не задан (локальные прогоны), и проверка не выполняется.
+    """
+    session_user_id = params.get('session_user_id')
+    return session_user_id is None or str(params['actor_id']) == str(session_user_id)
+
+def upsert_votes(room_id, votes: dict) -> tuple[dict | None, list]:
+    """
+    Запись голосов текущего круга: один голос на игрока, ON CONFLICT обновляет цель.
+    Голосуют только в фазе voting живые игроки идущей игры за живых соседей по комнате, как считает
+    resolve_phase; если хоть один голос пакета недопустим, не записывается ни один.
+    """
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute(
-        "INSERT INTO game_actions (room_id, actor_user_id, target_user_id, action_type, game_phase) VALUES (%s, %s, %s, %s, %s) RETURNING id",
-        (room_id, actor_id, target_id, 'vote', 'voting')
+
+    cur.execute(UPSERT_VOTES_SQL, {'room_id': room_id, 'actors': list(votes), 'targets': list(votes.values()),
+                                   'channel': ROOM_EVENTS_CHANNEL})
+    room = cur.fetchone()
+    conn.commit()
+    cur.close()
+    release_db(conn)
+
+    if not room:
+        return error_response(404, 'Room not found'), []
+    if room['status'] != 'playing':
+        return error_response(400, 'Game is not in progress'), []
+    if room['current_phase'] != 'voting':
+        return error_response(409, 'Votes are accepted only during voting'), []
+    if not room['valid']:
+        return error_response(400, 'Voters and targets must be different alive players of the room'), []
+    return None, room['action_ids']
+
+UPSERT_VOTES_SQL = """
+    WITH room AS (
+        SELECT id, round, status, current_phase FROM rooms WHERE id = %(room_id)s
+    ), votes AS (
+        SELECT v.actor, v.target
+        FROM room
+        CROSS JOIN unnest(%(actors)s::int[], %(targets)s::int[]) AS v(actor, target)
+        JOIN room_players a ON a.room_id = room.id AND a.user_id = v.actor AND a.is_alive
+        JOIN room_players t ON t.room_id = room.id AND t.user_id = v.target AND t.is_alive
+        WHERE room.status = 'playing' AND room.current_phase = 'voting' AND v.actor <> v.target
+    ), checked AS (
+        SELECT COUNT(*) = cardinality(%(actors)s::int[]) AS valid FROM votes
+    ), upserted AS (
+        INSERT INTO game_actions (room_id, actor_user_id, target_user_id, action_type, game_phase, round)
+        SELECT room.id, v.actor, v.target, 'vote', 'voting', room.round
+        FROM room, checked, votes v
+        WHERE checked.valid
+        ON CONFLICT (room_id, round, actor_user_id) WHERE action_type = 'vote'
+        DO UPDATE SET target_user_id = EXCLUDED.target_user_id, created_at = CURRENT_TIMESTAMP
+        RETURNING id, actor_user_id
+    ), bumped AS (
+        UPDATE rooms SET state_version = rooms.state_version + 1
+        FROM room, checked
+        WHERE rooms.id = room.id AND checked.valid
+        RETURNING pg_notify(%(channel)s, rooms.id || ':' || rooms.state_version || ':vote')
     )
+    SELECT room.status, room.current_phase, checked.valid,
+           ARRAY(SELECT id FROM upserted ORDER BY array_position(%(actors)s::int[], actor_user_id)) AS action_ids
+    FROM room, checked
+"""
+
+@route('GET', 'game/tally', required=('room_id',), optional=('round',), error='room_id required')
+def get_vote_tally(params: dict) -> dict:
+    """Подсчёт голосов круга (по умолчанию текущего) по индексу idx_game_actions_vote_tally"""
+    conn = get_db()
+    cur = conn.cursor()
+
+    cur.execute(VOTE_TALLY_SQL, (params.get('round'), params['room_id']))
+    tally = cur.fetchone()
+    cur.close()
+    release_db(conn)
+
+    if not tally:
+        return error_response(404, 'Room not found')
+
+    result = dict(tally)
+    result['tally'] = result['tally'] or []
+    return json_response(200, result)
+
+VOTE_TALLY_SQL = """
+    SELECT r.id AS room_id, t.round,
+           (SELECT json_agg(json_build_object('target_id', v.target_user_id, 'votes', v.votes)
+                            ORDER BY v.votes DESC, v.target_user_id)
+            FROM (SELECT target_user_id, COUNT(*) AS votes
+                  FROM game_actions
+                  WHERE room_id = r.id AND round = t.round AND action_type = 'vote'
+                  GROUP BY target_user_id) v) AS tally
+    FROM rooms r
+    CROSS JOIN LATERAL (SELECT COALESCE(%s::int, r.round) AS round) t
+    WHERE r.id = %s
+"""
+
+@route('POST', 'game/action', required=('room_id', 'actor_id', 'target_id', 'action_type'),
+       error='room_id, actor_id, target_id and action_type required', session=True)
+def night_action(params: dict) -> dict:
+    """
+    Ночное действие роли (kill, heal, check, visit, ...): только ночью, только действие своей роли,
+    от живого игрока комнаты против другого живого игрока; итог определяет движок при разрешении фазы
+    """
+    if params['action_type'] == 'vote':
+        return vote_player(params)
+    roles = [role for role, action_type in NIGHT_ACTIONS.items() if action_type == params['action_type']]
+    if not roles:
+        return error_response(400, f"Unknown action_type, expected vote or one of: {', '.join(NIGHT_ACTION_TYPES)}")
+    if not acts_for_self(params):
+        return error_response(403, 'Cannot act for another player')
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    cur.execute(NIGHT_ACTION_SQL, {'room_id': params['room_id'], 'actor_id': params['actor_id'],
+                                   'target_id': params['target_id'], 'action_type': params['action_type'],
+                                   'roles': roles})
     action = cur.fetchone()
+    if not action or action['id'] is None:
+        cur.close()
+        release_db(conn)
+        return night_action_error(action)
+
+    bump_state_version(cur, params['room_id'], kind='action')
     conn.commit()
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True, 'action_id': action['id']})
-    }
-
-def add_bot_to_room(event: dict) -> dict:
-    """Добавление бота в комнату (только для создателя)"""
-    body = json.loads(event.get('body', '{}'))
-    room_id = body.get('room_id')
-    
-    if not room_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'room_id required'})
-        }
-    
+    release_db(conn)
+
+    return json_response(200, {'success': True, 'action_id': action['id']})
+
+def night_action_error(action) -> dict:
+    """Причина, по которой действие не записано"""
+    if not action:
+        return error_response(404, 'Room not found')
+    if action['status'] != 'playing':
+        return error_response(400, 'Game is not in progress')
+    if action['current_phase'] != 'night':
+        return error_response(409, 'Actions are accepted only at night')
+    if not action['actor_role'] or not action['target_alive']:
+        return error_response(400, 'Actor and target must be different alive players of the room')
+    return error_response(403, 'Action is not available for this role')
+
+NIGHT_ACTION_SQL = """
+    WITH room AS (
+        SELECT id, status, current_phase, round FROM rooms WHERE id = %(room_id)s
+    ), actor AS (
+        SELECT rp.role FROM room
+        JOIN room_players rp ON rp.room_id = room.id AND rp.user_id = %(actor_id)s AND rp.is_alive
+    ), target AS (
+        SELECT rp.user_id FROM room
+        JOIN room_players rp ON rp.room_id = room.id AND rp.user_id = %(target_id)s AND rp.is_alive
+        WHERE rp.user_id <> %(actor_id)s
+    ), inserted AS (
+        INSERT INTO game_actions (room_id, actor_user_id, target_user_id, action_type, game_phase, round)
+        SELECT room.id, %(actor_id)s, target.user_id, %(action_type)s, room.current_phase, room.round
+        FROM room, actor, target
+        WHERE room.status = 'playing' AND room.current_phase = 'night' AND actor.role = ANY(%(roles)s)
+        RETURNING id
+    )
+    SELECT room.status, room.current_phase, (SELECT role FROM actor) AS actor_role,
+           EXISTS (SELECT 1 FROM target) AS target_alive, (SELECT id FROM inserted) AS id
+    FROM room
+"""
+
+@route('POST', 'game/advance', required=('room_id',), error='room_id required')
+def advance_phase(params: dict) -> dict:
+    """
+    Разрешение текущей фазы движком и переход к следующей; боты действуют автоматически.
+    Фаза разрешается по истечении phase_ends_at или раньше, когда все живые люди сделали свой ход.
+    """
+    room_id = params['room_id']
+
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute("SELECT status, max_players FROM rooms WHERE id = %s", (room_id,))
+
+    cur.execute(PHASE_STATE_SQL, (room_id,))
     room = cur.fetchone()
-    
+
     if not room:
         cur.close()
-        conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Room not found'})
-        }
-    
-    if room['status'] == 'playing':
+        release_db(conn)
+        return error_response(404, 'Room not found')
+
+    if room['status'] != 'playing':
         cur.close()
-        conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Cannot add bots during game'})
-        }
-    
-    cur.execute("SELECT COUNT(*) as count FROM room_players WHERE room_id = %s", (room_id,))
-    player_count = cur.fetchone()['count']
-    
-    if player_count >= 20:
+        release_db(conn)
+        return error_response(400, 'Game is not in progress')
+
+    players = room['players']
+    state = load_state(int(room_id), room['current_phase'], room['round'], players)
+    humans = [p['user_id'] for p in players if not p['is_bot']]
+    # обсуждение днём длится до конца срока; ночь и голосование заканчиваются, когда походили все люди
+    all_acted = state.phase != 'day' and not awaiting_actors(state, room['actions'] or (), humans)
+    if not room['phase_over'] and not all_acted:
         cur.close()
-        conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Maximum 20 players reached'})
-        }
-    
-    cur.execute("SELECT COUNT(*) as count FROM room_players WHERE room_id = %s AND is_bot = true", (room_id,))
-    bot_count = cur.fetchone()['count']
-    bot_number = bot_count + 1
-    
-    bot_names = ['Джонни', 'Винни', 'Тони', 'Рокки', 'Макс', 'Дюк', 'Спайк', 'Блейд', 'Рейдер', 'Вайпер', 
-                 'Харли', 'Чоппер', 'Револьвер', 'Дизель', 'Циклон', 'Гром', 'Стиль', 'Драйв', 'Буст', 'Нитро']
-    bot_username = bot_names[bot_number - 1] if bot_number <= len(bot_names) else f'Бот-{bot_number}'
-    
-    cur.execute(
-        "INSERT INTO users (username, telegram_id) VALUES (%s, %s) RETURNING id",
-        (bot_username, None)
-    )
-    bot_user = cur.fetchone()
-    
-    cur.execute(
-        "INSERT INTO room_players (room_id, user_id, is_bot) VALUES (%s, %s, true)",
-        (room_id, bot_user['id'])
-    )
-    
+        release_db(conn)
+        return error_response(409, 'Phase is not over yet')
+
+    bots = bot_actions(state, [p['user_id'] for p in players if p['is_bot']], random.Random())
+    resolved_phase, resolved_round = state.phase, state.round
+    actions = [tuple(a) for a in room['actions'] or ()] + bots
+    result = resolve_phase(state, actions)
+
+    log = [(actor, target, action_type) for actor, action_type, target in bots] + result.log
+    cur.execute("""
+        WITH room AS (
+            UPDATE rooms
+            SET current_phase = %(phase)s, round = %(round)s,
+                status = CASE WHEN %(finished)s THEN 'finished' ELSE status END,
+                ended_at = CASE WHEN %(finished)s THEN CURRENT_TIMESTAMP ELSE ended_at END,
+                phase_ends_at = CASE WHEN %(finished)s THEN NULL
+                                     ELSE CURRENT_TIMESTAMP + %(seconds)s * INTERVAL '1 second' END,
+                state_version = state_version + 1
+            WHERE id = %(room_id)s
+            RETURNING id, state_version, pg_notify(%(channel)s, id || ':' || state_version || ':phase')
+        ), players AS (
+            UPDATE room_players rp
+            SET is_alive = rp.is_alive AND NOT rp.user_id = ANY(%(deaths)s::int[]),
+                luck_used = rp.luck_used OR rp.user_id = ANY(%(luck_used)s::int[]),
+                state_version = room.state_version
+            FROM room
+            WHERE rp.room_id = room.id AND rp.user_id = ANY(%(deaths)s::int[] || %(luck_used)s::int[])
+        ), logged AS (
+            INSERT INTO game_actions (room_id, actor_user_id, target_user_id, action_type, game_phase, round)
+            SELECT room.id, a.actor, a.target, a.action_type, %(resolved_phase)s, %(resolved_round)s
+            FROM room, unnest(%(actors)s::int[], %(targets)s::int[], %(types)s::varchar[]) AS a(actor, target, action_type)
+            ON CONFLICT DO NOTHING
+        ), journaled AS (
+            INSERT INTO game_events (room_id, seq, events)
+            SELECT id, state_version, %(events)s FROM room
+        )
+        SELECT state_version FROM room
+    """, {
+        'room_id': room_id,
+        'channel': ROOM_EVENTS_CHANNEL,
+        'phase': result.phase,
+        'round': result.round,
+        'finished': result.winner is not None,
+        'seconds': PHASE_SECONDS.get(result.phase, 0),
+        'deaths': result.deaths,
+        'luck_used': result.luck_used,
+        'resolved_phase': resolved_phase,
+        'resolved_round': resolved_round,
+        'actors': [entry[0] for entry in log],
+        'targets': [entry[1] for entry in log],
+        'types': [entry[2] for entry in log],
+        'events': encode(phase_events(resolved_phase, resolved_round, actions, result)),
+    })
+
+    unlocked = []
+    if result.winner is not None:
+        unlocked = finalize_game(cur, int(room_id), result.winner, players, state.alive)
+
     conn.commit()
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True, 'bot_username': bot_username})
-    }
-
-def start_game(event: dict) -> dict:
-    """Начало игры с распределением ролей"""
-    body = json.loads(event.get('body', '{}'))
-    room_id = body.get('room_id')
-    
-    if not room_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'room_id required'})
-        }
-    
+    release_db(conn)
+
+    return json_response(200, {
+        'phase': result.phase,
+        'round': result.round,
+        'deaths': result.deaths,
+        'lynched': result.lynched,
+        'winner': result.winner,
+        'unlocked': unlocked
+    })
+
+PHASE_STATE_SQL = """
+    SELECT r.status, r.current_phase, r.round, COALESCE(r.phase_ends_at <= CURRENT_TIMESTAMP, true) AS phase_over,
+           (SELECT json_agg(json_build_object('user_id', rp.user_id, 'role', rp.role, 'is_alive', rp.is_alive,
+                                              'is_bot', rp.is_bot, 'luck_used', rp.luck_used)
+                            ORDER BY rp.joined_at)
+            FROM room_players rp WHERE rp.room_id = r.id) AS players,
+           (SELECT json_agg(json_build_array(ga.actor_user_id, ga.action_type, ga.target_user_id) ORDER BY ga.id)
+            FROM game_actions ga
+            WHERE ga.room_id = r.id AND ga.round = r.round AND ga.game_phase = r.current_phase) AS actions
+    FROM rooms r
+    WHERE r.id = %s
+    FOR UPDATE
+"""
+
+@route('GET', 'game/replay', required=('room_id',), optional=('offset',), error='room_id required')
+def replay_game(params: dict) -> dict:
+    """
+    Восстановление состояния завершённой игры из журнала событий после первых offset событий.
+    Журнал читается из game_events и game_events_archive; для идущей игры недоступен, чтобы не раскрывать роли.
+    """
+    try:
+        offset = int(params['offset']) if params.get('offset') not in (None, '') else None
+    except (TypeError, ValueError):
+        return error_response(400, 'Invalid offset')
+    if offset is not None and offset < 0:
+        return error_response(400, 'Invalid offset')
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    cur.execute(GAME_EVENTS_SQL, {'room_id': params['room_id']})
+    row = cur.fetchone()
+    cur.close()
+    release_db(conn)
+
+    if row['events'] is None:
+        return error_response(404, 'No events for room')
+
+    events = decode(bytes(row['events']))
+    if events[-1].type != EventType.GAME_OVER:
+        return error_response(400, 'Game is not finished')
+
+    state = replay(int(params['room_id']), events, offset)
+    applied = events[:offset]
+    return json_response(200, {
+        'room_id': state.room_id,
+        'events_total': len(events),
+        'offset': len(applied),
+        'phase': state.phase,
+        'round': state.round,
+        'winner': state.winner,
+        'players': [{'user_id': user_id, 'role': state.roles[user_id], 'is_alive': user_id in state.alive,
+                     'luck_used': user_id in state.luck_used} for user_id in state.seats],
+        'events': [describe(event) for event in applied],
+    })
+
+GAME_EVENTS_SQL = """
+    SELECT string_agg(e.events, ''::bytea ORDER BY e.seq) AS events
+    FROM (
+        SELECT seq, events FROM game_events WHERE room_id = %(room_id)s
+        UNION ALL
+        SELECT seq, events FROM game_events_archive WHERE room_id = %(room_id)s
+    ) e
+"""
+
+@route('POST', 'room/add-bot', required=('room_id',), optional=('count',), error='room_id required')
+def add_bot_to_room(params: dict) -> dict:
+    """Добавление ботов из общего пула в комнату (только для создателя); count - сколько ботов посадить"""
+    try:
+        args = add_bots_args(params)
+    except (TypeError, ValueError):
+        return error_response(400, 'Invalid count')
+
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute("SELECT id, status FROM rooms WHERE id = %s", (room_id,))
+    cur.execute(ADD_BOTS_SQL, args)
     room = cur.fetchone()
-    
+    conn.commit()
+    cur.close()
+    release_db(conn)
+
+    return add_bots_response(room)
+
+ADD_BOTS_SQL = """
+    WITH room AS (
+        SELECT id, status, player_count, state_version
+        FROM rooms
+        WHERE id = %(room_id)s
+        FOR UPDATE
+    ), allowed AS (
+        SELECT id, state_version, LEAST(%(count)s, %(cap)s - player_count) AS seats
+        FROM room
+        WHERE status = 'waiting' AND player_count < %(cap)s
+    ), leased AS (
+        UPDATE bot_pool SET room_id = allowed.id, leased_at = CURRENT_TIMESTAMP
+        FROM allowed
+        WHERE bot_pool.user_id IN (
+            SELECT user_id FROM bot_pool
+            WHERE room_id IS NULL
+            ORDER BY user_id
+            LIMIT COALESCE((SELECT seats FROM allowed), 0)
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING bot_pool.user_id
+    ), seat AS (
+        INSERT INTO room_players (room_id, user_id, is_bot, state_version)
+        SELECT allowed.id, leased.user_id, true, allowed.state_version + 1 FROM allowed, leased
+        RETURNING room_id, user_id
+    ), counted AS (
+        UPDATE rooms SET player_count = rooms.player_count + (SELECT COUNT(*) FROM seat),
+                         state_version = rooms.state_version + 1
+        FROM allowed
+        WHERE rooms.id = allowed.id AND EXISTS (SELECT 1 FROM seat)
+        RETURNING pg_notify(%(channel)s, rooms.id || ':' || rooms.state_version || ':bots')
+    )
+    SELECT status, player_count,
+           ARRAY(SELECT u.username FROM seat JOIN users u ON u.id = seat.user_id ORDER BY u.id) AS bot_usernames
+    FROM room
+"""
+
+def add_bots_args(params: dict) -> dict:
+    count = max(1, min(int(params.get('count', 1)), MAX_PLAYERS))
+    return {'room_id': params['room_id'], 'count': count, 'cap': MAX_PLAYERS, 'channel': ROOM_EVENTS_CHANNEL}
+
+def add_bots_response(room) -> dict:
     if not room:
-        cur.close()
-        conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Room not found'})
-        }
-    
+        return error_response(404, 'Room not found')
+
     if room['status'] != 'waiting':
+        return error_response(400, 'Cannot add bots during game')
+
+    if room['player_count'] >= MAX_PLAYERS:
+        return error_response(400, 'Maximum 20 players reached')
+
+    if not room['bot_usernames']:
+        return error_response(503, 'No free bots, try again later')
+
+    return json_response(200, {
+        'success': True,
+        'bot_username': room['bot_usernames'][0],
+        'bot_usernames': room['bot_usernames'],
+    })
+
+@route('POST', 'game/start', required=('room_id',), error='room_id required')
+def start_game(params: dict) -> dict:
+    """
+    Начало игры с распределением ролей.
+    Роли перемешиваются с новым seed, который сохраняется в комнате: по seed, набору ролей
+    и порядку мест (joined_at, id) распределение воспроизводится через utils.assign_roles.
+    """
+    room_id = params['room_id']
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    cur.execute(LOCK_ROOM_FOR_START_SQL, (room_id,))
+    error, args = start_game_args(room_id, cur.fetchone())
+    if error:
         cur.close()
-        conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Game already started or finished'})
-        }
-    
-    cur.execute("SELECT id FROM room_players WHERE room_id = %s ORDER BY joined_at", (room_id,))
-    players = cur.fetchall()
-    player_count = len(players)
-    
-    if player_count < 4:
-        cur.close()
-        conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Minimum 4 players required'})
-        }
-    
-    try:
-        roles = assign_roles(player_count)
-    except ValueError as e:
+        release_db(conn)
+        return error
+
+    cur.execute(START_GAME_SQL, args)
+    if cur.fetchone() is None:
+        conn.rollback()
         cur.close()
-        conn.close()
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
-    
-    for i, player in enumerate(players):
-        cur.execute(
-            "UPDATE room_players SET role = %s WHERE id = %s",
-            (roles[i], player['id'])
-        )
-    
-    cur.execute(
-        "UPDATE rooms SET status = 'playing', current_phase = 'night' WHERE id = %s",
-        (room_id,)
-    )
-    
+        release_db(conn)
+        return error_response(400, 'Game already started or finished')
+
     conn.commit()
     cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True, 'message': f'Game started with {player_count} players'})
-    }
\ No newline at end of file
+    release_db(conn)
+
+    return json_response(200, {'success': True, 'message': f"Game started with {len(args['roles'])} players"})
+
+LOCK_ROOM_FOR_START_SQL = """
+    SELECT r.status, r.role_set, r.role_limits,
+           ARRAY(SELECT rp.id FROM room_players rp WHERE rp.room_id = r.id
+                 ORDER BY rp.joined_at, rp.id) AS player_ids,
+           ARRAY(SELECT rp.user_id FROM room_players rp WHERE rp.room_id = r.id
+                 ORDER BY rp.joined_at, rp.id) AS user_ids
+    FROM rooms r
+    WHERE r.id = %s
+    FOR UPDATE
+"""
+
+START_GAME_SQL = """
+    WITH room AS (
+        UPDATE rooms
+        SET status = 'playing', current_phase = 'night', round = 1, started_at = CURRENT_TIMESTAMP, role_seed = %(seed)s,
+            phase_ends_at = CURRENT_TIMESTAMP + %(seconds)s * INTERVAL '1 second',
+            state_version = state_version + 1
+        WHERE id = %(room_id)s AND status = 'waiting'
+        RETURNING id, state_version, pg_notify(%(channel)s, id || ':' || state_version || ':start')
+    ), assigned AS (
+        UPDATE room_players rp
+        SET role = v.role, state_version = room.state_version
+        FROM room, unnest(%(player_ids)s::int[], %(roles)s::varchar[]) AS v(id, role)
+        WHERE rp.id = v.id
+        RETURNING rp.id
+    ), journaled AS (
+        INSERT INTO game_events (room_id, seq, events)
+        SELECT id, state_version, %(events)s FROM room
+    )
+    SELECT (SELECT COUNT(*) FROM assigned) AS assigned FROM room
+"""
+
+def start_game_args(room_id, room) -> tuple[dict | None, dict | None]:
+    """Проверка заблокированной комнаты и параметры START_GAME_SQL: (ответ с ошибкой, None) или (None, параметры)"""
+    if not room:
+        return error_response(404, 'Room not found'), None
+
+    if room['status'] != 'waiting':
+        return error_response(400, 'Game already started or finished'), None
+
+    player_ids = room['player_ids']
+    player_count = len(player_ids)
+
+    if player_count < 4:
+        return error_response(400, 'Minimum 4 players required'), None
+
+    try:
+        seed = new_role_seed()
+        roles = assign_roles(player_count, seed, room['role_set'], room['role_limits'])
+    except ValueError as e:
+        return error_response(400, str(e)), None
+
+    return None, {'room_id': room_id, 'channel': ROOM_EVENTS_CHANNEL, 'player_ids': player_ids, 'roles': roles,
+                  'seed': seed, 'seconds': PHASE_SECONDS['night'],
+                  'events': encode(start_events('night', 1, room['user_ids'], roles))}
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('API_INSTRUMENTATION', '') == '1'
+SQL_PREVIEW = 80
+
+_local = threading.local()
+_lock = threading.Lock()
+_routes = {}
+
+
+def install(db_module) -> None:
+    """Подмена фабрики соединений пула: замер подключения и курсор с учётом запросов"""
+    from psycopg2.extras import RealDictCursor
+
+    class InstrumentedCursor(RealDictCursor):
+        """Курсор, записывающий длительность и число строк каждого запроса в текущий замер"""
+
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                record_statement(query, time.perf_counter() - started, max(self.rowcount, 0))
+
+    connect = db_module._connect
+
+    def instrumented_connect():
+        started = time.perf_counter()
+        conn = connect()
+        conn.cursor_factory = InstrumentedCursor
+        current = getattr(_local, 'current', None)
+        if current is not None:
+            current['connect_ms'] += (time.perf_counter() - started) * 1000
+        return conn
+
+    db_module._connect = instrumented_connect
+
+
+def record_statement(query, seconds: float, rows: int) -> None:
+    current = getattr(_local, 'current', None)
+    if current is None:
+        return
+    ms = seconds * 1000
+    current['queries'] += 1
+    current['db_ms'] += ms
+    current['rows'] += rows
+    sql = query.decode() if isinstance(query, bytes) else str(query)
+    current['statements'].append({'ms': round(ms, 3), 'rows': rows, 'sql': ' '.join(sql.split())[:SQL_PREVIEW]})
+
+
+def record_encode(seconds: float) -> None:
+    current = getattr(_local, 'current', None)
+    if current is not None:
+        current['encode_ms'] += seconds * 1000
+
+
+def call(path: str, func, params: dict) -> dict:
+    """
+    Вызов обработчика маршрута с замером: подключение, запросы, сериализация JSON.
+    Итог уходит в заголовок Server-Timing, в структурированную строку лога и в счётчики маршрута.
+    """
+    current = {'connect_ms': 0.0, 'queries': 0, 'db_ms': 0.0, 'rows': 0, 'encode_ms': 0.0, 'statements': []}
+    _local.current = current
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = func(params)
+        status = response['statusCode']
+    finally:
+        total_ms = (time.perf_counter() - started) * 1000
+        _local.current = None
+        _aggregate(path, status, total_ms, current)
+        print(json.dumps({
+            'event': 'api_request', 'route': path, 'status': status, 'total_ms': round(total_ms, 3),
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in current.items()},
+        }), flush=True)
+
+    timing = (f'total;dur={total_ms:.2f}, db;dur={current["db_ms"]:.2f};desc="{current["queries"]} queries", '
+              f'connect;dur={current["connect_ms"]:.2f}, encode;dur={current["encode_ms"]:.2f}')
+    return {**response, 'headers': {**response['headers'], 'Server-Timing': timing, 'Timing-Allow-Origin': '*'}}
+
+
+def _aggregate(path: str, status: int, total_ms: float, current: dict) -> None:
+    with _lock:
+        route = _routes.setdefault(path, {
+            'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'db_ms': 0.0,
+            'connect_ms': 0.0, 'encode_ms': 0.0, 'queries': 0, 'rows': 0,
+        })
+        route['calls'] += 1
+        route['errors'] += status >= 500
+        route['total_ms'] += total_ms
+        route['max_ms'] = max(route['max_ms'], total_ms)
+        for key in ('db_ms', 'connect_ms', 'encode_ms', 'queries', 'rows'):
+            route[key] += current[key]
+
+
+def metrics() -> dict:
+    """Накопленные счётчики маршрутов процесса со средними значениями на вызов"""
+    with _lock:
+        routes = {path: dict(route) for path, route in _routes.items()}
+    for route in routes.values():
+        calls = route['calls']
+        route['avg_ms'] = round(route['total_ms'] / calls, 3)
+        route['queries_per_call'] = round(route['queries'] / calls, 2)
+        for key in ('total_ms', 'max_ms', 'db_ms', 'connect_ms', 'encode_ms'):
+            route[key] = round(route[key], 3)
+    return {'enabled': ENABLED, 'routes': routes}
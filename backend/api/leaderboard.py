@@ -0,0 +1,92 @@
+from cache import invalidate_game_results
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+REFRESH_SQL = """
+    WITH changed AS (
+        SELECT id, total_games, total_wins,
+               ROUND((total_wins::numeric / total_games) * 100)::int AS win_rate
+        FROM users
+        WHERE id = ANY(%(user_ids)s) AND NOT is_bot AND total_games > 0
+    ), old AS (
+        SELECT user_id, total_wins, win_rate
+        FROM leaderboard
+        WHERE user_id = ANY(%(user_ids)s)
+        FOR UPDATE
+    ), upserted AS (
+        INSERT INTO leaderboard (user_id, total_games, total_wins, win_rate)
+        SELECT id, total_games, total_wins, win_rate FROM changed
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_games = EXCLUDED.total_games,
+            total_wins = EXCLUDED.total_wins,
+            win_rate = EXCLUDED.win_rate,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING total_wins, win_rate
+    ), deltas AS (
+        SELECT total_wins, win_rate, -1 AS delta FROM old
+        UNION ALL
+        SELECT total_wins, win_rate, 1 FROM upserted
+    )
+    INSERT INTO leaderboard_scores (total_wins, win_rate, users)
+    SELECT total_wins, win_rate, SUM(delta)
+    FROM deltas
+    GROUP BY total_wins, win_rate
+    ORDER BY total_wins, win_rate
+    ON CONFLICT (total_wins, win_rate) DO UPDATE SET users = leaderboard_scores.users + EXCLUDED.users
+"""
+
+PAGE_SQL = """
+    SELECT l.user_id AS id, u.username, l.total_games, l.total_wins, l.win_rate
+    FROM leaderboard l
+    JOIN users u ON u.id = l.user_id
+    {where}
+    ORDER BY l.total_wins DESC, l.win_rate DESC, l.user_id DESC
+    LIMIT %s OFFSET %s
+"""
+
+RANK_SQL = """
+    SELECT l.user_id, l.total_games, l.total_wins, l.win_rate,
+           1 + COALESCE((SELECT SUM(s.users) FROM leaderboard_scores s
+                         WHERE (s.total_wins, s.win_rate) > (l.total_wins, l.win_rate)), 0)::int AS rank
+    FROM leaderboard l
+    WHERE l.user_id = %s
+"""
+
+
+def refresh_leaderboard(cur, user_ids: list) -> None:
+    """
+    Перенос счётчиков users в рейтинг для игроков завершённой игры.
+    Боты и игроки без игр в рейтинг не попадают; гистограмма очков обновляется тем же запросом.
+    """
+    cur.execute(REFRESH_SQL, {'user_ids': list(user_ids)})
+    invalidate_game_results(user_ids)
+
+
+def parse_cursor(cursor: str) -> tuple[int, int, int]:
+    """Курсор страницы в виде 'total_wins.win_rate.user_id'"""
+    wins, rate, user_id = cursor.split('.')
+    return int(wins), int(rate), int(user_id)
+
+
+def make_cursor(entry: dict) -> str:
+    return f"{entry['total_wins']}.{entry['win_rate']}.{entry['id']}"
+
+
+def fetch_page(cur, limit: int, offset: int = 0, cursor: tuple | None = None) -> list[dict]:
+    """Страница рейтинга: индексный проход по idx_leaderboard_rank от курсора или смещения"""
+    if cursor is None:
+        cur.execute(PAGE_SQL.format(where=''), (limit, offset))
+    else:
+        cur.execute(
+            PAGE_SQL.format(where='WHERE (l.total_wins, l.win_rate, l.user_id) < (%s, %s, %s)'),
+            (*cursor, limit, offset)
+        )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def fetch_rank(cur, user_id) -> dict | None:
+    """Место игрока: сумма по гистограмме очков выше его результата"""
+    cur.execute(RANK_SQL, (user_id,))
+    row = cur.fetchone()
+    return dict(row) if row else None
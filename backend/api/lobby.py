@@ -0,0 +1,45 @@
+from datetime import datetime
+
+ROOMS_PAGE_SIZE = 50
+ROOMS_MAX_PAGE_SIZE = 100
+
+LIST_SQL = """
+    SELECT id, name, status, max_players, player_count, created_at
+    FROM rooms
+    WHERE {where}
+    ORDER BY created_at DESC, id DESC
+    LIMIT %(limit)s
+"""
+
+
+def parse_room_cursor(cursor: str) -> tuple[datetime, int]:
+    """Курсор страницы в виде 'created_at.id' последней комнаты предыдущей страницы"""
+    created_at, room_id = cursor.rsplit('.', 1)
+    return datetime.fromisoformat(created_at), int(room_id)
+
+
+def make_room_cursor(room: dict) -> str:
+    return f"{room['created_at'].isoformat()}.{room['id']}"
+
+
+def fetch_rooms(cur, limit: int, cursor: tuple | None = None, joinable: bool = False,
+                min_count: int | None = None, max_count: int | None = None, cap: int = 20) -> list[dict]:
+    """
+    Страница лобби от новых комнат к старым по частичным индексам на (created_at, id).
+    Число игроков берётся из счётчика rooms.player_count без соединения с room_players.
+    """
+    conditions = ["status = 'waiting' AND player_count < LEAST(max_players, %(cap)s)"
+                  if joinable else "status IN ('waiting', 'playing')"]
+    if min_count is not None:
+        conditions.append('player_count >= %(min_count)s')
+    if max_count is not None:
+        conditions.append('player_count <= %(max_count)s')
+    if cursor is not None:
+        conditions.append('(created_at, id) < (%(created_at)s, %(room_id)s)')
+
+    created_at, room_id = cursor or (None, None)
+    cur.execute(LIST_SQL.format(where=' AND '.join(conditions)), {
+        'limit': limit, 'cap': cap, 'min_count': min_count, 'max_count': max_count,
+        'created_at': created_at, 'room_id': room_id,
+    })
+    return [dict(row) for row in cur.fetchall()]
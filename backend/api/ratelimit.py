@@ -0,0 +1,157 @@
+"""
+Ограничение частоты изменяющих запросов корзинами токенов (token bucket) до вызова обработчика.
+Ключ корзины - маршрут (или общая корзина SHARED_BUCKETS) и пользователь проверенной сессии,
+без сессии - адрес клиента.
+Корзины процесса лежат в OrderedDict по давности использования: простоявшая дольше IDLE_SECONDS
+корзина уже полна и ничем не отличается от отсутствующей, поэтому удаляется.
+При RATE_LIMIT_BACKEND=postgres запрос, прошедший корзину процесса, списывает токен и из общей
+таблицы rate_limits - лимит один на все экземпляры функции. Отказ из корзины процесса не трогает базу.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db import get_db, release_db
+
+BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '20000'))
+# За NAT мобильного оператора с одного адреса ходит много игроков: лимит по адресу выше в IP_FACTOR раз
+IP_FACTOR = float(os.environ.get('RATE_LIMIT_IP_FACTOR', '5'))
+
+# Маршрут -> (токенов в секунду, ёмкость корзины) на пользователя
+ROUTE_LIMITS = {
+    'register': (0.05, 3),
+    'room/create': (0.1, 3),
+    'room/add-bot': (0.5, 5),
+    'game/vote': (1.0, 5),
+}
+# Маршруты, списывающие токены из корзины другого маршрута: голос уходит и через game/votes,
+# и через game/action с action_type='vote', а остальные ночные действия - те же вставки в game_actions
+SHARED_BUCKETS = {'game/votes': 'game/vote', 'game/action': 'game/vote'}
+IDLE_SECONDS = max(burst / rate for rate, burst in ROUTE_LIMITS.values())
+
+TAKE_SQL = """
+    INSERT INTO rate_limits AS b (key, tokens, updated_at)
+    VALUES (%(key)s, %(burst)s - 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (key) DO UPDATE
+    SET tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - b.updated_at) * %(rate)s) - 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE b.tokens + EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - b.updated_at) * %(rate)s >= 1
+    RETURNING tokens
+"""
+
+
+class TokenBuckets:
+    """Корзины в памяти процесса: ключ -> (токены, время обновления)"""
+
+    def __init__(self, maxsize: int, idle: float):
+        self.maxsize = maxsize
+        self.idle = idle
+        self.allowed = 0
+        self.limited = 0
+        self.expired = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Списание токена: 0, если запрос проходит, иначе сколько секунд ждать следующего токена"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            tokens = burst if entry is None else min(burst, entry[0] + (now - entry[1]) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / rate
+                self.limited += 1
+            self._data[key] = (tokens, now)
+            self._data.move_to_end(key)
+            self._expire(now)
+            return wait
+
+    def _expire(self, now: float) -> None:
+        """Снятие простоявших корзин с начала очереди и самых давних сверх maxsize"""
+        while self._data:
+            key, (_, updated) = next(iter(self._data.items()))
+            if updated >= now - self.idle:
+                break
+            del self._data[key]
+            self.expired += 1
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            'backend': BACKEND,
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+
+buckets = TokenBuckets(MAX_KEYS, IDLE_SECONDS)
+
+
+def check_rate_limit(path: str, user_id: int | None, ip: str | None) -> float:
+    """
+    0, если запрос к маршруту можно выполнять, иначе секунды до следующего токена.
+    Маршруты без лимита и вызовы без пользователя и адреса (локальные инструменты) не ограничиваются.
+    """
+    path = SHARED_BUCKETS.get(path, path)
+    limit = ROUTE_LIMITS.get(path)
+    if limit is None or BACKEND == 'off':
+        return 0.0
+    rate, burst = limit
+    if user_id is not None:
+        key = f'{path}:u{user_id}'
+    elif ip:
+        key = f'{path}:ip:{ip}'
+        rate, burst = rate * IP_FACTOR, burst * IP_FACTOR
+    else:
+        return 0.0
+
+    wait = buckets.take(key, rate, burst)
+    if not wait and BACKEND == 'postgres':
+        wait = shared_take(key, rate, burst)
+    return wait
+
+
+def shared_take(key: str, rate: float, burst: float) -> float:
+    """
+    Списание токена из общей корзины одним UPSERT на соединении пула, которое затем достаётся обработчику.
+    Если база недоступна или запрос к таблице не удался, решает корзина процесса.
+    """
+    import psycopg2
+
+    conn = None
+    try:
+        conn = get_db()
+        cur = conn.cursor()
+        cur.execute(TAKE_SQL, {'key': key, 'rate': rate, 'burst': burst})
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
+    except psycopg2.Error:
+        return 0.0
+    finally:
+        if conn is not None:
+            release_db(conn)
+    return 0.0 if row else 1 / rate
+
+
+def retry_after(wait: float) -> int:
+    """Значение Retry-After в целых секундах"""
+    return max(1, math.ceil(wait))
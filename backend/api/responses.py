@@ -0,0 +1,67 @@
+import hashlib
+import json
+import time
+import instrument
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Session-Token, If-None-Match'
+    },
+    'body': ''
+}
+
+
+def _encode(payload) -> str:
+    """Сериализация тела; при включённой инструментации замеряется время"""
+    if not instrument.ENABLED:
+        return json.dumps(payload, default=str)
+    started = time.perf_counter()
+    body = json.dumps(payload, default=str)
+    instrument.record_encode(time.perf_counter() - started)
+    return body
+
+
+def json_response(status: int, payload, headers: dict | None = None) -> dict:
+    """Ответ с JSON-телом и общими CORS-заголовками"""
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS if headers is None else {**JSON_HEADERS, **headers},
+        'body': _encode(payload)
+    }
+
+
+def etag_response(status: int, payload, headers: dict | None = None) -> dict:
+    """JSON-ответ с ETag по содержимому тела для условных запросов If-None-Match"""
+    body = _encode(payload)
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+    extra = {'ETag': etag, 'Access-Control-Expose-Headers': 'ETag'}
+    if headers:
+        extra.update(headers)
+        extra['Access-Control-Expose-Headers'] = ', '.join(['ETag', *headers])
+    return {'statusCode': status, 'headers': {**JSON_HEADERS, **extra}, 'body': body}
+
+
+def not_modified_response(etag: str) -> dict:
+    """Ответ 304 для совпавшего If-None-Match"""
+    return {'statusCode': 304, 'headers': {**JSON_HEADERS, 'ETag': etag}, 'body': ''}
+
+
+def error_response(status: int, message: str) -> dict:
+    """Ответ с ошибкой в формате {'error': ...}"""
+    return json_response(status, {'error': message})
+
+
+def too_many_requests_response(retry_after: int) -> dict:
+    """Ответ 429 с Retry-After, доступным клиенту через CORS"""
+    return json_response(429, {'error': 'Too many requests', 'retry_after': retry_after},
+                         {'Retry-After': str(retry_after), 'Access-Control-Expose-Headers': 'Retry-After'})
+
+
+NOT_FOUND_RESPONSE = error_response(404, 'Endpoint not found')
+
+NOT_MODIFIED_RESPONSE = {'statusCode': 304, 'headers': JSON_HEADERS, 'body': ''}
@@ -0,0 +1,55 @@
+import select
+import time
+
+ROOM_EVENTS_CHANNEL = 'room_events'
+# Виды событий в payload NOTIFY: шлюз событий (gateway/) передаёт их клиентам как event SSE
+ROOM_EVENT_KINDS = ('join', 'bots', 'start', 'vote', 'action', 'phase', 'finish', 'update')
+LONG_POLL_MAX_WAIT = 25.0
+
+BUMP_VERSION_SQL = """
+    WITH room AS (
+        UPDATE rooms SET state_version = state_version + 1
+        WHERE id = %(room_id)s
+        RETURNING id, state_version, pg_notify(%(channel)s, id || ':' || state_version || ':' || %(kind)s)
+    ), players AS (
+        UPDATE room_players SET state_version = room.state_version
+        FROM room
+        WHERE room_players.room_id = room.id AND room_players.id = ANY(%(player_ids)s)
+    )
+    SELECT state_version FROM room
+"""
+
+
+def bump_state_version(cur, room_id, player_ids: list | tuple = (), kind: str = 'update') -> int | None:
+    """
+    Увеличение версии комнаты и пометка изменённых игроков.
+    NOTIFY с payload 'room_id:version:kind' уходит подписчикам при коммите транзакции.
+    """
+    cur.execute(BUMP_VERSION_SQL, {'room_id': room_id, 'channel': ROOM_EVENTS_CHANNEL, 'player_ids': list(player_ids),
+                                   'kind': kind})
+    row = cur.fetchone()
+    return row['state_version'] if row else None
+
+
+def parse_room_event(payload: str) -> tuple[int, int, str]:
+    """Разбор payload 'room_id:version:kind'; у старого формата 'room_id:version' вид события 'update'"""
+    room_id, version, kind = (payload.split(':', 2) + ['update'])[:3]
+    return int(room_id), int(version), kind
+
+
+def wait_for_room_change(conn, room_id, since: int, timeout: float) -> bool:
+    """Ожидание NOTIFY о версии комнаты новее since; соединение уже выполнило LISTEN"""
+    room_id = int(room_id)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        if select.select([conn], [], [], remaining) == ([], [], []):
+            return False
+        conn.poll()
+        while conn.notifies:
+            room, version, _ = parse_room_event(conn.notifies.pop(0).payload)
+            if room == room_id and version > since:
+                return True
@@ -0,0 +1,109 @@
+import json
+import instrument
+from ratelimit import check_rate_limit, retry_after
+from responses import NOT_FOUND_RESPONSE, error_response, not_modified_response, too_many_requests_response
+from session import SESSION_SECRET, session_expired, verify_session
+
+ROUTES = {}
+ASYNC_ROUTES = {}
+SESSION_ROUTES = set()
+SESSION_REQUIRED_RESPONSE = error_response(401, 'Session required')
+
+
+def route(method: str, path: str, required: tuple = (), optional: tuple = (), error: str = '',
+          session: bool = False):
+    """
+    Регистрация обработчика маршрута.
+    Поля берутся из тела запроса для POST и из query-параметров для GET.
+    Если обязательное поле пустое, возвращается 400 с текстом error.
+    Если запрос несёт X-Session-Token, обработчик получает проверенный params['session_user_id'];
+    истёкший токен с верной подписью равносилен его отсутствию, поддельный - ответ 401.
+    Маршрут с session=True при заданном SESSION_SECRET без действующей сессии отвечает 401.
+    Лимиты частоты маршрутов - ratelimit.ROUTE_LIMITS.
+    """
+    def register(func):
+        ROUTES[(method, path)] = (func, required, optional, error_response(400, error))
+        if session:
+            SESSION_ROUTES.add((method, path))
+        return func
+    return register
+
+
+def async_route(method: str, path: str):
+    """Асинхронный вариант уже зарегистрированного маршрута с теми же полями и текстом ошибки (см. aio.py)"""
+    def register(func):
+        ASYNC_ROUTES[(method, path)] = (func, *ROUTES[(method, path)][1:])
+        return func
+    return register
+
+
+def dispatch(event: dict) -> dict:
+    """Поиск маршрута по (method, path), разбор параметров и вызов обработчика"""
+    func, params = parse(event, ROUTES)
+    if func is None:
+        return params
+
+    path = event['queryStringParameters']['path']
+    response = instrument.call(path, func, params) if instrument.ENABLED else func(params)
+    return conditional(event, response)
+
+
+def parse(event: dict, routes: dict) -> tuple:
+    """
+    Маршрут и параметры запроса: (обработчик, params).
+    Если маршрута нет, поле не заполнено, сессия не прошла проверку или исчерпан лимит частоты -
+    (None, ответ с ошибкой). Лимит проверяется до разбора тела и до обращения обработчика к базе.
+    """
+    method = event.get('httpMethod', 'GET')
+    query = event.get('queryStringParameters') or {}
+
+    entry = routes.get((method, query.get('path', '')))
+    if entry is None:
+        return None, NOT_FOUND_RESPONSE
+
+    func, required, optional, missing_response = entry
+    headers = event.get('headers') or {}
+    session_user_id = None
+    token = _header(headers, 'X-Session-Token')
+    if token and not session_expired(token):
+        session_user_id = verify_session(token)
+        claimed = _header(headers, 'X-User-Id')
+        if session_user_id is None or (claimed and claimed != str(session_user_id)):
+            return None, error_response(401, 'Invalid session')
+
+    wait = check_rate_limit(query['path'], session_user_id, _client_ip(event))
+    if wait:
+        return None, too_many_requests_response(retry_after(wait))
+
+    source = json.loads(event.get('body') or '{}') if method == 'POST' else query
+
+    params = {}
+    for field in required:
+        value = source.get(field)
+        if not value:
+            return None, missing_response
+        params[field] = value
+    for field in optional:
+        if field in source:
+            params[field] = source[field]
+    if session_user_id is None and SESSION_SECRET and (method, query['path']) in SESSION_ROUTES:
+        return None, SESSION_REQUIRED_RESPONSE
+    if session_user_id is not None:
+        params['session_user_id'] = session_user_id
+    return func, params
+
+
+def conditional(event: dict, response: dict) -> dict:
+    """Ответ 304, если ETag ответа совпал с If-None-Match запроса"""
+    etag = response['headers'].get('ETag')
+    if etag is not None and etag == _header(event.get('headers') or {}, 'If-None-Match'):
+        return not_modified_response(etag)
+    return response
+
+
+def _header(headers: dict, name: str) -> str | None:
+    return headers.get(name) or headers.get(name.lower())
+
+
+def _client_ip(event: dict) -> str | None:
+    return ((event.get('requestContext') or {}).get('identity') or {}).get('sourceIp')
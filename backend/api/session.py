@@ -0,0 +1,55 @@
+import base64
+import hashlib
+import hmac
+import os
+import time
+from functools import lru_cache
+
+SESSION_SECRET = os.environ.get('SESSION_SECRET', '')
+SESSION_TTL = int(os.environ.get('SESSION_TTL', '3600'))
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(SESSION_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def issue_session(user_id: int) -> tuple[str, int] | None:
+    """Подписанный токен сессии 'user_id.expires.signature' или None, если SESSION_SECRET не задан"""
+    if not SESSION_SECRET:
+        return None
+    expires = int(time.time()) + SESSION_TTL
+    payload = f'{user_id}.{expires}'
+    return f'{payload}.{_sign(payload)}', expires
+
+
+@lru_cache(maxsize=4096)
+def _signature_ok(token: str) -> bool:
+    """Проверка подписи; повторные запросы с тем же токеном не пересчитывают HMAC"""
+    payload, _, signature = token.rpartition('.')
+    return hmac.compare_digest(_sign(payload), signature)
+
+
+def _parts(token: str) -> list[str] | None:
+    parts = token.split('.')
+    if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+        return None
+    return parts
+
+
+def verify_session(token: str) -> int | None:
+    """user_id из действующего токена сессии, иначе None"""
+    if not SESSION_SECRET:
+        return None
+    parts = _parts(token)
+    if parts is None or int(parts[1]) < time.time():
+        return None
+    return int(parts[0]) if _signature_ok(token) else None
+
+
+def session_expired(token: str) -> bool:
+    """Токен подписан этим сервером, но срок его действия истёк"""
+    if not SESSION_SECRET:
+        return False
+    parts = _parts(token)
+    return parts is not None and int(parts[1]) < time.time() and _signature_ok(token)
@@ -0,0 +1,83 @@
+from collections import Counter
+
+from engine import faction_of
+from events import ACTION_CODE, EventType, decode
+from leaderboard import refresh_leaderboard
+
+# Журнал партии пишет только сервер (game/start и game/advance), в отличие от строк game_actions
+JOURNAL_SQL = "SELECT string_agg(events, ''::bytea ORDER BY seq) AS events FROM game_events WHERE room_id = %s"
+
+FINALIZE_SQL = """
+    WITH outcome AS (
+        SELECT *
+        FROM unnest(%(user_ids)s::int[], %(won)s::boolean[], %(survived)s::boolean[], %(kills)s::int[],
+                    %(catches)s::int[]) AS o(user_id, won, survived, kills, catches)
+    ), counted AS (
+        UPDATE users u
+        SET total_games = u.total_games + 1,
+            total_wins = u.total_wins + o.won::int,
+            survive_streak = CASE WHEN o.survived THEN u.survive_streak + 1 ELSE 0 END,
+            total_kills = u.total_kills + o.kills,
+            mafia_caught = u.mafia_caught + o.catches,
+            updated_at = CURRENT_TIMESTAMP
+        FROM outcome o
+        WHERE u.id = o.user_id AND NOT u.is_bot
+        RETURNING u.id, u.total_wins, u.survive_streak, u.total_kills, u.mafia_caught
+    ), progress AS (
+        SELECT id AS user_id, 'total_wins' AS requirement_type, total_wins AS value FROM counted
+        UNION ALL SELECT id, 'survive_streak', survive_streak FROM counted
+        UNION ALL SELECT id, 'first_kill', total_kills FROM counted
+        UNION ALL SELECT id, 'catch_mafia', mafia_caught FROM counted
+    ), unlocked AS (
+        INSERT INTO user_achievements (user_id, achievement_id)
+        SELECT p.user_id, a.id
+        FROM progress p
+        JOIN achievements a ON a.requirement_type = p.requirement_type AND a.requirement_value <= p.value
+        ORDER BY p.user_id, a.id
+        ON CONFLICT (user_id, achievement_id) DO NOTHING
+        RETURNING user_id, achievement_id
+    )
+    SELECT ARRAY(SELECT id FROM counted ORDER BY id) AS user_ids,
+           COALESCE((SELECT json_agg(json_build_object('user_id', user_id, 'achievement_id', achievement_id)
+                                     ORDER BY user_id, achievement_id)
+                     FROM unlocked), '[]') AS unlocked
+"""
+
+
+def finalize_game(cur, room_id, winner: str, players: list[dict], alive) -> list[dict]:
+    """
+    Итоги завершённой игры: счётчики users одним UPDATE по всем игрокам, затем массовая выдача достижений
+    и обновление рейтинга. Убийства и раскрытия мафии берутся из исходов движка в журнале партии.
+    Три запроса на игру при любом числе игроков; боты не учитываются.
+    Возвращает только что открытые достижения [{'user_id', 'achievement_id'}].
+    """
+    humans = [p for p in players if not p['is_bot']]
+    if not humans:
+        return []
+
+    kills, catches = journal_outcomes(cur, room_id)
+    cur.execute(FINALIZE_SQL, {
+        'user_ids': [p['user_id'] for p in humans],
+        'won': [faction_of(p['role']) == winner for p in humans],
+        'survived': [p['user_id'] in alive for p in humans],
+        'kills': [kills[p['user_id']] for p in humans],
+        'catches': [catches[p['user_id']] for p in humans],
+    })
+    row = cur.fetchone()
+    refresh_leaderboard(cur, row['user_ids'])
+    return row['unlocked']
+
+
+def journal_outcomes(cur, room_id) -> tuple[Counter, Counter]:
+    """Убийства и раскрытия мафии по игрокам из событий OUTCOME журнала партии"""
+    cur.execute(JOURNAL_SQL, (room_id,))
+    row = cur.fetchone()
+    kills, catches = Counter(), Counter()
+    for event in decode(bytes(row['events'] or b'')):
+        if event.type != EventType.OUTCOME:
+            continue
+        if event.arg == ACTION_CODE['killed']:
+            kills[event.actor] += 1
+        elif event.arg == ACTION_CODE['reveal_mafia']:
+            catches[event.actor] += 1
+    return kills, catches
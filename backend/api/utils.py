@@ -1,59 +1,107 @@
 import random
+import secrets
+from functools import lru_cache
 
-def assign_roles(player_count: int) -> list[str]:
+MAX_TABLE_PLAYERS = 20
+
+ROLES = ('citizen', 'mafia', 'lawyer', 'maniac', 'suicide', 'doctor', 'commissar',
+         'sergeant', 'prostitute', 'homeless', 'lucky', 'kamikaze')
+
+# Наборы ролей: (с какого числа игроков роль входит в состав, роль) и роли для добора свободных мест.
+# После добора оставшиеся места - мирные жители. Мафии всегда max(1, игроки // 4).
+ROLE_SETS = {
+    'classic': (
+        ((4, 'doctor'), (5, 'commissar'), (6, 'maniac'), (7, 'prostitute'), (8, 'lucky'),
+         (9, 'sergeant'), (10, 'homeless'), (11, 'lawyer'), (12, 'suicide'), (13, 'kamikaze')),
+        ('doctor', 'commissar', 'lucky', 'sergeant'),
+    ),
+    'extended': (
+        ((4, 'doctor'), (5, 'commissar'), (6, 'maniac'), (7, 'lawyer'), (9, 'prostitute'),
+         (9, 'lucky'), (10, 'suicide'), (11, 'kamikaze'), (12, 'sergeant'), (13, 'homeless')),
+        (),
+    ),
+}
+DEFAULT_ROLE_SET = 'classic'
+
+def _role_table(player_count: int, role_set: str = DEFAULT_ROLE_SET) -> tuple[str, ...]:
     """
-    Распределение ролей на основе количества игроков.
-    Минимум: 4 игрока (1 мафия, 2 мирных, 1 доктор).
+    Состав ролей на основе количества игроков и набора ролей, без перемешивания.
+    Минимум: 4 игрока (1 мафия, доктор и мирные).
     С ростом числа игроков добавляются новые роли.
     Одинаковых ролей может быть несколько.
     """
-    
+
     if player_count < 4:
         raise ValueError("Минимум 4 игрока для начала игры")
-    
-    roles = []
-    
-    mafia_count = max(1, player_count // 4)
-    roles.extend(['mafia'] * mafia_count)
-    
-    roles.append('doctor')
-    
-    if player_count >= 5:
-        roles.append('commissar')
-    
-    if player_count >= 6:
-        roles.append('maniac')
-    
-    if player_count >= 7:
-        roles.append('prostitute')
-    
-    if player_count >= 8:
-        roles.append('lucky')
-    
-    if player_count >= 9:
-        roles.append('sergeant')
-    
-    if player_count >= 10:
-        roles.append('homeless')
-    
-    if player_count >= 11:
-        roles.append('lawyer')
-    
-    if player_count >= 12:
-        roles.append('suicide')
-    
-    if player_count >= 13:
-        roles.append('kamikaze')
-    
+
+    unlocks, fill = ROLE_SETS[role_set]
+
+    roles = ['mafia'] * max(1, player_count // 4)
+    roles.extend(role for min_players, role in unlocks if player_count >= min_players)
+
     remaining = player_count - len(roles)
-    
-    if remaining > 0:
-        special_roles = ['doctor', 'commissar', 'lucky', 'sergeant']
-        for i in range(remaining):
-            if i < len(special_roles):
-                roles.append(special_roles[i])
-            else:
-                roles.append('citizen')
-    
-    random.shuffle(roles)
+    roles.extend(fill[:remaining])
+    roles.extend(['citizen'] * (player_count - len(roles)))
+
+    return tuple(roles)
+
+ROLE_TABLES = {
+    (role_set, n): _role_table(n, role_set)
+    for role_set in ROLE_SETS
+    for n in range(4, MAX_TABLE_PLAYERS + 1)
+}
+
+def normalize_role_limits(limits: dict | None) -> dict[str, int] | None:
+    """
+    Проверка ограничений числа ролей вида {'doctor': 1, 'maniac': 0}.
+    Лишние роли сверх ограничения становятся мирными, поэтому ограничивать citizen нельзя,
+    а мафия должна остаться хотя бы одна.
+    """
+    if not limits:
+        return None
+    if not isinstance(limits, dict):
+        raise ValueError("role_limits должен быть объектом {роль: максимум}")
+
+    normalized = {}
+    for role, limit in limits.items():
+        if role not in ROLES or role == 'citizen':
+            raise ValueError(f"Нельзя ограничить роль {role}")
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+            raise ValueError(f"Ограничение роли {role} должно быть целым числом от 0")
+        normalized[role] = limit
+
+    if normalized.get('mafia', 1) < 1:
+        raise ValueError("В игре должна быть хотя бы одна мафия")
+    return normalized
+
+@lru_cache(maxsize=256)
+def _limited_table(player_count: int, role_set: str, limits: tuple) -> tuple[str, ...]:
+    caps = dict(limits)
+    counts = {}
+    roles = []
+    for role in role_table(player_count, role_set):
+        counts[role] = counts.get(role, 0) + 1
+        roles.append(role if counts[role] <= caps.get(role, player_count) else 'citizen')
+    return tuple(roles)
+
+def role_table(player_count: int, role_set: str = DEFAULT_ROLE_SET, role_limits: dict | None = None) -> tuple[str, ...]:
+    """Состав ролей без перемешивания: готовая таблица для 4-20 игроков или расчёт для остальных"""
+    if role_set not in ROLE_SETS:
+        raise ValueError(f"Неизвестный набор ролей {role_set}")
+    if role_limits:
+        return _limited_table(player_count, role_set, tuple(sorted(role_limits.items())))
+    return ROLE_TABLES.get((role_set, player_count)) or _role_table(player_count, role_set)
+
+def new_role_seed() -> int:
+    """Seed перемешивания ролей партии; помещается в BIGINT"""
+    return secrets.randbits(63)
+
+def assign_roles(player_count: int, seed: int | None = None, role_set: str = DEFAULT_ROLE_SET,
+                 role_limits: dict | None = None) -> list[str]:
+    """
+    Роли для игроков в случайном порядке.
+    С seed порядок воспроизводим: тот же seed, набор и порядок мест дают те же роли.
+    """
+    roles = list(role_table(player_count, role_set, role_limits))
+    (random if seed is None else random.Random(seed)).shuffle(roles)
     return roles
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+POOL_CHECK_AFTER = float(os.environ.get('DB_POOL_CHECK_AFTER', '30'))
+POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', '600'))
+
+_idle = []
+_lock = threading.Lock()
+_connection_class = None
+
+
+def _pooled_connection_class():
+    """
+    Класс соединения пула. Драйвер импортируется при первом обращении к базе,
+    чтобы холодный старт, OPTIONS и 404 не платили за загрузку psycopg2.
+    """
+    global _connection_class
+    if _connection_class is None:
+        from psycopg2 import extensions
+
+        class PooledConnection(extensions.connection):
+            """Соединение, помнящее время создания для ограничения срока жизни"""
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.created_at = time.monotonic()
+
+        _connection_class = PooledConnection
+    return _connection_class
+
+
+def __getattr__(name):
+    if name == 'PooledConnection':
+        return _pooled_connection_class()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def _connect():
+    """Новое соединение с базой данных"""
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    return psycopg2.connect(
+        os.environ['DATABASE_URL'],
+        connection_factory=_pooled_connection_class(),
+        cursor_factory=RealDictCursor,
+    )
+
+
+def _is_healthy(conn, idle_since: float) -> bool:
+    """Проверка соединения перед выдачей из пула"""
+    import psycopg2
+
+    if conn.closed:
+        return False
+    now = time.monotonic()
+    if now - conn.created_at > POOL_MAX_LIFETIME:
+        return False
+    if now - idle_since < POOL_CHECK_AFTER:
+        return True
+    try:
+        cur = conn.cursor()
+        cur.execute('SELECT 1')
+        cur.close()
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _discard(conn):
+    import psycopg2
+
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+
+def get_db():
+    """Соединение из пула, переживающего тёплые вызовы функции"""
+    while True:
+        with _lock:
+            if not _idle:
+                break
+            conn, idle_since = _idle.pop()
+        if _is_healthy(conn, idle_since):
+            return conn
+        _discard(conn)
+    return _connect()
+
+
+def release_db(conn):
+    """Возврат соединения в пул; сломанные и лишние соединения закрываются"""
+    import psycopg2
+    from psycopg2 import extensions
+
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _discard(conn)
+        return
+    with _lock:
+        if len(_idle) < POOL_MAX_SIZE:
+            _idle.append((conn, time.monotonic()))
+            return
+    _discard(conn)
+
+
+def close_pool():
+    """Закрытие всех простаивающих соединений"""
+    with _lock:
+        idle = _idle[:]
+        _idle.clear()
+    for conn, _ in idle:
+        _discard(conn)
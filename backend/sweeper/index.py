@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import time
+from psycopg2 import errors
+from db import get_db, release_db
+
+ROOM_EVENTS_CHANNEL = 'room_events'
+
+BATCH_SIZE = int(os.environ.get('SWEEPER_BATCH_SIZE', '500'))
+MAX_BATCHES = int(os.environ.get('SWEEPER_MAX_BATCHES', '100'))
+TIME_BUDGET = float(os.environ.get('SWEEPER_TIME_BUDGET', '25'))
+LOCK_TIMEOUT = os.environ.get('SWEEPER_LOCK_TIMEOUT', '2s')
+WAITING_IDLE_SECONDS = int(os.environ.get('SWEEPER_WAITING_IDLE_SECONDS', '1800'))
+STUCK_GAME_SECONDS = int(os.environ.get('SWEEPER_STUCK_GAME_SECONDS', '900'))
+ARCHIVE_AFTER_SECONDS = int(os.environ.get('SWEEPER_ARCHIVE_AFTER_SECONDS', '3600'))
+BOT_POOL_MIN_FREE = int(os.environ.get('SWEEPER_BOT_POOL_MIN_FREE', '200'))
+RATE_LIMIT_IDLE_SECONDS = int(os.environ.get('SWEEPER_RATE_LIMIT_IDLE_SECONDS', '600'))
+
+BOT_NAMES = ['Джонни', 'Винни', 'Тони', 'Рокки', 'Макс', 'Дюк', 'Спайк', 'Блейд', 'Рейдер', 'Вайпер',
+             'Харли', 'Чоппер', 'Револьвер', 'Дизель', 'Циклон', 'Гром', 'Стиль', 'Драйв', 'Буст', 'Нитро']
+
+# Событие GAME_OVER с ничьей в формате журнала backend/api/events.py (EVENT '<BBHiiB', 13 байт):
+# тип 7, фаза finished (4), круг (байты 2-3 подставляются в запросе), actor 0, target 0, победитель draw (4)
+GAME_OVER_DRAW_HEX = '07040000000000000000000004'
+
+FINISH_ROOMS_SQL = """
+    WITH batch AS (
+        SELECT id, status FROM rooms r
+        WHERE {where}
+        ORDER BY id
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    ), finished AS (
+        UPDATE rooms
+        SET status = 'finished', current_phase = 'finished', ended_at = CURRENT_TIMESTAMP,
+            phase_ends_at = NULL, state_version = rooms.state_version + 1
+        FROM batch
+        WHERE rooms.id = batch.id
+        RETURNING rooms.id, rooms.round, rooms.state_version, batch.status AS previous_status,
+                  pg_notify(%(channel)s, rooms.id || ':' || rooms.state_version || ':finish')
+    ), journaled AS (
+        INSERT INTO game_events (room_id, seq, events)
+        SELECT f.id, f.state_version,
+               set_byte(set_byte(decode(%(game_over)s, 'hex'), 2, COALESCE(f.round, 0) %% 256),
+                        3, COALESCE(f.round, 0) / 256)
+        FROM finished f
+        WHERE f.previous_status = 'playing' AND EXISTS (SELECT 1 FROM game_events e WHERE e.room_id = f.id)
+        ON CONFLICT DO NOTHING
+    )
+    SELECT id FROM finished
+"""
+
+IDLE_WAITING_WHERE = """
+    r.status = 'waiting'
+    AND r.created_at < CURRENT_TIMESTAMP - make_interval(secs => %(seconds)s)
+    AND NOT EXISTS (
+        SELECT 1 FROM room_players rp
+        WHERE rp.room_id = r.id AND rp.joined_at >= CURRENT_TIMESTAMP - make_interval(secs => %(seconds)s)
+    )
+"""
+
+STUCK_GAME_WHERE = """
+    r.status = 'playing'
+    AND COALESCE(r.phase_ends_at, r.started_at, r.created_at) < CURRENT_TIMESTAMP - make_interval(secs => %(seconds)s)
+"""
+
+ARCHIVE_SQL = """
+    WITH batch AS (
+        SELECT id FROM rooms
+        WHERE status = 'finished' AND ended_at < CURRENT_TIMESTAMP - make_interval(secs => %(seconds)s)
+        ORDER BY ended_at
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    ), actions AS (
+        DELETE FROM game_actions a USING batch WHERE a.room_id = batch.id RETURNING a.*
+    ), archived_actions AS (
+        INSERT INTO game_actions_archive SELECT * FROM actions RETURNING 1
+    ), events AS (
+        DELETE FROM game_events e USING batch WHERE e.room_id = batch.id RETURNING e.*
+    ), archived_events AS (
+        INSERT INTO game_events_archive SELECT * FROM events RETURNING 1
+    ), players AS (
+        DELETE FROM room_players p USING batch WHERE p.room_id = batch.id RETURNING p.*
+    ), archived_players AS (
+        INSERT INTO room_players_archive SELECT * FROM players RETURNING 1
+    ), gone AS (
+        DELETE FROM rooms r USING batch WHERE r.id = batch.id RETURNING r.*
+    ), archived_rooms AS (
+        INSERT INTO rooms_archive SELECT * FROM gone RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM archived_rooms) AS rooms,
+           (SELECT COUNT(*) FROM archived_players) AS players,
+           (SELECT COUNT(*) FROM archived_actions) AS actions,
+           (SELECT COUNT(*) FROM archived_events) AS event_chunks
+"""
+
+PURGE_BOTS_SQL = """
+    WITH batch AS (
+        SELECT id FROM users u
+        WHERE u.is_bot
+          AND NOT EXISTS (SELECT 1 FROM room_players rp WHERE rp.user_id = u.id)
+          AND NOT EXISTS (SELECT 1 FROM bot_pool bp WHERE bp.user_id = u.id)
+        ORDER BY id
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM users USING batch WHERE users.id = batch.id
+    RETURNING users.id
+"""
+
+RETURN_BOTS_SQL = """
+    WITH batch AS (
+        SELECT user_id FROM bot_pool bp
+        WHERE bp.room_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM rooms r WHERE r.id = bp.room_id AND r.status <> 'finished')
+        ORDER BY user_id
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE bot_pool SET room_id = NULL, leased_at = NULL
+    FROM batch
+    WHERE bot_pool.user_id = batch.user_id
+    RETURNING bot_pool.user_id
+"""
+
+TOP_UP_BOTS_SQL = """
+    WITH pool AS (
+        SELECT COUNT(*) AS total, COUNT(*) FILTER (WHERE room_id IS NULL) AS free FROM bot_pool
+    ), bots AS (
+        INSERT INTO users (username, is_bot)
+        SELECT (%(names)s::varchar[])[1 + n %% %(name_count)s] ||
+               CASE WHEN n >= %(name_count)s THEN ' ' || (n / %(name_count)s + 1) ELSE '' END, true
+        FROM pool, generate_series(pool.total, pool.total + LEAST(%(min_free)s - pool.free, %(batch_size)s) - 1) n
+        ORDER BY n
+        RETURNING id
+    )
+    INSERT INTO bot_pool (user_id)
+    SELECT id FROM bots
+    RETURNING user_id
+"""
+
+# Корзина, простоявшая дольше времени полного пополнения, равна отсутствующей (backend/api/ratelimit.py)
+EXPIRE_RATE_LIMITS_SQL = """
+    WITH batch AS (
+        SELECT key FROM rate_limits
+        WHERE updated_at < CURRENT_TIMESTAMP - make_interval(secs => %(seconds)s)
+        ORDER BY updated_at
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM rate_limits USING batch WHERE rate_limits.key = batch.key
+    RETURNING rate_limits.key
+"""
+
+
+def handler(event: dict, context) -> dict:
+    """Плановая уборка: брошенные комнаты, архив завершённых, пул ботов и простаивающие корзины лимитов"""
+    params = (event or {}).get('queryStringParameters') or {}
+    try:
+        batch_size = int(params.get('batch_size', BATCH_SIZE))
+        max_batches = int(params.get('max_batches', MAX_BATCHES))
+    except ValueError:
+        return _response(400, {'error': 'Invalid batch_size or max_batches'})
+
+    try:
+        return _response(200, sweep(batch_size, max_batches))
+    except Exception as e:
+        return _response(500, {'error': str(e)})
+
+
+def _response(status: int, payload: dict) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps(payload)
+    }
+
+
+def sweep(batch_size: int = BATCH_SIZE, max_batches: int = MAX_BATCHES, time_budget: float = TIME_BUDGET) -> dict:
+    """
+    Все шаги уборки пачками по batch_size строк, каждая пачка - отдельная короткая транзакция.
+    Строки, занятые живыми запросами, пропускаются (SKIP LOCKED) и достаются следующему запуску.
+    """
+    deadline = time.monotonic() + time_budget
+    stats = {'timed_out': 0, 'stuck_finished': 0, 'archived_rooms': 0, 'archived_players': 0,
+             'archived_actions': 0, 'archived_event_chunks': 0, 'bots_returned': 0, 'bots_purged': 0,
+             'bots_provisioned': 0, 'rate_limits_expired': 0, 'batches': 0, 'lock_timeouts': 0}
+
+    conn = get_db()
+    try:
+        steps = (
+            ('timed_out', FINISH_ROOMS_SQL.format(where=IDLE_WAITING_WHERE), WAITING_IDLE_SECONDS),
+            ('stuck_finished', FINISH_ROOMS_SQL.format(where=STUCK_GAME_WHERE), STUCK_GAME_SECONDS),
+            ('archived_rooms', ARCHIVE_SQL, ARCHIVE_AFTER_SECONDS),
+            ('bots_returned', RETURN_BOTS_SQL, 0),
+            ('bots_purged', PURGE_BOTS_SQL, 0),
+            ('bots_provisioned', TOP_UP_BOTS_SQL, 0),
+            ('rate_limits_expired', EXPIRE_RATE_LIMITS_SQL, RATE_LIMIT_IDLE_SECONDS),
+        )
+        for key, sql, seconds in steps:
+            for _ in range(max_batches):
+                if time.monotonic() > deadline:
+                    stats['stopped_early'] = True
+                    return stats
+                done = _run_batch(conn, sql, {
+                    'batch_size': batch_size, 'seconds': seconds, 'channel': ROOM_EVENTS_CHANNEL,
+                    'names': BOT_NAMES, 'name_count': len(BOT_NAMES), 'min_free': BOT_POOL_MIN_FREE,
+                    'game_over': GAME_OVER_DRAW_HEX,
+                }, key, stats)
+                if done < batch_size:
+                    break
+    finally:
+        release_db(conn)
+    return stats
+
+
+def _run_batch(conn, sql: str, params: dict, key: str, stats: dict) -> int:
+    """Одна пачка в своей транзакции; при ожидании блокировки дольше LOCK_TIMEOUT пачка откатывается"""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT set_config('lock_timeout', %s, true)", (LOCK_TIMEOUT,))
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        conn.commit()
+    except errors.LockNotAvailable:
+        conn.rollback()
+        stats['lock_timeouts'] += 1
+        return 0
+    finally:
+        cur.close()
+
+    stats['batches'] += 1
+    if key == 'archived_rooms':
+        row = rows[0]
+        stats['archived_rooms'] += row['rooms']
+        stats['archived_players'] += row['players']
+        stats['archived_actions'] += row['actions']
+        stats['archived_event_chunks'] += row['event_chunks']
+        return row['rooms']
+    stats[key] += len(rows)
+    return len(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Уборка комнат и ботов: DATABASE_URL=... python index.py')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--max-batches', type=int, default=MAX_BATCHES)
+    parser.add_argument('--time-budget', type=float, default=TIME_BUDGET)
+    args = parser.parse_args()
+    print(json.dumps(sweep(args.batch_size, args.max_batches, args.time_budget), indent=2))
@@ -2,35 +2,51 @@ import json
 import os
 import hmac
 import hashlib
+from functools import lru_cache
 from urllib.parse import unquote
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from db import get_db, release_db
+from session import issue_session
 
-def get_db():
-    """Подключение к базе данных"""
-    return psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=RealDictCursor)
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type'
+    },
+    'body': ''
+}
+
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'})
+}
+
+UPSERT_USER_SQL = """
+    INSERT INTO users (telegram_id, username, avatar_url)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (telegram_id) DO UPDATE
+    SET username = EXCLUDED.username, avatar_url = EXCLUDED.avatar_url, updated_at = CURRENT_TIMESTAMP
+    RETURNING id, username, total_games, total_wins
+"""
+
+@lru_cache(maxsize=4)
+def _secret_key(bot_token: str) -> bytes:
+    """Ключ проверки подписи Telegram, вычисляется один раз на процесс"""
+    return hashlib.sha256(bot_token.encode()).digest()
 
 def handler(event: dict, context) -> dict:
     """Telegram авторизация через Telegram Login Widget"""
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': ''
-        }
+        return PREFLIGHT_RESPONSE
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return METHOD_NOT_ALLOWED_RESPONSE
     
     try:
         body = json.loads(event.get('body', '{}'))
@@ -38,7 +54,7 @@ def handler(event: dict, context) -> dict:
     except Exception as e:
         return {
             'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'headers': JSON_HEADERS,
             'body': json.dumps({'error': str(e)})
         }
 
@@ -48,7 +64,7 @@ def verify_telegram_auth(data: dict) -> dict:
     if not bot_token:
         return {
             'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'headers': JSON_HEADERS,
             'body': json.dumps({'error': 'Bot token not configured'})
         }
     
@@ -56,19 +72,18 @@ def verify_telegram_auth(data: dict) -> dict:
     if not received_hash:
         return {
             'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'headers': JSON_HEADERS,
             'body': json.dumps({'error': 'Hash missing'})
         }
     
     data_check_string = '\n'.join([f'{k}={v}' for k, v in sorted(data.items())])
     
-    secret_key = hashlib.sha256(bot_token.encode()).digest()
-    calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    calculated_hash = hmac.new(_secret_key(bot_token), data_check_string.encode(), hashlib.sha256).hexdigest()
     
-    if calculated_hash != received_hash:
+    if not hmac.compare_digest(calculated_hash, str(received_hash)):
         return {
             'statusCode': 401,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'headers': JSON_HEADERS,
             'body': json.dumps({'error': 'Invalid authentication'})
         }
     
@@ -83,28 +98,19 @@ def verify_telegram_auth(data: dict) -> dict:
     conn = get_db()
     cur = conn.cursor()
     
-    cur.execute("SELECT id, username, total_games, total_wins FROM users WHERE telegram_id = %s", (telegram_id,))
-    user = cur.fetchone()
-    
-    if user:
-        cur.execute(
-            "UPDATE users SET username = %s, avatar_url = %s, updated_at = CURRENT_TIMESTAMP WHERE telegram_id = %s RETURNING id, username, total_games, total_wins",
-            (full_name, photo_url, telegram_id)
-        )
-        user = cur.fetchone()
-    else:
-        cur.execute(
-            "INSERT INTO users (telegram_id, username, avatar_url) VALUES (%s, %s, %s) RETURNING id, username, total_games, total_wins",
-            (telegram_id, full_name, photo_url)
-        )
-        user = cur.fetchone()
+    cur.execute(UPSERT_USER_SQL, (telegram_id, full_name, photo_url))
+    user = dict(cur.fetchone())
     
     conn.commit()
     cur.close()
-    conn.close()
+    release_db(conn)
+    
+    session = issue_session(user['id'])
+    if session:
+        user['session_token'], user['session_expires_at'] = session
     
     return {
         'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps(dict(user))
+        'headers': JSON_HEADERS,
+        'body': json.dumps(user)
     }
@@ -0,0 +1,8 @@
+ALTER TABLE t_p97186151_mafia_mobile_version.rooms
+ADD COLUMN state_version BIGINT DEFAULT 1 NOT NULL;
+
+ALTER TABLE t_p97186151_mafia_mobile_version.room_players
+ADD COLUMN state_version BIGINT DEFAULT 1 NOT NULL;
+
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.rooms.state_version IS 'Монотонная версия состояния комнаты, растёт при каждом изменении';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.room_players.state_version IS 'Версия комнаты, в которой запись игрока изменилась последний раз';
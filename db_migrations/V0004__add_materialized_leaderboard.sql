@@ -0,0 +1,39 @@
+ALTER TABLE t_p97186151_mafia_mobile_version.users
+ADD COLUMN is_bot BOOLEAN DEFAULT false NOT NULL;
+
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.users.is_bot IS 'Пользователь-бот, не участвует в рейтинге';
+
+UPDATE t_p97186151_mafia_mobile_version.users SET is_bot = true
+WHERE id IN (SELECT user_id FROM t_p97186151_mafia_mobile_version.room_players WHERE is_bot);
+
+-- Precomputed leaderboard: one row per ranked (non-bot) user
+CREATE TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.leaderboard (
+    user_id INT PRIMARY KEY REFERENCES t_p97186151_mafia_mobile_version.users(id),
+    total_games INT NOT NULL,
+    total_wins INT NOT NULL,
+    win_rate INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_leaderboard_rank
+ON t_p97186151_mafia_mobile_version.leaderboard (total_wins, win_rate, user_id);
+
+-- Number of ranked users per distinct score, used for "my rank" lookups
+CREATE TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.leaderboard_scores (
+    total_wins INT NOT NULL,
+    win_rate INT NOT NULL,
+    users INT NOT NULL,
+    PRIMARY KEY (total_wins, win_rate)
+);
+
+INSERT INTO t_p97186151_mafia_mobile_version.leaderboard (user_id, total_games, total_wins, win_rate)
+SELECT id, total_games, total_wins, ROUND((total_wins::numeric / total_games) * 100)::int
+FROM t_p97186151_mafia_mobile_version.users
+WHERE total_games > 0 AND NOT is_bot
+ON CONFLICT DO NOTHING;
+
+INSERT INTO t_p97186151_mafia_mobile_version.leaderboard_scores (total_wins, win_rate, users)
+SELECT total_wins, win_rate, COUNT(*)
+FROM t_p97186151_mafia_mobile_version.leaderboard
+GROUP BY total_wins, win_rate
+ON CONFLICT DO NOTHING;
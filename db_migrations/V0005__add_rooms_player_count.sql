@@ -0,0 +1,7 @@
+ALTER TABLE t_p97186151_mafia_mobile_version.rooms
+ADD COLUMN player_count INT DEFAULT 0 NOT NULL;
+
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.rooms.player_count IS 'Число игроков в комнате, обновляется вместе со вставкой в room_players';
+
+UPDATE t_p97186151_mafia_mobile_version.rooms r
+SET player_count = (SELECT COUNT(*) FROM t_p97186151_mafia_mobile_version.room_players rp WHERE rp.room_id = r.id);
@@ -0,0 +1,12 @@
+ALTER TABLE t_p97186151_mafia_mobile_version.rooms
+ADD COLUMN round INT DEFAULT 0 NOT NULL;
+
+ALTER TABLE t_p97186151_mafia_mobile_version.game_actions
+ADD COLUMN round INT DEFAULT 0 NOT NULL;
+
+ALTER TABLE t_p97186151_mafia_mobile_version.room_players
+ADD COLUMN luck_used BOOLEAN DEFAULT false NOT NULL;
+
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.rooms.round IS 'Номер игрового круга (ночь-день-голосование)';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.game_actions.round IS 'Круг, в котором совершено действие';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.room_players.luck_used IS 'Везунчик уже пережил покушение';
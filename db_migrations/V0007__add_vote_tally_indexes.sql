@@ -0,0 +1,17 @@
+-- Keep only the latest vote of each player per round before enforcing one vote per round
+DELETE FROM t_p97186151_mafia_mobile_version.game_actions a
+USING t_p97186151_mafia_mobile_version.game_actions b
+WHERE a.action_type = 'vote' AND b.action_type = 'vote'
+  AND a.room_id = b.room_id AND a.round = b.round AND a.actor_user_id = b.actor_user_id
+  AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_game_actions_vote
+ON t_p97186151_mafia_mobile_version.game_actions (room_id, round, actor_user_id)
+WHERE action_type = 'vote';
+
+CREATE INDEX IF NOT EXISTS idx_game_actions_vote_tally
+ON t_p97186151_mafia_mobile_version.game_actions (room_id, round, target_user_id)
+WHERE action_type = 'vote';
+
+CREATE INDEX IF NOT EXISTS idx_game_actions_phase
+ON t_p97186151_mafia_mobile_version.game_actions (room_id, round, game_phase);
@@ -0,0 +1,12 @@
+-- Lobby pages are keyset scans on (created_at, id) over active rooms only;
+-- INCLUDE lets the page be served from the index without touching the heap
+CREATE INDEX IF NOT EXISTS idx_rooms_active_list
+ON t_p97186151_mafia_mobile_version.rooms (created_at DESC, id DESC)
+INCLUDE (name, status, max_players, player_count)
+WHERE status IN ('waiting', 'playing');
+
+-- "Joinable only" filter: waiting rooms, fullness is checked against player_count from the index
+CREATE INDEX IF NOT EXISTS idx_rooms_waiting_list
+ON t_p97186151_mafia_mobile_version.rooms (created_at DESC, id DESC)
+INCLUDE (name, status, max_players, player_count)
+WHERE status = 'waiting';
@@ -0,0 +1,31 @@
+-- Archive tables for the sweeper: finished rooms are moved here with their players and actions.
+-- Columns mirror the live tables in the same order; new live columns must be added here as well.
+CREATE TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.rooms_archive
+    (LIKE t_p97186151_mafia_mobile_version.rooms);
+ALTER TABLE t_p97186151_mafia_mobile_version.rooms_archive ADD PRIMARY KEY (id);
+
+CREATE TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.room_players_archive
+    (LIKE t_p97186151_mafia_mobile_version.room_players);
+ALTER TABLE t_p97186151_mafia_mobile_version.room_players_archive ADD PRIMARY KEY (id);
+
+CREATE TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.game_actions_archive
+    (LIKE t_p97186151_mafia_mobile_version.game_actions);
+ALTER TABLE t_p97186151_mafia_mobile_version.game_actions_archive ADD PRIMARY KEY (id);
+
+CREATE INDEX IF NOT EXISTS idx_room_players_archive_room
+ON t_p97186151_mafia_mobile_version.room_players_archive (room_id);
+
+CREATE INDEX IF NOT EXISTS idx_game_actions_archive_room
+ON t_p97186151_mafia_mobile_version.game_actions_archive (room_id);
+
+-- Sweeper scans: finished rooms by age, bot users without a seat, seats by user
+CREATE INDEX IF NOT EXISTS idx_rooms_finished
+ON t_p97186151_mafia_mobile_version.rooms (ended_at)
+WHERE status = 'finished';
+
+CREATE INDEX IF NOT EXISTS idx_users_bots
+ON t_p97186151_mafia_mobile_version.users (id)
+WHERE is_bot;
+
+CREATE INDEX IF NOT EXISTS idx_room_players_user
+ON t_p97186151_mafia_mobile_version.room_players (user_id);
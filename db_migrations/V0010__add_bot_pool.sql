@@ -0,0 +1,30 @@
+-- Pre-provisioned bot identities leased by rooms instead of a new users row per added bot
+CREATE TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.bot_pool (
+    user_id INT PRIMARY KEY REFERENCES t_p97186151_mafia_mobile_version.users(id),
+    room_id INT,
+    leased_at TIMESTAMP
+);
+
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.bot_pool.room_id IS 'Комната, которая арендовала бота; NULL - бот свободен';
+
+CREATE INDEX IF NOT EXISTS idx_bot_pool_free
+ON t_p97186151_mafia_mobile_version.bot_pool (user_id)
+WHERE room_id IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_bot_pool_leased
+ON t_p97186151_mafia_mobile_version.bot_pool (room_id)
+WHERE room_id IS NOT NULL;
+
+-- Initial pool of 200 bots with unique names: the base name, then "Имя 2", "Имя 3", ...
+WITH names AS (
+    SELECT ARRAY['Джонни', 'Винни', 'Тони', 'Рокки', 'Макс', 'Дюк', 'Спайк', 'Блейд', 'Рейдер', 'Вайпер',
+                 'Харли', 'Чоппер', 'Револьвер', 'Дизель', 'Циклон', 'Гром', 'Стиль', 'Драйв', 'Буст', 'Нитро'] AS list
+), bots AS (
+    INSERT INTO t_p97186151_mafia_mobile_version.users (username, is_bot)
+    SELECT list[1 + g % 20] || CASE WHEN g >= 20 THEN ' ' || (g / 20 + 1) ELSE '' END, true
+    FROM names, generate_series(0, 199) g
+    ORDER BY g
+    RETURNING id
+)
+INSERT INTO t_p97186151_mafia_mobile_version.bot_pool (user_id)
+SELECT id FROM bots;
@@ -0,0 +1,16 @@
+ALTER TABLE t_p97186151_mafia_mobile_version.users
+ADD COLUMN survive_streak INT DEFAULT 0 NOT NULL,
+ADD COLUMN total_kills INT DEFAULT 0 NOT NULL,
+ADD COLUMN mafia_caught INT DEFAULT 0 NOT NULL;
+
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.users.survive_streak IS 'Сколько игр подряд игрок дожил до конца';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.users.total_kills IS 'Убийства за все игры';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.users.mafia_caught IS 'Проверки, раскрывшие мафию, за все игры';
+
+-- Threshold lookups when finalizing a game: achievements of a type at or below the reached value
+CREATE INDEX IF NOT EXISTS idx_achievements_requirement
+ON t_p97186151_mafia_mobile_version.achievements (requirement_type, requirement_value);
+
+-- Per-actor outcome rows (kills, reveals) of one room
+CREATE INDEX IF NOT EXISTS idx_game_actions_room_actor
+ON t_p97186151_mafia_mobile_version.game_actions (room_id, action_type, actor_user_id);
@@ -0,0 +1,15 @@
+-- Per-room role configuration and the seed of the role shuffle, so a game's assignment can be reproduced
+ALTER TABLE t_p97186151_mafia_mobile_version.rooms
+ADD COLUMN role_set VARCHAR(20) DEFAULT 'classic' NOT NULL,
+ADD COLUMN role_limits JSONB,
+ADD COLUMN role_seed BIGINT;
+
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.rooms.role_set IS 'Набор ролей utils.ROLE_SETS';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.rooms.role_limits IS 'Максимум игроков с ролью, {роль: число}';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.rooms.role_seed IS 'Seed перемешивания ролей при старте игры';
+
+-- Archive mirrors the live table column order
+ALTER TABLE t_p97186151_mafia_mobile_version.rooms_archive
+ADD COLUMN role_set VARCHAR(20) DEFAULT 'classic' NOT NULL,
+ADD COLUMN role_limits JSONB,
+ADD COLUMN role_seed BIGINT;
@@ -0,0 +1,16 @@
+-- Append-only game event log: each write appends one chunk of packed events (backend/api/events.py)
+-- under the room's state_version, so chunks concatenated by seq give the full history of a game.
+CREATE TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.game_events (
+    room_id INT NOT NULL REFERENCES t_p97186151_mafia_mobile_version.rooms(id),
+    seq INT NOT NULL,
+    events BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PRIMARY KEY (room_id, seq)
+);
+
+COMMENT ON TABLE t_p97186151_mafia_mobile_version.game_events IS 'Журнал событий партии, пачки записей по 13 байт';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.game_events.seq IS 'state_version комнаты на момент записи';
+
+CREATE TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.game_events_archive
+    (LIKE t_p97186151_mafia_mobile_version.game_events);
+ALTER TABLE t_p97186151_mafia_mobile_version.game_events_archive ADD PRIMARY KEY (room_id, seq);
@@ -0,0 +1,13 @@
+-- Player lists are read in seat order (room/info, room/changes, game/advance, game/start):
+-- (room_id, joined_at, id) returns a room's players presorted and replaces the plain room_id index.
+-- The sweeper's idle-room check also gets joined_at as an index condition.
+CREATE INDEX IF NOT EXISTS idx_room_players_room_order
+ON t_p97186151_mafia_mobile_version.room_players (room_id, joined_at, id);
+
+DROP INDEX IF EXISTS t_p97186151_mafia_mobile_version.idx_room_players_room;
+
+-- Duplicates of existing indexes that only cost writes:
+-- telegram_id is UNIQUE (users_telegram_id_key), room_id leads idx_game_actions_phase
+DROP INDEX IF EXISTS t_p97186151_mafia_mobile_version.idx_users_telegram;
+
+DROP INDEX IF EXISTS t_p97186151_mafia_mobile_version.idx_game_actions_room;
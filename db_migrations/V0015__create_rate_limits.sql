@@ -0,0 +1,15 @@
+-- Shared token buckets for RATE_LIMIT_BACKEND=postgres (backend/api/ratelimit.py): one row per
+-- route and client key, refilled and spent by a single UPSERT. UNLOGGED - losing the buckets on a
+-- crash only resets the limits, and the table takes no WAL on the hot path. Idle rows are removed
+-- by the sweeper.
+CREATE UNLOGGED TABLE IF NOT EXISTS t_p97186151_mafia_mobile_version.rate_limits (
+    key VARCHAR(128) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rate_limits_updated
+    ON t_p97186151_mafia_mobile_version.rate_limits(updated_at);
+
+COMMENT ON TABLE t_p97186151_mafia_mobile_version.rate_limits IS 'Корзины токенов ограничения частоты запросов';
+COMMENT ON COLUMN t_p97186151_mafia_mobile_version.rate_limits.key IS 'маршрут:u<user_id> или маршрут:ip:<адрес>';
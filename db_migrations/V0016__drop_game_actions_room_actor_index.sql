@@ -0,0 +1,3 @@
+-- Game finalization counts kills and mafia reveals from the server-written event log (game_events)
+-- instead of game_actions rows, so the per-actor outcome index has no readers left.
+DROP INDEX IF EXISTS t_p97186151_mafia_mobile_version.idx_game_actions_room_actor;
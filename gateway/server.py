@@ -0,0 +1,292 @@
+"""
+Шлюз событий комнат: одно соединение Postgres слушает канал room_events (LISTEN) и раздаёт
+события подписчикам по SSE. Мутирующие маршруты backend/api шлют NOTIFY с payload
+'room_id:version:kind', клиент по событию перечитывает room/info вместо периодических запросов.
+
+Подписчик - asyncio.Protocol без своей задачи и очереди: событие кодируется один раз на комнату
+и пишется в транспорты напрямую. Буфер записи ограничен GATEWAY_WRITE_BUFFER; отстающий клиент
+пропускает события и получает resync, когда догонит, а зависший дольше двух пульсов отключается.
+    DATABASE_URL=postgresql://postgres@localhost/mafia python gateway/server.py
+    клиент: new EventSource('http://localhost:8090/events?room=42&since=17')
+"""
+import asyncio
+import json
+import os
+import signal
+import sys
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import psycopg
+from psycopg import sql
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+from room_state import ROOM_EVENTS_CHANNEL, parse_room_event  # noqa: E402
+
+HOST = os.environ.get('GATEWAY_HOST', '0.0.0.0')
+PORT = int(os.environ.get('GATEWAY_PORT', '8090'))
+MAX_SUBSCRIBERS = int(os.environ.get('GATEWAY_MAX_SUBSCRIBERS', '10000'))
+HEARTBEAT = float(os.environ.get('GATEWAY_HEARTBEAT', '25'))
+WRITE_BUFFER = int(os.environ.get('GATEWAY_WRITE_BUFFER', '16384'))
+KNOWN_ROOMS = int(os.environ.get('GATEWAY_KNOWN_ROOMS', '50000'))
+REQUEST_TIMEOUT = 10.0
+MAX_REQUEST_SIZE = 8192
+RECONNECT_MAX_DELAY = 30.0
+RETRY_MS = 3000
+
+STREAM_HEAD = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/event-stream\r\n'
+    b'Cache-Control: no-cache\r\n'
+    b'Connection: keep-alive\r\n'
+    b'Access-Control-Allow-Origin: *\r\n'
+    b'X-Accel-Buffering: no\r\n'
+    b'\r\n'
+    b'retry: %d\n\n' % RETRY_MS
+)
+PING = b': ping\n\n'
+
+
+def http_response(status: str, body: dict, extra: str = '') -> bytes:
+    payload = json.dumps(body).encode()
+    head = (f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n'
+            f'Access-Control-Allow-Origin: *\r\nConnection: close\r\n{extra}\r\n')
+    return head.encode() + payload
+
+
+NOT_FOUND = http_response('404 Not Found', {'error': 'Not found'})
+METHOD_NOT_ALLOWED = http_response('405 Method Not Allowed', {'error': 'Method not allowed'}, 'Allow: GET\r\n')
+BAD_REQUEST = http_response('400 Bad Request', {'error': 'room is required'})
+TOO_LARGE = http_response('431 Request Header Fields Too Large', {'error': 'Request too large'})
+OVERLOADED = http_response('503 Service Unavailable', {'error': 'Too many subscribers'}, 'Retry-After: 5\r\n')
+
+
+def encode_event(room_id: int, version: int, kind: str) -> bytes:
+    data = json.dumps({'room_id': room_id, 'version': version, 'kind': kind}, separators=(',', ':'))
+    return f'id: {version}\nevent: {kind}\ndata: {data}\n\n'.encode()
+
+
+def encode_resync(room_id: int) -> bytes:
+    return f'event: resync\ndata: {{"room_id":{room_id}}}\n\n'.encode()
+
+
+class Subscriber(asyncio.Protocol):
+    """Соединение клиента: разбор заголовка запроса, затем только запись событий"""
+
+    __slots__ = ('hub', 'transport', 'request', 'room_id', 'stalled', 'timeout')
+
+    def __init__(self, hub: 'Hub'):
+        self.hub = hub
+        self.transport = None
+        self.request = b''
+        self.room_id = None
+        self.stalled = 0
+        self.timeout = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.set_write_buffer_limits(high=WRITE_BUFFER)
+        self.timeout = asyncio.get_running_loop().call_later(REQUEST_TIMEOUT, transport.abort)
+
+    def data_received(self, data: bytes):
+        if self.room_id is not None or self.timeout is None:
+            return
+        self.request += data
+        head, found, _ = self.request.partition(b'\r\n\r\n')
+        if not found:
+            if len(self.request) > MAX_REQUEST_SIZE:
+                self.reply(TOO_LARGE)
+            return
+        self.timeout.cancel()
+        self.timeout = None
+        self.request = b''
+        self.hub.handle(self, head)
+
+    def connection_lost(self, exc):
+        if self.timeout is not None:
+            self.timeout.cancel()
+        self.hub.unsubscribe(self)
+
+    def pause_writing(self):
+        self.stalled = 1
+        self.hub.stalled += 1
+
+    def resume_writing(self):
+        if self.stalled:
+            self.stalled = 0
+            self.hub.stalled -= 1
+            self.transport.write(encode_resync(self.room_id))
+
+    def send(self, data: bytes):
+        if not self.stalled:
+            self.transport.write(data)
+
+    def reply(self, response: bytes):
+        self.transport.write(response)
+        self.transport.close()
+
+
+class Hub:
+    """Подписчики по комнатам и последние известные версии комнат"""
+
+    def __init__(self):
+        self.rooms: dict[int, set[Subscriber]] = {}
+        self.versions: OrderedDict[int, tuple[int, str]] = OrderedDict()
+        self.subscribers = 0
+        self.stalled = 0
+        self.listening = False
+        self.notifies = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def handle(self, sub: Subscriber, head: bytes):
+        lines = head.decode('latin-1').split('\r\n')
+        method, _, target = lines[0].partition(' ')
+        target = target.rsplit(' ', 1)[0]
+        url = urlsplit(target)
+        if method != 'GET':
+            return sub.reply(METHOD_NOT_ALLOWED)
+        if url.path == '/health':
+            return sub.reply(http_response('200 OK', self.health()))
+        if url.path != '/events':
+            return sub.reply(NOT_FOUND)
+
+        query = parse_qs(url.query)
+        since = query.get('since', [None])[0]
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'last-event-id' and value.strip():
+                since = value.strip()
+        try:
+            room_id = int(query['room'][0])
+            since = int(since) if since is not None else None
+        except (KeyError, ValueError):
+            return sub.reply(BAD_REQUEST)
+        if self.subscribers >= MAX_SUBSCRIBERS:
+            return sub.reply(OVERLOADED)
+        self.subscribe(sub, room_id, since)
+
+    def subscribe(self, sub: Subscriber, room_id: int, since: int | None):
+        """Подписка; если комната уже изменилась после since, последнее событие уходит сразу"""
+        sub.room_id = room_id
+        self.rooms.setdefault(room_id, set()).add(sub)
+        self.subscribers += 1
+        sub.transport.write(STREAM_HEAD)
+        latest = self.versions.get(room_id)
+        if since is not None and latest and latest[0] > since:
+            sub.send(encode_event(room_id, *latest))
+
+    def unsubscribe(self, sub: Subscriber):
+        if sub.stalled:
+            self.stalled -= 1
+        subscribers = self.rooms.get(sub.room_id)
+        if subscribers is None or sub not in subscribers:
+            return
+        subscribers.discard(sub)
+        self.subscribers -= 1
+        if not subscribers:
+            del self.rooms[sub.room_id]
+
+    def publish(self, room_id: int, version: int, kind: str):
+        self.notifies += 1
+        self.versions[room_id] = (version, kind)
+        self.versions.move_to_end(room_id)
+        if len(self.versions) > KNOWN_ROOMS:
+            self.versions.popitem(last=False)
+
+        subscribers = self.rooms.get(room_id)
+        if not subscribers:
+            return
+        data = encode_event(room_id, version, kind)
+        for sub in subscribers:
+            if sub.stalled:
+                self.dropped += 1
+            else:
+                sub.transport.write(data)
+                self.delivered += 1
+
+    def resync_all(self):
+        """После переподключения к базе: события за время разрыва потеряны, клиенты перечитывают комнаты"""
+        for room_id, subscribers in self.rooms.items():
+            data = encode_resync(room_id)
+            for sub in subscribers:
+                sub.send(data)
+
+    def heartbeat(self):
+        """Комментарий SSE держит соединения через прокси; зависшие два пульса подряд отключаются"""
+        for subscribers in self.rooms.values():
+            for sub in list(subscribers):
+                if sub.stalled:
+                    sub.stalled += 1
+                    if sub.stalled > 2:
+                        sub.transport.abort()
+                else:
+                    sub.transport.write(PING)
+
+    def health(self) -> dict:
+        return {
+            'listening': self.listening,
+            'subscribers': self.subscribers,
+            'max_subscribers': MAX_SUBSCRIBERS,
+            'rooms': len(self.rooms),
+            'known_rooms': len(self.versions),
+            'stalled': self.stalled,
+            'notifies': self.notifies,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+        }
+
+
+async def listen(hub: Hub, dsn: str):
+    """Единственное соединение с LISTEN; при обрыве - переподключение с растущей паузой и resync"""
+    delay = 1.0
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(dsn, autocommit=True) as conn:
+                await conn.execute(sql.SQL('LISTEN {}').format(sql.Identifier(ROOM_EVENTS_CHANNEL)))
+                hub.listening = True
+                hub.resync_all()
+                delay = 1.0
+                while True:
+                    async for notify in conn.notifies(timeout=HEARTBEAT):
+                        try:
+                            hub.publish(*parse_room_event(notify.payload))
+                        except ValueError:
+                            continue
+                    await conn.execute('SELECT 1')
+        except psycopg.OperationalError as e:
+            print(f'LISTEN connection lost: {e}', file=sys.stderr, flush=True)
+        except Exception as e:
+            # любая другая ошибка не должна тихо остановить рассылку: шлюз продолжал бы принимать подписчиков
+            print(f'LISTEN failed: {e!r}', file=sys.stderr, flush=True)
+        hub.listening = False
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+async def heartbeat(hub: Hub):
+    while True:
+        await asyncio.sleep(HEARTBEAT)
+        hub.heartbeat()
+
+
+async def serve():
+    loop = asyncio.get_running_loop()
+    hub = Hub()
+    server = await loop.create_server(lambda: Subscriber(hub), HOST, PORT, backlog=4096, reuse_address=True)
+    tasks = [asyncio.create_task(listen(hub, os.environ['DATABASE_URL'])), asyncio.create_task(heartbeat(hub))]
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f'gateway listening on {HOST}:{PORT}', file=sys.stderr, flush=True)
+
+    await stop.wait()
+    server.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(serve())
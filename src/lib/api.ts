@@ -8,6 +8,8 @@ export interface User {
   total_games: number;
   total_wins: number;
   created_at?: string;
+  session_token?: string;
+  session_expires_at?: number;
 }
 
 export interface TelegramAuthData {
@@ -28,9 +30,15 @@ export interface Room {
   player_count?: number;
   current_phase?: string;
   phase_ends_at?: string;
+  state_version?: number;
   players?: Player[];
 }
 
+export interface RoomChanges extends Room {
+  state_version: number;
+  players: Player[];
+}
+
 export interface Player {
   id: number;
   username: string;
@@ -55,12 +63,22 @@ export interface LeaderboardEntry {
   win_rate: number;
 }
 
+function sessionHeaders(): Record<string, string> {
+  const token = localStorage.getItem('sessionToken');
+  const userId = localStorage.getItem('userId');
+  if (!token || !userId) {
+    return {};
+  }
+  return { 'X-Session-Token': token, 'X-User-Id': userId };
+}
+
 async function apiRequest(path: string, options: RequestInit = {}) {
   const url = `${API_URL}?path=${path}`;
   const response = await fetch(url, {
     ...options,
     headers: {
       'Content-Type': 'application/json',
+      ...sessionHeaders(),
       ...options.headers,
     },
   });
@@ -84,14 +102,33 @@ export async function getUser(id: number): Promise<User> {
   return apiRequest(`user&id=${id}`);
 }
 
-export async function listRooms(): Promise<Room[]> {
-  return apiRequest('rooms');
+export interface RoomFilters {
+  joinable?: boolean;
+  min_count?: number;
+  max_count?: number;
+  limit?: number;
+  cursor?: string;
+}
+
+export async function listRooms(filters: RoomFilters = {}): Promise<Room[]> {
+  const query = Object.entries(filters)
+    .filter(([, value]) => value !== undefined && value !== '' && value !== false)
+    .map(([key, value]) => `&${key}=${encodeURIComponent(value === true ? 1 : value)}`)
+    .join('');
+  return apiRequest(`rooms${query}`);
+}
+
+export type RoleSet = 'classic' | 'extended';
+
+export interface RoleConfig {
+  role_set?: RoleSet;
+  role_limits?: Record<string, number>;
 }
 
-export async function createRoom(name: string, host_user_id: number, max_players = 12): Promise<Room> {
+export async function createRoom(name: string, host_user_id: number, max_players = 12, roles: RoleConfig = {}): Promise<Room> {
   return apiRequest('room/create', {
     method: 'POST',
-    body: JSON.stringify({ name, host_user_id, max_players }),
+    body: JSON.stringify({ name, host_user_id, max_players, ...roles }),
   });
 }
 
@@ -106,6 +143,47 @@ export async function getRoomInfo(id: number): Promise<Room> {
   return apiRequest(`room/info&id=${id}`);
 }
 
+export async function getRoomChanges(id: number, since: number, wait = 0): Promise<RoomChanges | null> {
+  const response = await fetch(`${API_URL}?path=room/changes&id=${id}&since=${since}&wait=${wait}`);
+
+  if (response.status === 304) {
+    return null;
+  }
+
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({ error: 'Unknown error' }));
+    throw new Error(error.error || `API error: ${response.status}`);
+  }
+
+  return response.json();
+}
+
+export type RoomEventKind = 'join' | 'bots' | 'start' | 'vote' | 'action' | 'phase' | 'finish' | 'update' | 'resync';
+
+export interface RoomEvent {
+  room_id: number;
+  version?: number;
+  kind: RoomEventKind;
+}
+
+const ROOM_EVENTS_URL = import.meta.env.VITE_ROOM_EVENTS_URL;
+const ROOM_EVENT_KINDS: RoomEventKind[] = ['join', 'bots', 'start', 'vote', 'action', 'phase', 'finish', 'update', 'resync'];
+
+export function subscribeRoomEvents(room_id: number, since: number | undefined, onEvent: (event: RoomEvent) => void): () => void {
+  if (!ROOM_EVENTS_URL || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+
+  const query = since === undefined ? `room=${room_id}` : `room=${room_id}&since=${since}`;
+  const source = new EventSource(`${ROOM_EVENTS_URL}/events?${query}`);
+  const listener = (message: MessageEvent) => {
+    onEvent({ ...JSON.parse(message.data), kind: message.type as RoomEventKind });
+  };
+  ROOM_EVENT_KINDS.forEach((kind) => source.addEventListener(kind, listener));
+
+  return () => source.close();
+}
+
 export async function getLeaderboard(): Promise<LeaderboardEntry[]> {
   return apiRequest('leaderboard');
 }
@@ -121,6 +199,26 @@ export async function votePlayer(room_id: number, actor_id: number, target_id: n
   });
 }
 
+export interface VoteTally {
+  room_id: number;
+  round: number;
+  tally: { target_id: number; votes: number }[];
+}
+
+export async function votePlayers(
+  room_id: number,
+  votes: { actor_id: number; target_id: number }[],
+): Promise<{ success: boolean; action_ids: number[] }> {
+  return apiRequest('game/votes', {
+    method: 'POST',
+    body: JSON.stringify({ room_id, votes }),
+  });
+}
+
+export async function getVoteTally(room_id: number): Promise<VoteTally> {
+  return apiRequest(`game/tally&room_id=${room_id}`);
+}
+
 export async function loginWithTelegram(authData: TelegramAuthData): Promise<User> {
   const response = await fetch(TELEGRAM_AUTH_URL, {
     method: 'POST',
@@ -135,12 +233,16 @@ export async function loginWithTelegram(authData: TelegramAuthData): Promise<Use
     throw new Error(error.error || `Auth error: ${response.status}`);
   }
 
-  return response.json();
+  const user = await response.json();
+  if (user.session_token) {
+    localStorage.setItem('sessionToken', user.session_token);
+  }
+  return user;
 }
 
-export async function addBot(room_id: number): Promise<{ success: boolean }> {
+export async function addBot(room_id: number, count = 1): Promise<{ success: boolean; bot_usernames: string[] }> {
   return apiRequest('room/add-bot', {
     method: 'POST',
-    body: JSON.stringify({ room_id }),
+    body: JSON.stringify({ room_id, count }),
   });
 }
\ No newline at end of file
@@ -130,6 +130,17 @@ export default function Index() {
     }
   }, [currentTab, currentUser]);
 
+  useEffect(() => {
+    if (!currentRoom) return;
+    return api.subscribeRoomEvents(currentRoom.id, currentRoom.state_version, async () => {
+      try {
+        setCurrentRoom(await api.getRoomInfo(currentRoom.id));
+      } catch (error) {
+        console.error('Failed to refresh room:', error);
+      }
+    });
+  }, [currentRoom?.id]);
+
   const loadUser = async (userId: number) => {
     try {
       const user = await api.getUser(userId);
@@ -151,6 +162,11 @@ export default function Index() {
     try {
       const user = await api.registerUser(username);
       setCurrentUser(user);
+      if (user.session_token) {
+        localStorage.setItem('sessionToken', user.session_token);
+      } else {
+        localStorage.removeItem('sessionToken');
+      }
       localStorage.setItem('userId', user.id.toString());
       setCurrentTab('lobby');
       toast({ title: 'Успех!', description: `Добро пожаловать, ${user.username}!` });
@@ -259,6 +275,7 @@ export default function Index() {
 
   const handleLogout = () => {
     localStorage.removeItem('userId');
+    localStorage.removeItem('sessionToken');
     setCurrentUser(null);
     setCurrentTab('profile');
     toast({ title: 'Выход', description: 'Ты вышел из аккаунта' });
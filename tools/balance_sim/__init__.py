@@ -0,0 +1,5 @@
+"""Монте-Карло симулятор баланса ролей assign_roles.
+
+Запуск из каталога tools:
+    python -m balance_sim --players 4-20 --games 1000000 --seed 42
+"""
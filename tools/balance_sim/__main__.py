@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .simulate import FACTION_NAMES, ROLE_NAMES, simulate_batch
+from engine import bot_actions, load_state, resolve_phase
+from utils import DEFAULT_ROLE_SET, ROLE_SETS, assign_roles, normalize_role_limits
+
+
+def parse_players(value: str) -> list[int]:
+    if '-' in value:
+        low, high = value.split('-')
+        return list(range(int(low), int(high) + 1))
+    return [int(part) for part in value.split(',')]
+
+
+def run_simulation(player_counts, games: int, batch: int, workers: int, seed: int,
+                   role_set: str, role_limits: dict | None) -> dict:
+    """
+    Партии режутся на пачки с дочерними SeedSequence по индексу пачки,
+    поэтому результат при одном seed не зависит от числа процессов.
+    """
+    tasks = []
+    root = np.random.SeedSequence(seed)
+    for player_count, count_seed in zip(player_counts, root.spawn(len(player_counts))):
+        sizes = [batch] * (games // batch) + ([games % batch] if games % batch else [])
+        for size, batch_seed in zip(sizes, count_seed.spawn(len(sizes))):
+            tasks.append((player_count, size, batch_seed, role_set, role_limits))
+
+    results = {n: None for n in player_counts}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(task[0], pool.submit(simulate_batch, *task)) for task in tasks]
+        for player_count, future in futures:
+            counts = future.result()
+            total = results[player_count]
+            results[player_count] = counts if total is None else {k: total[k] + counts[k] for k in total}
+    return results
+
+
+def run_engine(player_count: int, games: int, seed: int, role_set: str, role_limits: dict | None) -> np.ndarray:
+    """Те же партии ботов через построчный движок backend/api/engine.py - для сверки и замера скорости"""
+    rng = random.Random(seed)
+    wins = np.zeros(len(FACTION_NAMES), dtype=np.int64)
+    for _ in range(games):
+        roles = assign_roles(player_count, rng.getrandbits(63), role_set, role_limits)
+        players = [{'user_id': i, 'role': role, 'is_alive': True} for i, role in enumerate(roles)]
+        state = load_state(0, 'night', 1, players)
+        while state.winner is None:
+            resolve_phase(state, bot_actions(state, state.seats, rng))
+        wins[FACTION_NAMES.index(state.winner)] += 1
+    return wins
+
+
+def report(results: dict) -> dict:
+    summary = {}
+    for player_count, counts in results.items():
+        games = int(counts['faction_wins'].sum())
+        factions = {name: round(int(w) / games, 4) for name, w in zip(FACTION_NAMES, counts['faction_wins'])}
+        roles = {
+            name: {
+                'win_rate': round(int(w) / int(g), 4),
+                'survival_rate': round(int(s) / int(g), 4),
+            }
+            for name, g, w, s in zip(ROLE_NAMES, counts['role_games'], counts['role_wins'], counts['role_survived'])
+            if g
+        }
+        summary[player_count] = {'games': games, 'factions': factions, 'roles': roles}
+
+        print(f'\n{player_count} players, {games} games: ' +
+              '  '.join(f'{name}={rate:.1%}' for name, rate in factions.items()))
+        for name, stats in roles.items():
+            print(f"    {name:<11} win {stats['win_rate']:6.1%}  survive {stats['survival_rate']:6.1%}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='balance_sim', description='Монте-Карло баланс ролей assign_roles')
+    parser.add_argument('--players', default='4-20', help='диапазон 4-20 или список 6,8,12')
+    parser.add_argument('--games', type=int, default=1_000_000, help='партий на каждое число игроков')
+    parser.add_argument('--batch', type=int, default=20_000, help='партий в одной пачке массивов')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--role-set', choices=tuple(ROLE_SETS), default=DEFAULT_ROLE_SET)
+    parser.add_argument('--role-limits', type=json.loads, help='ограничения ролей как в комнате, {"doctor": 1}')
+    parser.add_argument('--json', help='сохранить сводку в файл')
+    parser.add_argument('--engine-games', type=int, default=0,
+                        help='дополнительно прогнать столько партий через engine.py для сверки и замера')
+    args = parser.parse_args()
+
+    player_counts = parse_players(args.players)
+    role_limits = normalize_role_limits(args.role_limits)
+    started = time.perf_counter()
+    results = run_simulation(player_counts, args.games, args.batch, args.workers, args.seed,
+                             args.role_set, role_limits)
+    elapsed = time.perf_counter() - started
+    summary = report(results)
+
+    total = args.games * len(player_counts)
+    print(f'\nvectorized: {total} games in {elapsed:.1f}s ({total / elapsed:,.0f} games/s, {args.workers} workers)')
+
+    if args.engine_games:
+        started = time.perf_counter()
+        for player_count in player_counts:
+            wins = run_engine(player_count, args.engine_games, args.seed, args.role_set, role_limits)
+            print(f'engine {player_count:>2} players: ' +
+                  '  '.join(f'{name}={w / args.engine_games:.1%}' for name, w in zip(FACTION_NAMES, wins)))
+        elapsed = time.perf_counter() - started
+        total = args.engine_games * len(player_counts)
+        print(f'engine.py: {total} games in {elapsed:.1f}s ({total / elapsed:,.0f} games/s, 1 process)')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'seed': args.seed, 'games': args.games, 'role_set': args.role_set,
+                       'role_limits': role_limits, 'results': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
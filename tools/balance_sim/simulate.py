@@ -0,0 +1,175 @@
+"""Пакетная симуляция партий на массивах NumPy по правилам backend/api/engine.py.
+
+Состояние пачки партий - массивы [игры, места]: коды ролей, живые, использованная
+удача. Все партии пачки проходят фазы одновременно, без цикла Python по партиям.
+Боты действуют как engine.bot_actions: случайная живая цель, мафия не выбирает своих,
+адвокат защищает мафию.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'api'))
+
+from engine import MAX_ROUNDS, NIGHT_ACTIONS, faction_of  # noqa: E402
+from utils import DEFAULT_ROLE_SET, role_table  # noqa: E402
+
+ROLE_NAMES = ('citizen', 'mafia', 'lawyer', 'maniac', 'suicide', 'doctor', 'commissar',
+              'sergeant', 'prostitute', 'homeless', 'lucky', 'kamikaze')
+FACTION_NAMES = ('town', 'mafia', 'maniac', 'suicide', 'draw')
+
+CODE = {name: code for code, name in enumerate(ROLE_NAMES)}
+FACTION = np.array([FACTION_NAMES.index(faction_of(name)) for name in ROLE_NAMES])
+HAS_NIGHT_ACTION = np.array([name in NIGHT_ACTIONS for name in ROLE_NAMES])
+IS_MAFIA = FACTION == FACTION_NAMES.index('mafia')
+TOWN, MAFIA, MANIAC, SUICIDE, DRAW = range(len(FACTION_NAMES))
+
+REJECTION_ROUNDS = 16
+
+
+def role_deck(player_count: int, role_set: str = DEFAULT_ROLE_SET, role_limits: dict | None = None) -> np.ndarray:
+    """Состав ролей для числа игроков в виде отсортированных кодов"""
+    return np.sort(np.array([CODE[role] for role in role_table(player_count, role_set, role_limits)]))
+
+
+def deal_roles(rng, deck: np.ndarray, games: int) -> np.ndarray:
+    """Раздача колоды сразу на пачку партий: независимая перестановка в каждой строке [игры, места]"""
+    return rng.permuted(np.broadcast_to(deck, (games, len(deck))), axis=1)
+
+
+def _valid(roles, alive, game, actor, target, night):
+    """Допустима ли цель: живая, не сам игрок; мафия бьёт не своих, адвокат ночью защищает своих"""
+    actor_mafia = IS_MAFIA[roles[game, actor]]
+    target_mafia = IS_MAFIA[roles[game, target]]
+    lawyer = night & (roles[game, actor] == CODE['lawyer'])
+    return (alive[game, target] & (actor != target) &
+            np.where(lawyer, target_mafia, ~(actor_mafia & target_mafia)))
+
+
+def _choose(rng, roles, alive, choosing, night):
+    """
+    Равновероятная допустимая цель для каждого игрока из choosing, иначе -1.
+    Выборка с отклонением стоит O(игроков) на раунд; редкие остатки добираются полным перебором.
+    """
+    games, n = roles.shape
+    target = np.full((games, n), -1)
+    game, actor = np.nonzero(choosing)
+    pending = np.arange(len(game))
+
+    for _ in range(REJECTION_ROUNDS):
+        if not len(pending):
+            return target
+        candidate = rng.integers(0, n, size=len(pending))
+        ok = _valid(roles, alive, game[pending], actor[pending], candidate, night)
+        target[game[pending[ok]], actor[pending[ok]]] = candidate[ok]
+        pending = pending[~ok]
+
+    if len(pending):
+        g, a = game[pending][:, None], actor[pending][:, None]
+        valid = _valid(roles, alive, g, a, np.arange(n)[None, :], night)
+        keys = rng.random(valid.shape)
+        keys[~valid] = -1.0
+        target[game[pending], actor[pending]] = np.where(valid.any(axis=1), keys.argmax(axis=1), -1)
+    return target
+
+
+def _counts(mask, target):
+    """Сколько игроков из mask выбрали каждую цель: [игра, цель]"""
+    games, n = target.shape
+    game, actor = np.nonzero(mask)
+    return np.bincount(game * n + target[game, actor], minlength=games * n).reshape(games, n)
+
+
+def _night(rng, roles, alive, luck_used, running):
+    games, n = roles.shape
+    rows = np.arange(games)
+    live = alive & running[:, None]
+    is_mafia = IS_MAFIA[roles]
+
+    target = _choose(rng, roles, alive, live & HAS_NIGHT_ACTION[roles], night=True)
+    safe_target = np.maximum(target, 0)
+    acting = target >= 0
+
+    visiting = acting & (roles == CODE['prostitute'])
+    blocked = _counts(visiting, target) > 0
+    acting &= ~blocked | visiting
+
+    healed = _counts(acting & (roles == CODE['doctor']), target) > 0
+
+    votes = _counts(acting & (roles == CODE['mafia']), target)
+    mafia_victim = np.where(votes.max(axis=1) > 0, votes.argmax(axis=1), -1)
+    maniac_victim = np.where(acting & (roles == CODE['maniac']), target, -1).max(axis=1)
+
+    deaths = np.zeros_like(alive)
+    for victim in (mafia_victim, maniac_victim):
+        v = np.maximum(victim, 0)
+        hit = (victim >= 0) & ~healed[rows, v] & ~deaths[rows, v]
+        lucky = (roles[rows, v] == CODE['lucky']) & ~luck_used[rows, v]
+        luck_used[rows[hit & lucky], v[hit & lucky]] = True
+        deaths[rows[hit & ~lucky], v[hit & ~lucky]] = True
+
+    blast = acting & (roles == CODE['kamikaze']) & is_mafia[rows[:, None], safe_target]
+    deaths |= blast
+    deaths[np.nonzero(blast)[0], safe_target[blast]] = True
+
+    alive &= ~deaths
+
+
+def _voting(rng, roles, alive, running, winner):
+    rows = np.arange(len(roles))
+    live = alive & running[:, None]
+
+    target = _choose(rng, roles, alive, live, night=False)
+    votes = _counts(target >= 0, target)
+    top = np.sort(votes, axis=1)[:, -2:]
+    lynched = votes.argmax(axis=1)
+    decided = running & (top[:, 1] > 0) & (top[:, 0] < top[:, 1])
+
+    alive[rows[decided], lynched[decided]] = False
+    suicide = decided & (roles[rows, lynched] == CODE['suicide'])
+    winner[suicide & (winner < 0)] = SUICIDE
+
+
+def _check_winner(roles, alive, winner):
+    mafia = (alive & IS_MAFIA[roles]).sum(axis=1)
+    maniac = (alive & (roles == CODE['maniac'])).sum(axis=1)
+    total = alive.sum(axis=1)
+
+    decided = np.full(len(roles), -1)
+    decided[(mafia == 0) & (maniac == 0)] = TOWN
+    decided[(mafia > 0) & (maniac == 0) & (mafia >= total - mafia)] = MAFIA
+    decided[(maniac > 0) & (total <= 2)] = MANIAC
+    open_games = winner < 0
+    winner[open_games] = decided[open_games]
+
+
+def simulate_batch(player_count: int, games: int, seed, role_set: str = DEFAULT_ROLE_SET,
+                   role_limits: dict | None = None) -> dict:
+    """
+    Пачка партий для одного числа игроков.
+    Возвращает счётчики: победы фракций, игры, победы и выживание по ролям.
+    """
+    rng = np.random.default_rng(seed)
+    roles = deal_roles(rng, role_deck(player_count, role_set, role_limits), games)
+    alive = np.ones(roles.shape, dtype=bool)
+    luck_used = np.zeros(roles.shape, dtype=bool)
+    winner = np.full(games, -1)
+
+    for _ in range(MAX_ROUNDS):
+        running = winner < 0
+        if not running.any():
+            break
+        _night(rng, roles, alive, luck_used, running)
+        _check_winner(roles, alive, winner)
+        _voting(rng, roles, alive, winner < 0, winner)
+        _check_winner(roles, alive, winner)
+    winner[winner < 0] = DRAW
+
+    won = FACTION[roles] == winner[:, None]
+    return {
+        'faction_wins': np.bincount(winner, minlength=len(FACTION_NAMES)),
+        'role_games': np.bincount(roles.ravel(), minlength=len(ROLE_NAMES)),
+        'role_wins': np.bincount(roles[won], minlength=len(ROLE_NAMES)),
+        'role_survived': np.bincount(roles[alive], minlength=len(ROLE_NAMES)),
+    }
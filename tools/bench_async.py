@@ -0,0 +1,205 @@
+"""Задержка маршрутов с несколькими запросами: синхронный index.handler против aio.handler.
+
+База подключается через локальный TCP-прокси, добавляющий --rtt мс на каждый сетевой круг,
+иначе на сокете рядом с Postgres разница в числе кругов не видна. Для каждого маршрута
+готовятся отдельные комнаты, затем запросы идут последовательно и с --concurrency одновременными.
+    DATABASE_URL=postgresql://postgres@localhost/mafia python tools/bench_async.py --rtt 2 --requests 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+ROUTES = ('room/info', 'room/join', 'room/add-bot', 'game/start')
+
+
+class LatencyProxy:
+    """TCP-прокси к Postgres: каждая порция данных доставляется через половину RTT в каждую сторону"""
+
+    def __init__(self, upstream: dict, rtt: float):
+        self.upstream = upstream
+        self.delay = rtt / 2
+        self.loop = asyncio.new_event_loop()
+
+    def start(self) -> int:
+        server = self.loop.run_until_complete(asyncio.start_server(self._handle, '127.0.0.1', 0))
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        return server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        host = self.upstream.get('host') or 'localhost'
+        port = int(self.upstream.get('port') or 5432)
+        if host.startswith('/'):
+            up_reader, up_writer = await asyncio.open_unix_connection(f'{host}/.s.PGSQL.{port}')
+        else:
+            up_reader, up_writer = await asyncio.open_connection(host, port)
+        await asyncio.gather(self._pipe(reader, up_writer), self._pipe(up_reader, writer))
+
+    async def _pipe(self, reader, writer):
+        queue = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                due, data = await queue.get()
+                if data is None:
+                    break
+                await asyncio.sleep(max(0.0, due - self.loop.time()))
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        task = asyncio.create_task(deliver())
+        while data := await reader.read(65536):
+            queue.put_nowait((self.loop.time() + self.delay, data))
+        queue.put_nowait((0.0, None))
+        await task
+
+
+def call(handler, method: str, path: str, body: dict | None = None, **query) -> dict:
+    response = handler(_event(method, path, body, query), None)
+    return json.loads(response['body']) if response['body'] else None
+
+
+def _event(method: str, path: str, body: dict | None, query: dict) -> dict:
+    return {
+        'httpMethod': method,
+        'queryStringParameters': {'path': path, **{k: str(v) for k, v in query.items()}},
+        'body': json.dumps(body) if body is not None else None,
+    }
+
+
+def prepare(index, route: str, count: int, tag: str) -> list[dict]:
+    """События запросов маршрута: у каждого запроса своя комната, чтобы повторы не упирались в состояние"""
+    host = call(index.handler, 'POST', 'register', {'username': f'bench-{tag}-host'})['id']
+    guest = call(index.handler, 'POST', 'register', {'username': f'bench-{tag}-guest'})['id']
+    extra = [call(index.handler, 'POST', 'register', {'username': f'bench-{tag}-p{i}'})['id'] for i in range(3)]
+
+    events = []
+    for i in range(count):
+        room = call(index.handler, 'POST', 'room/create', {'name': f'bench-{tag}-{i}', 'host_user_id': host, 'max_players': 20})
+        if route == 'room/info':
+            for user_id in extra:
+                call(index.handler, 'POST', 'room/join', {'room_id': room['id'], 'user_id': user_id})
+            events.append(_event('GET', 'room/info', None, {'id': room['id']}))
+        elif route == 'room/join':
+            events.append(_event('POST', 'room/join', {'room_id': room['id'], 'user_id': guest}, {}))
+        elif route == 'room/add-bot':
+            events.append(_event('POST', 'room/add-bot', {'room_id': room['id']}, {}))
+        else:
+            for user_id in extra:
+                call(index.handler, 'POST', 'room/join', {'room_id': room['id'], 'user_id': user_id})
+            events.append(_event('POST', 'game/start', {'room_id': room['id']}, {}))
+    return events
+
+
+def release_bots(db, events: list[dict]) -> None:
+    room_ids = [json.loads(e['body'])['room_id'] for e in events if e['queryStringParameters']['path'] == 'room/add-bot']
+    if not room_ids:
+        return
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute("UPDATE bot_pool SET room_id = NULL, leased_at = NULL WHERE room_id = ANY(%s)", (room_ids,))
+    conn.commit()
+    cur.close()
+    db.release_db(conn)
+
+
+def run_sync(index, events: list[dict], concurrency: int) -> tuple[list[float], float]:
+    def timed(event):
+        started = time.perf_counter()
+        response = index.handler(event, None)
+        assert response['statusCode'] < 500, response
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        latencies = [timed(event) for event in events]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, events))
+    return latencies, time.perf_counter() - started
+
+
+def run_async(aio, events: list[dict], concurrency: int) -> tuple[list[float], float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(event):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await aio.async_handler(event, None)
+            assert response['statusCode'] < 500, response
+            return time.perf_counter() - started
+
+    async def run_all():
+        return await asyncio.gather(*(timed(event) for event in events))
+
+    started = time.perf_counter()
+    latencies = aio._loop.run_until_complete(run_all())
+    return latencies, time.perf_counter() - started
+
+
+def stats(latencies: list[float], elapsed: float) -> dict:
+    ordered = sorted(ms * 1000 for ms in latencies)
+    return {
+        'p50_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        'rps': round(len(ordered) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rtt', type=float, default=2.0, help='добавленная задержка сетевого круга, мс')
+    parser.add_argument('--requests', type=int, default=100, help='запросов на маршрут в каждом прогоне')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--routes', default=','.join(ROUTES))
+    parser.add_argument('--json', help='сохранить результат в файл')
+    args = parser.parse_args()
+
+    upstream = conninfo_to_dict(os.environ['DATABASE_URL'])
+    port = LatencyProxy(upstream, args.rtt / 1000).start()
+    os.environ['DATABASE_URL'] = make_conninfo(os.environ['DATABASE_URL'], host='127.0.0.1', port=port,
+                                               sslmode='disable')
+    os.environ.setdefault('DB_POOL_MAX_SIZE', str(args.concurrency))
+
+    import aio
+    import db
+    import index
+
+    call(index.handler, 'GET', 'room/info', id=0)
+    aio.handler(_event('GET', 'room/info', None, {'id': 0}), None)
+
+    tag = f'{os.getpid()}-{int(time.time())}'
+    results = {}
+    print(f"rtt {args.rtt} ms, {args.requests} requests per route and mode")
+    print(f"{'route':<14}{'mode':<7}{'conc':>5}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}")
+    for route in args.routes.split(','):
+        results[route] = {}
+        for concurrency in (1, args.concurrency):
+            for mode in ('sync', 'async'):
+                events = prepare(index, route, args.requests, f'{tag}-{route}-{mode}-{concurrency}')
+                if mode == 'sync':
+                    latencies, elapsed = run_sync(index, events, concurrency)
+                else:
+                    latencies, elapsed = run_async(aio, events, concurrency)
+                release_bots(db, events)
+                row = stats(latencies, elapsed)
+                results[route][f'{mode}_c{concurrency}'] = row
+                print(f"{route:<14}{mode:<7}{concurrency:>5}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['rps']:>9.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'rtt_ms': args.rtt, 'requests': args.requests, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
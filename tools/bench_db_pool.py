@@ -0,0 +1,63 @@
+"""Сравнение подключения на каждый запрос с пулом соединений backend/api.
+
+Запуск против локального Postgres:
+    DATABASE_URL=postgresql://postgres@localhost/mafia python tools/bench_db_pool.py -n 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+import db  # noqa: E402
+
+
+def per_request(query: str):
+    conn = db._connect()
+    cur = conn.cursor()
+    cur.execute(query)
+    cur.fetchall()
+    cur.close()
+    conn.close()
+
+
+def pooled(query: str):
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute(query)
+    cur.fetchall()
+    cur.close()
+    db.release_db(conn)
+
+
+def run(fn, query: str, iterations: int) -> list[float]:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: list[float]):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f'{name:<12} mean={statistics.mean(timings):7.3f}ms  p50={statistics.median(timings):7.3f}ms  p95={p95:7.3f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--iterations', type=int, default=200)
+    parser.add_argument('--query', default='SELECT id, username, total_games, total_wins FROM users LIMIT 1')
+    args = parser.parse_args()
+
+    pooled(args.query)
+    report('connect', run(per_request, args.query, args.iterations))
+    report('pooled', run(pooled, args.query, args.iterations))
+    db.close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Число обращений к БД и задержка game/start в зависимости от числа игроков.
+
+Сравнивает прежнее назначение ролей (UPDATE на каждого игрока) с пакетным
+запросом из backend/api. Запуск против локального Postgres со схемой db_migrations:
+    DATABASE_URL=postgresql://postgres@localhost/mafia python tools/bench_start_game.py -n 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+import psycopg2  # noqa: E402
+from psycopg2.extras import RealDictCursor  # noqa: E402
+
+import db  # noqa: E402
+import index  # noqa: E402
+from utils import assign_roles  # noqa: E402
+
+round_trips = 0
+simulated_rtt = 0.0
+
+
+class CountingCursor(RealDictCursor):
+    def execute(self, query, vars=None):
+        global round_trips
+        round_trips += 1
+        if simulated_rtt:
+            time.sleep(simulated_rtt)
+        return super().execute(query, vars)
+
+
+def counting_connect():
+    return psycopg2.connect(
+        os.environ['DATABASE_URL'],
+        connection_factory=db.PooledConnection,
+        cursor_factory=CountingCursor,
+    )
+
+
+def make_room(cur, player_count: int) -> int:
+    cur.execute("""
+        WITH room AS (
+            INSERT INTO rooms (name, max_players) VALUES ('bench', 20) RETURNING id
+        ), bots AS (
+            INSERT INTO users (username, is_bot) SELECT 'bench-' || g, true FROM generate_series(1, %s) g RETURNING id
+        )
+        INSERT INTO room_players (room_id, user_id, is_bot) SELECT room.id, bots.id, true FROM room, bots
+        RETURNING room_id
+    """, (player_count,))
+    return cur.fetchone()['room_id']
+
+
+def legacy_start(room_id: int):
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute("SELECT id, status FROM rooms WHERE id = %s", (room_id,))
+    cur.fetchone()
+    cur.execute("SELECT id FROM room_players WHERE room_id = %s ORDER BY joined_at", (room_id,))
+    players = cur.fetchall()
+    roles = assign_roles(len(players))
+    for i, player in enumerate(players):
+        cur.execute("UPDATE room_players SET role = %s WHERE id = %s", (roles[i], player['id']))
+    cur.execute("UPDATE rooms SET status = 'playing', current_phase = 'night' WHERE id = %s", (room_id,))
+    conn.commit()
+    cur.close()
+    db.release_db(conn)
+
+
+def batched_start(room_id: int):
+    response = index.start_game({'room_id': room_id})
+    assert response['statusCode'] == 200, response['body']
+
+
+def measure(fn, player_count: int, iterations: int, rtt: float) -> tuple[float, float]:
+    global round_trips, simulated_rtt
+    simulated_rtt = 0.0
+    conn = db.get_db()
+    cur = conn.cursor()
+    rooms = [make_room(cur, player_count) for _ in range(iterations)]
+    conn.commit()
+    cur.close()
+    db.release_db(conn)
+
+    round_trips = 0
+    simulated_rtt = rtt
+    timings = []
+    for room_id in rooms:
+        started = time.perf_counter()
+        fn(room_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round_trips / iterations, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    parser.add_argument('--rtt', type=float, default=0.0,
+                        help='добавочная сетевая задержка на каждый запрос, мс (локальный сокет её почти не имеет)')
+    args = parser.parse_args()
+
+    db._connect = counting_connect
+    print(f"{'players':>7}  {'legacy trips':>12}  {'legacy p50':>10}  {'batched trips':>13}  {'batched p50':>11}")
+    for player_count in range(4, 21):
+        legacy_trips, legacy_ms = measure(legacy_start, player_count, args.iterations, args.rtt / 1000)
+        batched_trips, batched_ms = measure(batched_start, player_count, args.iterations, args.rtt / 1000)
+        print(f'{player_count:>7}  {legacy_trips:>12.0f}  {legacy_ms:>8.2f}ms  {batched_trips:>13.0f}  {batched_ms:>9.2f}ms')
+    db.close_pool()
+
+
+if __name__ == '__main__':
+    main()
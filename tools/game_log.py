@@ -0,0 +1,169 @@
+"""Потоковая выгрузка и загрузка журналов завершённых игр для аналитики.
+
+export читает только game_events_archive (живые таблицы не затрагиваются) серверным курсором
+и пишет файл: заголовок MAGIC, затем на каждую игру room_id, длина и упакованные события
+backend/api/events.py. Файл с суффиксом .gz сжимается. import загружает такой файл
+в game_events_archive другой базы, stats считает сводку по файлу без базы.
+    DATABASE_URL=postgresql://postgres@localhost/mafia python tools/game_log.py export games.mev.gz --after 0
+    python tools/game_log.py stats games.mev.gz
+    DATABASE_URL=postgresql://postgres@localhost/analytics python tools/game_log.py import games.mev.gz
+"""
+import argparse
+import gzip
+import json
+import os
+import struct
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+import db  # noqa: E402
+from engine import faction_of  # noqa: E402
+from events import EVENT, EventType, decode, replay  # noqa: E402
+
+MAGIC = b'MAFIAEV1'
+GAME_HEADER = struct.Struct('<iI')
+IMPORT_BATCH = 500
+
+EXPORT_SQL = """
+    SELECT room_id, string_agg(events, ''::bytea ORDER BY seq) AS events
+    FROM game_events_archive
+    WHERE room_id > %s
+    GROUP BY room_id
+    ORDER BY room_id
+"""
+
+IMPORT_SQL = """
+    INSERT INTO game_events_archive (room_id, seq, events, created_at)
+    SELECT v.room_id, 0, v.events, CURRENT_TIMESTAMP
+    FROM unnest(%s::int[], %s::bytea[]) AS v(room_id, events)
+    WHERE NOT EXISTS (SELECT 1 FROM game_events_archive a WHERE a.room_id = v.room_id)
+"""
+
+
+def _open(path: str, mode: str):
+    if path == '-':
+        return sys.stdout.buffer if 'w' in mode else sys.stdin.buffer
+    return gzip.open(path, mode) if path.endswith('.gz') else open(path, mode)
+
+
+def write_games(f, games) -> int:
+    """Запись пар (room_id, события в байтах) в файл; возвращает число игр"""
+    f.write(MAGIC)
+    count = 0
+    for room_id, data in games:
+        f.write(GAME_HEADER.pack(room_id, len(data)))
+        f.write(data)
+        count += 1
+    return count
+
+
+def read_games(f):
+    """Игры из файла по одной: (room_id, события в байтах)"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a game log file')
+    while header := f.read(GAME_HEADER.size):
+        room_id, length = GAME_HEADER.unpack(header)
+        data = f.read(length)
+        if len(data) != length or length % EVENT.size:
+            raise ValueError(f'truncated events of room {room_id}')
+        yield room_id, data
+
+
+def export_games(path: str, after: int, itersize: int) -> int:
+    conn = db.get_db()
+    cur = conn.cursor(name='game_log_export')
+    cur.itersize = itersize
+    try:
+        cur.execute(EXPORT_SQL, (after,))
+        with _open(path, 'wb') as f:
+            return write_games(f, ((row['room_id'], bytes(row['events'])) for row in cur))
+    finally:
+        cur.close()
+        conn.rollback()
+        db.release_db(conn)
+
+
+def import_games(path: str) -> int:
+    """Загрузка пачками по IMPORT_BATCH игр; уже загруженные комнаты пропускаются"""
+    conn = db.get_db()
+    cur = conn.cursor()
+    inserted = 0
+
+    def flush(batch):
+        nonlocal inserted
+        cur.execute(IMPORT_SQL, ([room_id for room_id, _ in batch], [data for _, data in batch]))
+        inserted += cur.rowcount
+        conn.commit()
+
+    try:
+        with _open(path, 'rb') as f:
+            batch = []
+            for room_id, data in read_games(f):
+                batch.append((room_id, data))
+                if len(batch) == IMPORT_BATCH:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+    finally:
+        cur.close()
+        db.release_db(conn)
+    return inserted
+
+
+def summarize(path: str) -> dict:
+    """Победители, длина игр, смерти и победы по ролям - по файлу, без обращения к базе"""
+    winners = Counter()
+    role_games = Counter()
+    role_wins = Counter()
+    deaths = Counter()
+    games = events_total = rounds = 0
+
+    with _open(path, 'rb') as f:
+        for room_id, data in read_games(f):
+            events = decode(data)
+            state = replay(room_id, events)
+            games += 1
+            events_total += len(events)
+            rounds += state.round
+            winners[state.winner] += 1
+            deaths.update('lynch' if e.arg else 'night' for e in events if e.type == EventType.DEATH)
+            for role in state.roles.values():
+                role_games[role] += 1
+                role_wins[role] += faction_of(role) == state.winner
+
+    return {
+        'games': games,
+        'events': events_total,
+        'avg_rounds': round(rounds / games, 2) if games else 0,
+        'winners': dict(winners),
+        'deaths': dict(deaths),
+        'role_win_rate': {role: round(role_wins[role] / n, 4) for role, n in role_games.most_common()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help='выгрузить архив журналов в файл')
+    export.add_argument('path', help='файл (.gz сжимается) или - для stdout')
+    export.add_argument('--after', type=int, default=0, help='только комнаты с id больше этого')
+    export.add_argument('--itersize', type=int, default=2000, help='строк за одно чтение серверного курсора')
+    load = commands.add_parser('import', help='загрузить файл в game_events_archive')
+    load.add_argument('path')
+    stats = commands.add_parser('stats', help='сводка по файлу без базы')
+    stats.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(f'exported {export_games(args.path, args.after, args.itersize)} games', file=sys.stderr)
+    elif args.command == 'import':
+        print(f'imported {import_games(args.path)} games', file=sys.stderr)
+    else:
+        print(json.dumps(summarize(args.path), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
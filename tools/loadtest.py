@@ -0,0 +1,320 @@
+"""Нагрузочный прогон API: одновременные комнаты проходят типичную игровую сессию.
+
+Каждая комната: register → room/create → room/join → room/add-bot → game/start,
+затем круги с опросом room/info, ночными действиями, голосованием и game/advance до победителя.
+День длится до phase_ends_at: чтобы не ждать таймер, прогон сдвигает срок фазы в прошлое прямо в базе.
+handler вызывается в процессе (--mode inprocess) или через локальный HTTP-шим (--mode http).
+Отчёт: p50/p95/p99 по маршрутам, запросов к БД на вызов, пропускная способность.
+При заданном SESSION_SECRET игроки ходят с токенами из register; лимит частоты по умолчанию выключен
+(RATE_LIMIT_BACKEND=off), иначе круги быстрее секунды упираются в корзины игроков.
+    DATABASE_URL=postgresql://postgres@localhost/mafia python tools/loadtest.py --rooms 20 --save baseline.json
+    DATABASE_URL=... python tools/loadtest.py --rooms 20 --compare baseline.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'off')
+
+import psycopg2  # noqa: E402
+from psycopg2.extras import RealDictCursor  # noqa: E402
+
+import db  # noqa: E402
+import index  # noqa: E402
+from engine import NIGHT_ACTIONS  # noqa: E402
+
+_local = threading.local()
+
+
+class CountingCursor(RealDictCursor):
+    """Курсор, считающий запросы текущего потока"""
+
+    def execute(self, query, vars=None):
+        _local.queries = getattr(_local, 'queries', 0) + 1
+        return super().execute(query, vars)
+
+
+def counting_connect():
+    return psycopg2.connect(
+        os.environ['DATABASE_URL'],
+        connection_factory=db.PooledConnection,
+        cursor_factory=CountingCursor,
+    )
+
+
+def invoke(event: dict) -> tuple[dict, int]:
+    """Вызов handler с подсчётом запросов к БД за время вызова"""
+    _local.queries = 0
+    response = index.handler(event, None)
+    return response, _local.queries
+
+
+class ShimHandler(BaseHTTPRequestHandler):
+    """HTTP-обёртка над handler: запрос превращается в event облачной функции"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _serve(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        response, queries = invoke({
+            'httpMethod': self.command,
+            'queryStringParameters': dict(parse_qsl(url.query)),
+            'headers': dict(self.headers),
+            'body': self.rfile.read(length).decode() if length else None,
+        })
+        body = response['body'].encode()
+        self.send_response(response['statusCode'])
+        for name, value in response['headers'].items():
+            self.send_header(name, value)
+        self.send_header('X-Query-Count', str(queries))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_OPTIONS = _serve
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Client:
+    """Клиент одной комнаты: вызывает API и копит задержки по маршрутам"""
+
+    def __init__(self, mode: str, port: int | None, samples: dict, lock: threading.Lock):
+        self.mode = mode
+        self.conn = http.client.HTTPConnection('127.0.0.1', port) if mode == 'http' else None
+        self.samples = samples
+        self.lock = lock
+
+    def call(self, method: str, path: str, body: dict | None = None, session: str | None = None, **query):
+        """Вызов маршрута; session - токен из ответа register для маршрутов, требующих сессии"""
+        headers = {'X-Session-Token': session} if session else {}
+        started = time.perf_counter()
+        if self.mode == 'http':
+            self.conn.request(method, '/?' + urlencode({'path': path, **query}),
+                              body=json.dumps(body).encode() if body is not None else None,
+                              headers={'Content-Type': 'application/json', **headers})
+            reply = self.conn.getresponse()
+            status, raw = reply.status, reply.read().decode()
+            queries = int(reply.getheader('X-Query-Count', 0))
+        else:
+            response, queries = invoke({
+                'httpMethod': method,
+                'queryStringParameters': {'path': path, **{k: str(v) for k, v in query.items()}},
+                'headers': headers,
+                'body': json.dumps(body) if body is not None else None,
+            })
+            status, raw = response['statusCode'], response['body']
+        elapsed = time.perf_counter() - started
+
+        with self.lock:
+            self.samples[path].append((elapsed, queries, status))
+        return status, json.loads(raw) if raw else None
+
+
+def play_room(client: Client, number: int, humans: int, bots: int, polls: int, max_rounds: int,
+              rng, room_ids: list) -> str | None:
+    """Полная сессия одной комнаты; возвращает победителя или None"""
+    tag = f'{os.getpid()}-{number}-{rng.randrange(10 ** 6)}'
+    registered = [client.call('POST', 'register', {'username': f'load-{tag}-{i}'})[1] for i in range(humans)]
+    users = [user['id'] for user in registered]
+    sessions = {user['id']: user.get('session_token') for user in registered}
+    _, room = client.call('POST', 'room/create', {'name': f'load-{tag}', 'host_user_id': users[0], 'max_players': 20})
+    room_ids.append(room['id'])
+    for user_id in users[1:]:
+        client.call('POST', 'room/join', {'room_id': room['id'], 'user_id': user_id})
+    if bots:
+        client.call('POST', 'room/add-bot', {'room_id': room['id'], 'count': bots})
+    client.call('POST', 'game/start', {'room_id': room['id']})
+    roles = seat_roles(room['id'])
+
+    for _ in range(max_rounds):
+        for _ in range(polls):
+            _, info = client.call('GET', 'room/info', id=room['id'])
+        alive = [p['id'] for p in info['players'] if p['is_alive']]
+        for user_id in users:
+            action_type = NIGHT_ACTIONS.get(roles[user_id])
+            if user_id in alive and action_type:
+                target = rng.choice([p for p in alive if p != user_id])
+                client.call('POST', 'game/action', {'room_id': room['id'], 'actor_id': user_id, 'target_id': target,
+                                                    'action_type': action_type}, session=sessions[user_id])
+        result = advance(client, room['id'])
+        if result.get('winner'):
+            return result['winner']
+        alive = [p for p in alive if p not in result.get('deaths', ())]
+
+        expire_phase(room['id'])
+        result = advance(client, room['id'])
+        if result.get('winner'):
+            return result['winner']
+        for user_id in users:
+            if user_id in alive:
+                target = rng.choice([p for p in alive if p != user_id])
+                client.call('POST', 'game/vote', {'room_id': room['id'], 'actor_id': user_id, 'target_id': target},
+                            session=sessions[user_id])
+        result = advance(client, room['id'])
+        if result.get('winner'):
+            return result['winner']
+    return None
+
+
+def advance(client: Client, room_id: int) -> dict:
+    """game/advance; если фаза ещё ждёт срока или ходов (409), срок сдвигается и переход повторяется"""
+    status, result = client.call('POST', 'game/advance', {'room_id': room_id})
+    if status == 409:
+        expire_phase(room_id)
+        status, result = client.call('POST', 'game/advance', {'room_id': room_id})
+    return result
+
+
+def seat_roles(room_id: int) -> dict:
+    """Роли игроков комнаты: API их не раскрывает, а ночью нужно действие своей роли"""
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute("SELECT user_id, role FROM room_players WHERE room_id = %s", (room_id,))
+    roles = {row['user_id']: row['role'] for row in cur.fetchall()}
+    conn.rollback()
+    cur.close()
+    db.release_db(conn)
+    return roles
+
+
+def expire_phase(room_id: int) -> None:
+    """Срок текущей фазы в прошлом: день заканчивается без ожидания таймера"""
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute("UPDATE rooms SET phase_ends_at = CURRENT_TIMESTAMP - INTERVAL '1 second' WHERE id = %s", (room_id,))
+    conn.commit()
+    cur.close()
+    db.release_db(conn)
+
+
+def release_bots(room_ids: list[int]) -> None:
+    """Возврат арендованных ботов в пул, как это делает sweeper для завершённых комнат"""
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute("UPDATE bot_pool SET room_id = NULL, leased_at = NULL WHERE room_id = ANY(%s)", (room_ids,))
+    conn.commit()
+    cur.close()
+    db.release_db(conn)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    routes = {}
+    for path, rows in sorted(samples.items()):
+        latencies = [row[0] * 1000 for row in rows]
+        routes[path] = {
+            'calls': len(rows),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'queries_per_call': round(sum(row[1] for row in rows) / len(rows), 2),
+            'errors': sum(1 for row in rows if row[2] >= 500),
+        }
+    calls = sum(route['calls'] for route in routes.values())
+    return {'elapsed_s': round(elapsed, 3), 'calls': calls, 'throughput_rps': round(calls / elapsed, 1), 'routes': routes}
+
+
+def print_report(summary: dict) -> None:
+    print(f"{'route':<16}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/call':>8}{'5xx':>5}")
+    for path, route in summary['routes'].items():
+        print(f"{path:<16}{route['calls']:>7}{route['p50_ms']:>9.2f}{route['p95_ms']:>9.2f}"
+              f"{route['p99_ms']:>9.2f}{route['queries_per_call']:>8.2f}{route['errors']:>5}")
+    print(f"{summary['calls']} calls in {summary['elapsed_s']:.2f}s ({summary['throughput_rps']:.0f} req/s)")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Регрессии относительно сохранённого прогона: рост p95, числа запросов к БД, ошибки"""
+    problems = []
+    for path, route in summary['routes'].items():
+        base = baseline['routes'].get(path)
+        if base is None:
+            continue
+        if route['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            problems.append(f"{path}: p95 {base['p95_ms']:.2f} -> {route['p95_ms']:.2f} ms")
+        if route['queries_per_call'] > base['queries_per_call'] + 0.01:
+            problems.append(f"{path}: queries/call {base['queries_per_call']} -> {route['queries_per_call']}")
+        if route['errors'] > base['errors']:
+            problems.append(f"{path}: {route['errors']} server errors")
+    if summary['throughput_rps'] < baseline['throughput_rps'] * (1 - tolerance):
+        problems.append(f"throughput {baseline['throughput_rps']} -> {summary['throughput_rps']} req/s")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--rooms', type=int, default=20, help='комнат всего')
+    parser.add_argument('--concurrency', type=int, default=8, help='комнат одновременно')
+    parser.add_argument('--humans', type=int, default=6, help='живых игроков в комнате')
+    parser.add_argument('--bots', type=int, default=6, help='ботов в комнате')
+    parser.add_argument('--polls', type=int, default=3, help='опросов room/info за круг')
+    parser.add_argument('--max-rounds', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='сохранить результат как базовый JSON')
+    parser.add_argument('--compare', help='сравнить с базовым JSON и завершиться с кодом 1 при регрессии')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимый рост p95 и падение req/s')
+    args = parser.parse_args()
+
+    db._connect = counting_connect
+    server = None
+    port = None
+    if args.mode == 'http':
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ShimHandler)
+        server.daemon_threads = True
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    winners = defaultdict(int)
+    room_ids = []
+
+    def run(number: int):
+        client = Client(args.mode, port, samples, lock)
+        winner = play_room(client, number, args.humans, args.bots, args.polls, args.max_rounds,
+                           random.Random(args.seed * 100003 + number), room_ids)
+        with lock:
+            winners[winner] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run, range(args.rooms)))
+    summary = summarize(samples, time.perf_counter() - started)
+    release_bots(room_ids)
+    summary['config'] = {k: v for k, v in vars(args).items() if k not in ('save', 'compare')}
+    if server:
+        server.shutdown()
+
+    print_report(summary)
+    print('winners:', dict(winners))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(summary, json.load(f), args.tolerance)
+        if problems:
+            sys.exit('REGRESSION: ' + '; '.join(problems))
+        print('OK: no regressions against', args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Нагрузочный тест шлюза событий gateway/server.py: тысячи простаивающих SSE-подписчиков и рассылка NOTIFY.
+
+Запускает шлюз отдельным процессом, открывает --clients соединений по --rooms комнатам,
+снимает RSS шлюза до и после подключения и после простоя, затем отправляет --events
+NOTIFY в случайные комнаты и измеряет задержку доставки от pg_notify до получения клиентом.
+    DATABASE_URL=postgresql://postgres@localhost/mafia python tools/loadtest_gateway.py --clients 10000 --rooms 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+from room_state import ROOM_EVENTS_CHANNEL  # noqa: E402
+
+GATEWAY = os.path.join(os.path.dirname(__file__), '..', 'gateway', 'server.py')
+# комнаты теста не пересекаются с настоящими
+ROOM_ID_BASE = 1_000_000_000
+
+
+class Client(asyncio.Protocol):
+    """Подписчик: считает события и записывает задержку по версии из поля id"""
+
+    def __init__(self, room_id: int, sent: dict, latencies: list, ready: asyncio.Event, state: dict):
+        self.room_id = room_id
+        self.sent = sent
+        self.latencies = latencies
+        self.ready = ready
+        self.state = state
+        self.buffer = b''
+        self.subscribed = False
+
+    def connection_made(self, transport):
+        transport.write(f'GET /events?room={self.room_id} HTTP/1.1\r\nHost: gateway\r\n\r\n'.encode())
+
+    def data_received(self, data: bytes):
+        now = time.perf_counter()
+        self.buffer += data
+        *frames, self.buffer = self.buffer.split(b'\n\n')
+        for frame in frames:
+            if not self.subscribed:
+                if frame.startswith(b'HTTP/1.1 200'):
+                    self.subscribed = True
+                    self.state['subscribed'] += 1
+                    if self.state['subscribed'] == self.state['expected']:
+                        self.ready.set()
+                continue
+            if frame.startswith(b'id: '):
+                version = int(frame[4:frame.index(b'\n')])
+                self.latencies.append(now - self.sent[version])
+
+    def connection_lost(self, exc):
+        self.state['lost'] += 1
+
+
+def rss_kb(pid: int) -> int:
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+async def health(port: int) -> dict:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'GET /health HTTP/1.1\r\nHost: gateway\r\n\r\n')
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.partition(b'\r\n\r\n')[2])
+
+
+async def wait_listening(port: int, process: subprocess.Popen, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gateway exited')
+        try:
+            if (await health(port))['listening']:
+                return
+        except OSError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError('gateway did not start')
+
+
+async def connect_clients(args, room_ids, sent, latencies, state) -> list:
+    ready = asyncio.Event()
+    state['expected'] = args.clients
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    transports = []
+
+    async def connect(i):
+        async with semaphore:
+            room_id = room_ids[i % len(room_ids)]
+            transport, _ = await loop.create_connection(
+                lambda: Client(room_id, sent, latencies, ready, state), '127.0.0.1', args.port)
+            transports.append(transport)
+
+    await asyncio.gather(*(connect(i) for i in range(args.clients)))
+    await asyncio.wait_for(ready.wait(), 60)
+    return transports
+
+
+async def run(args) -> dict:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < args.clients + 100:
+        raise SystemExit(f'RLIMIT_NOFILE {hard} is too low for {args.clients} clients')
+
+    env = {**os.environ, 'GATEWAY_HOST': '127.0.0.1', 'GATEWAY_PORT': str(args.port),
+           'GATEWAY_MAX_SUBSCRIBERS': str(args.clients)}
+    process = subprocess.Popen([sys.executable, GATEWAY], env=env,
+                               preexec_fn=lambda: resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard)))
+    try:
+        await wait_listening(args.port, process)
+        rss_start = rss_kb(process.pid)
+
+        room_ids = [ROOM_ID_BASE + i for i in range(args.rooms)]
+        sent, latencies = {}, []
+        state = {'subscribed': 0, 'lost': 0}
+        started = time.perf_counter()
+        transports = await connect_clients(args, room_ids, sent, latencies, state)
+        connect_seconds = time.perf_counter() - started
+        rss_connected = rss_kb(process.pid)
+
+        await asyncio.sleep(args.idle)
+        rss_idle = rss_kb(process.pid)
+
+        rng = random.Random(args.seed)
+        targets = [rng.choice(room_ids) for _ in range(args.events)]
+        expected = sum(args.clients // args.rooms + (room_id - ROOM_ID_BASE < args.clients % args.rooms)
+                       for room_id in targets)
+        async with await psycopg.AsyncConnection.connect(os.environ['DATABASE_URL'], autocommit=True) as conn:
+            for version, room_id in enumerate(targets, 1):
+                sent[version] = time.perf_counter()
+                await conn.execute("SELECT pg_notify(%s, %s)", (ROOM_EVENTS_CHANNEL, f'{room_id}:{version}:update'))
+                await asyncio.sleep(1 / args.rate)
+
+        deadline = time.monotonic() + 10
+        while len(latencies) < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        gateway = await health(args.port)
+        rss_end = rss_kb(process.pid)
+
+        for transport in transports:
+            transport.close()
+    finally:
+        process.terminate()
+        process.wait()
+
+    ordered = sorted(ms * 1000 for ms in latencies) or [0.0]
+    return {
+        'clients': args.clients,
+        'rooms': args.rooms,
+        'subscribed': state['subscribed'],
+        'lost': state['lost'],
+        'connect_s': round(connect_seconds, 2),
+        'rss_kb': {'start': rss_start, 'connected': rss_connected, 'idle': rss_idle, 'end': rss_end},
+        'rss_per_subscriber_bytes': round((rss_idle - rss_start) * 1024 / args.clients),
+        'events': args.events,
+        'deliveries_expected': expected,
+        'deliveries': len(latencies),
+        'latency_ms': {
+            'p50': round(statistics.median(ordered), 3),
+            'p99': round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))], 3),
+            'max': round(ordered[-1], 3),
+        },
+        'gateway': gateway,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--rooms', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=500, help='число NOTIFY после простоя')
+    parser.add_argument('--rate', type=float, default=200, help='NOTIFY в секунду')
+    parser.add_argument('--idle', type=float, default=5, help='простой после подключения, с')
+    parser.add_argument('--port', type=int, default=18090)
+    parser.add_argument('--connect-concurrency', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Холодный старт облачных функций: время импорта index и первого ответа.
+
+Каждый замер - новый процесс Python, как при холодном старте функции: импорт handler,
+первый OPTIONS, первый запрос без базы (404/405) и, если задан DATABASE_URL, первый запрос к базе.
+Дополнительно показывается, загружен ли psycopg2 к моменту ответа на OPTIONS.
+    python tools/measure_cold_start.py --runs 20
+    DATABASE_URL=postgresql://postgres@localhost/mafia python tools/measure_cold_start.py --importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+PROBE = r'''
+import json, os, sys, time
+started = time.perf_counter()
+import index
+imported = time.perf_counter()
+
+def timed(event):
+    t = time.perf_counter()
+    response = index.handler(event, None)
+    return (time.perf_counter() - t) * 1000, response['statusCode']
+
+result = {'import_ms': (imported - started) * 1000}
+result['options_ms'], _ = timed({'httpMethod': 'OPTIONS', 'queryStringParameters': {'path': 'rooms'}})
+result['driver_after_options'] = 'psycopg2' in sys.modules
+result['no_db_ms'], result['no_db_status'] = timed({'httpMethod': 'GET', 'queryStringParameters': {'path': 'nope'}})
+result['driver_after_no_db'] = 'psycopg2' in sys.modules
+if os.environ.get('DATABASE_URL') and FIRST_DB_EVENT:
+    result['first_db_ms'], result['first_db_status'] = timed(FIRST_DB_EVENT)
+    result['second_db_ms'], _ = timed(FIRST_DB_EVENT)
+print(json.dumps(result))
+'''
+
+FUNCTIONS = {
+    'api': {'httpMethod': 'GET', 'queryStringParameters': {'path': 'rooms'}},
+    'telegram-auth': None,
+}
+
+
+def probe(function: str) -> dict:
+    code = f'FIRST_DB_EVENT = {FUNCTIONS[function]!r}\n' + PROBE
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.join(BACKEND, function),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(function: str, top: int) -> list[tuple[int, str]]:
+    """Самые дорогие модули импорта index по -X importtime (накопительно, мкс)"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import index'],
+                            cwd=os.path.join(BACKEND, function), capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--functions', default=','.join(FUNCTIONS))
+    parser.add_argument('--importtime', action='store_true', help='показать самые дорогие импорты')
+    parser.add_argument('--json', help='сохранить медианы в файл')
+    args = parser.parse_args()
+
+    summary = {}
+    for function in args.functions.split(','):
+        runs = [probe(function) for _ in range(args.runs)]
+        medians = {key: round(statistics.median(run[key] for run in runs), 3)
+                   for key in runs[0] if key.endswith('_ms')}
+        medians['driver_after_options'] = any(run['driver_after_options'] for run in runs)
+        medians['driver_after_no_db'] = any(run['driver_after_no_db'] for run in runs)
+        summary[function] = medians
+
+        print(f'{function} (median of {args.runs} cold processes)')
+        for key, value in medians.items():
+            print(f'    {key:<22} {value}')
+        if args.importtime:
+            for cumulative, name in import_profile(function, 10):
+                print(f'    import {cumulative / 1000:8.2f} ms  {name}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Проверка планов горячих запросов API через EXPLAIN ANALYZE на заполненной базе.
+
+Каждый запрос из backend/api (те же константы SQL, что выполняют маршруты) запускается
+с параметрами по образцам из базы; план должен использовать ожидаемые индексы и не содержать
+Seq Scan по большим таблицам, а для запросов с ORDER BY по индексу - узла Sort.
+Изменяющие запросы выполняются в транзакции, которая откатывается. Код выхода 1 при расхождении.
+    DATABASE_URL=postgresql://postgres@localhost/mafia_plan python tools/plan_check.py --seed --scale 1
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+import psycopg  # noqa: E402
+
+import db  # noqa: E402
+import index  # noqa: E402
+from leaderboard import PAGE_SQL, RANK_SQL, REFRESH_SQL  # noqa: E402
+from lobby import LIST_SQL  # noqa: E402
+from stats import FINALIZE_SQL, JOURNAL_SQL  # noqa: E402
+
+import seed_data  # noqa: E402
+
+# Справочники из нескольких строк: полный проход по ним дешевле индекса
+SMALL_TABLES = {'achievements', 'bot_pool'}
+
+# Журналы событий seed_data не генерирует: по пачке на начатую игру и столько же уже архивированных
+EVENTS_FIXTURE_SQL = """
+    INSERT INTO game_events (room_id, seq, events)
+    SELECT id, state_version, decode(repeat('00', 13 * 40), 'hex')
+    FROM rooms
+    WHERE status <> 'waiting'
+    ON CONFLICT DO NOTHING;
+
+    INSERT INTO game_events_archive (room_id, seq, events, created_at)
+    SELECT m.max_id + g, 1, decode(repeat('00', 13 * 40), 'hex'), CURRENT_TIMESTAMP
+    FROM (SELECT MAX(id) AS max_id, COUNT(*) AS rooms FROM rooms) m, generate_series(1, m.rooms) g;
+
+    ANALYZE game_events;
+    ANALYZE game_events_archive;
+"""
+
+SAMPLES_SQL = """
+    SELECT (SELECT id FROM rooms WHERE status = 'waiting' ORDER BY id DESC LIMIT 1) AS waiting_room,
+           (SELECT id FROM rooms WHERE status = 'playing' ORDER BY id DESC LIMIT 1) AS playing_room,
+           (SELECT id FROM rooms WHERE status = 'finished' ORDER BY id DESC LIMIT 1) AS finished_room,
+           (SELECT user_id FROM leaderboard ORDER BY user_id LIMIT 1 OFFSET 10) AS ranked_user,
+           (SELECT user_id FROM user_achievements ORDER BY user_id LIMIT 1) AS achiever,
+           (SELECT MAX(id) FROM users WHERE NOT is_bot) AS newcomer
+"""
+
+
+def checks(sample: dict, cursor: tuple, room_cursor: tuple) -> list:
+    """Проверки: (имя, SQL, параметры, индексы, которые должны быть в плане, запрещён ли Sort)"""
+    waiting, playing, finished = sample['waiting_room'], sample['playing_room'], sample['finished_room']
+    active = "status IN ('waiting', 'playing')"
+    joinable = "status = 'waiting' AND player_count < LEAST(max_players, %(cap)s)"
+    list_args = {'limit': 50, 'cap': index.MAX_PLAYERS, 'created_at': room_cursor[0], 'room_id': room_cursor[1]}
+    return [
+        ('user', index.USER_SQL, (sample['ranked_user'],), {'users_pkey'}, True),
+        ('rooms', LIST_SQL.format(where=active), list_args, {'idx_rooms_active_list'}, True),
+        ('rooms joinable', LIST_SQL.format(where=joinable), list_args, {'idx_rooms_waiting_list'}, True),
+        ('rooms cursor', LIST_SQL.format(where=f'{active} AND (created_at, id) < (%(created_at)s, %(room_id)s)'),
+         list_args, {'idx_rooms_active_list'}, True),
+        ('room/info room', index.ROOM_SQL, (waiting,), {'rooms_pkey'}, True),
+        ('room/info players', index.ROOM_PLAYERS_SQL, (waiting,), {'idx_room_players_room_order'}, True),
+        ('room/changes', index.ROOM_CHANGES_SQL, (0, playing), {'rooms_pkey', 'idx_room_players_room_order'}, True),
+        ('room/join', index.JOIN_ROOM_SQL, index.join_room_args({'room_id': waiting, 'user_id': sample['newcomer']}),
+         {'rooms_pkey'}, True),
+        ('room/add-bot', index.ADD_BOTS_SQL, index.add_bots_args({'room_id': waiting, 'count': 2}),
+         {'rooms_pkey', 'idx_bot_pool_free'}, False),
+        ('leaderboard', PAGE_SQL.format(where=''), (50, 0), {'idx_leaderboard_rank', 'users_pkey'}, True),
+        ('leaderboard cursor', PAGE_SQL.format(where='WHERE (l.total_wins, l.win_rate, l.user_id) < (%s, %s, %s)'),
+         (*cursor, 50, 0), {'idx_leaderboard_rank'}, True),
+        ('leaderboard/rank', RANK_SQL, (sample['ranked_user'],), {'leaderboard_pkey', 'leaderboard_scores_pkey'},
+         True),
+        ('achievements', index.USER_ACHIEVEMENTS_SQL, (sample['achiever'],),
+         {'user_achievements_user_id_achievement_id_key'}, True),
+        ('game/tally', index.VOTE_TALLY_SQL, (None, playing), {'rooms_pkey', 'idx_game_actions_vote_tally'}, False),
+        ('game/advance state', index.PHASE_STATE_SQL, (playing,),
+         {'rooms_pkey', 'idx_room_players_room_order', 'idx_game_actions_phase'}, False),
+        ('game/start lock', index.LOCK_ROOM_FOR_START_SQL, (waiting,), {'rooms_pkey', 'idx_room_players_room_order'},
+         True),
+        ('game/replay', index.GAME_EVENTS_SQL, {'room_id': finished},
+         {'game_events_pkey', 'game_events_archive_pkey'}, False),
+        ('finalize journal', JOURNAL_SQL, (finished,), {'game_events_pkey'}, False),
+        ('finalize', FINALIZE_SQL, {'user_ids': [sample['ranked_user']], 'won': [True], 'survived': [True],
+                                    'kills': [1], 'catches': [0]}, {'users_pkey'}, False),
+        ('leaderboard refresh', REFRESH_SQL, {'user_ids': [sample['ranked_user']]},
+         {'users_pkey', 'leaderboard_pkey'}, False),
+    ]
+
+
+def walk(plan: dict):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from walk(child)
+
+
+def explain(cur, sql: str, args, analyze: bool) -> dict:
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    cur.execute(f'EXPLAIN ({options}) {sql}', args)
+    return cur.fetchone()['QUERY PLAN'][0]
+
+
+def verify(result: dict, indexes: set, no_sort: bool) -> tuple[set, list]:
+    """Использованные индексы и список нарушений ожиданий"""
+    nodes = list(walk(result['Plan']))
+    used = {node['Index Name'] for node in nodes if 'Index Name' in node}
+    problems = [f'no {name}' for name in sorted(indexes - used)]
+    problems += [f"Seq Scan on {node['Relation Name']}" for node in nodes
+                 if node['Node Type'] == 'Seq Scan' and node['Relation Name'] not in SMALL_TABLES]
+    if no_sort and any(node['Node Type'] in ('Sort', 'Incremental Sort') for node in nodes):
+        problems.append('Sort')
+    return used, problems
+
+
+def seed(scale: float, seed_value: int) -> None:
+    """Данные seed_data и журналы событий для проверки game/replay"""
+    with psycopg.connect(os.environ['DATABASE_URL']) as conn:
+        seed_data.seed(conn, scale, seed_value, days=180)
+        conn.execute(EVENTS_FIXTURE_SQL)
+
+
+def run(analyze: bool) -> list[dict]:
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute(SAMPLES_SQL)
+    sample = cur.fetchone()
+    cur.execute("SELECT total_wins, win_rate, user_id FROM leaderboard ORDER BY total_wins DESC, win_rate DESC, "
+                "user_id DESC OFFSET 50 LIMIT 1")
+    cursor = tuple(cur.fetchone().values())
+    cur.execute("SELECT created_at, id FROM rooms WHERE status IN ('waiting', 'playing') "
+                "ORDER BY created_at DESC, id DESC OFFSET 50 LIMIT 1")
+    room_cursor = tuple(cur.fetchone().values())
+    conn.rollback()
+
+    results = []
+    for name, sql, args, indexes, no_sort in checks(sample, cursor, room_cursor):
+        try:
+            result = explain(cur, sql, args, analyze)
+        finally:
+            conn.rollback()
+        used, problems = verify(result, indexes, no_sort)
+        results.append({'name': name, 'ms': result.get('Execution Time'), 'indexes': sorted(used),
+                        'problems': problems})
+    cur.close()
+    db.release_db(conn)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', action='store_true', help='сначала заполнить базу данными tools/seed_data.py')
+    parser.add_argument('--scale', type=float, default=1.0, help='масштаб seed_data: 1 - 1 млн пользователей')
+    parser.add_argument('--seed-value', type=int, default=1)
+    parser.add_argument('--no-analyze', action='store_true', help='только EXPLAIN без выполнения запросов')
+    parser.add_argument('--json', help='сохранить результат в файл')
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.scale, args.seed_value)
+
+    results = run(not args.no_analyze)
+    for row in results:
+        ms = f"{row['ms']:9.3f}" if row['ms'] is not None else '        -'
+        status = 'ok' if not row['problems'] else 'FAIL ' + ', '.join(row['problems'])
+        print(f"{row['name']:<22}{ms} ms  {status}  [{', '.join(row['indexes'])}]")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if any(row['problems'] for row in results) else 0)
+
+
+if __name__ == '__main__':
+    main()
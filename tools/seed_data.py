@@ -0,0 +1,437 @@
+"""Синтетические данные для замеров на объёме: пользователи, комнаты, места, действия и достижения.
+
+Схема создаётся миграциями db_migrations (--migrate), строки генерируются массивами NumPy
+и загружаются потоком COPY порциями, без INSERT по строке. Масштаб 1 - миллион пользователей
+и 100 тыс. комнат, около 10 млн строк. При одном --seed и одной исходной базе данные совпадают.
+Распределения: активность игроков с тяжёлым хвостом, умение из бета-распределения, рост
+регистраций и суточный профиль создания комнат, роли по таблицам utils, действия ролей engine.
+    DATABASE_URL=postgresql://postgres@localhost/mafia_perf python tools/seed_data.py --migrate --scale 1 --seed 7
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import psycopg
+from psycopg import sql
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+from engine import MAX_ROUNDS, NIGHT_ACTIONS, PHASE_SECONDS  # noqa: E402
+from utils import role_table  # noqa: E402
+
+SCHEMA = 't_p97186151_mafia_mobile_version'
+MIGRATIONS = os.path.join(os.path.dirname(__file__), '..', 'db_migrations')
+
+USERS_PER_SCALE = 1_000_000
+ROOMS_PER_SCALE = 100_000
+USER_CHUNK = 200_000
+ROOM_CHUNK = 10_000
+NULL = '\\N'
+
+NAMES = ('Алекс', 'Мария', 'Дмитрий', 'Анна', 'Иван', 'Ольга', 'Сергей', 'Елена', 'Никита', 'Ксения',
+         'shadow', 'don', 'neo', 'luna', 'ghost', 'fox', 'raven', 'wolf', 'mira', 'kai')
+MAX_PLAYERS = np.array([8, 10, 12, 16, 20])
+MAX_PLAYERS_SHARE = np.array([0.15, 0.25, 0.35, 0.15, 0.10])
+# Доля комнат по часу суток (UTC): вечерний пик, ночной спад
+HOURLY = np.array([3, 2, 1, 1, 1, 1, 2, 3, 4, 4, 5, 5, 5, 5, 5, 6, 6, 7, 8, 9, 9, 8, 6, 4], dtype=float)
+ACTIVE_SHARE = 0.05
+EXTENDED_SHARE = 0.15
+ROUND_SECONDS = sum(PHASE_SECONDS.values())
+# Вид достижения -> счётчик users, как в stats.FINALIZE_SQL
+PROGRESS = {'total_wins': 'wins', 'survive_streak': 'streak', 'first_kill': 'kills', 'catch_mafia': 'caught'}
+
+TABLES = {
+    'users': ('id', 'telegram_id', 'username', 'total_games', 'total_wins', 'survive_streak', 'total_kills',
+              'mafia_caught', 'created_at', 'updated_at'),
+    'leaderboard': ('user_id', 'total_games', 'total_wins', 'win_rate'),
+    'user_achievements': ('user_id', 'achievement_id', 'unlocked_at'),
+    'rooms': ('id', 'name', 'host_user_id', 'max_players', 'status', 'current_phase', 'phase_ends_at', 'round',
+              'player_count', 'role_set', 'role_seed', 'state_version', 'created_at', 'started_at', 'ended_at'),
+    'room_players': ('room_id', 'user_id', 'role', 'is_alive', 'joined_at', 'state_version'),
+    'game_actions': ('room_id', 'actor_user_id', 'target_user_id', 'action_type', 'game_phase', 'round',
+                     'created_at'),
+}
+
+
+# Внешние ключи и вторичные индексы загружаемых таблиц: на время COPY снимаются и потом
+# создаются одним проходом - проверка и вставка в индекс по строке в разы медленнее самой загрузки.
+# PRIMARY KEY и UNIQUE-ограничения остаются.
+DEFERRED_SQL = """
+    SELECT 'constraint' AS kind, c.conrelid::regclass::text AS tbl, c.conname::text AS name,
+           pg_get_constraintdef(c.oid) AS definition
+    FROM pg_constraint c
+    WHERE c.contype = 'f' AND c.conrelid = ANY(%(tables)s::regclass[])
+    UNION ALL
+    SELECT 'index', i.indrelid::regclass::text, i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+    FROM pg_index i
+    WHERE i.indrelid = ANY(%(tables)s::regclass[]) AND NOT i.indisprimary
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+"""
+
+
+def cumcount(counts: np.ndarray) -> np.ndarray:
+    """Номер элемента внутри своей группы для групп подряд идущих длин counts"""
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def text(values) -> list[str]:
+    return np.asarray(values).astype(str).tolist()
+
+
+def stamps(seconds: np.ndarray) -> list[str]:
+    return np.datetime_as_string(seconds.astype('datetime64[s]')).tolist()
+
+
+def nullable(values: list[str], present: np.ndarray) -> list[str]:
+    return [value if ok else NULL for value, ok in zip(values, present.tolist())]
+
+
+def tsv(columns: list[list[str]]) -> bytes:
+    """Порция COPY в текстовом формате из столбцов одинаковой длины"""
+    return ('\n'.join(map('\t'.join, zip(*columns))) + '\n').encode()
+
+
+class Loader:
+    """COPY по таблицам с учётом строк и времени; каждая порция - отдельная транзакция"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = dict.fromkeys(TABLES, 0)
+        self.seconds = dict.fromkeys(TABLES, 0.0)
+
+    def copy(self, table: str, columns: list[list[str]]):
+        if not columns[0]:
+            return
+        started = time.perf_counter()
+        statement = sql.SQL('COPY {} ({}) FROM STDIN').format(
+            sql.Identifier(table), sql.SQL(', ').join(map(sql.Identifier, TABLES[table])))
+        with self.conn.cursor() as cur, cur.copy(statement) as copy:
+            copy.write(tsv(columns))
+        self.conn.commit()
+        self.rows[table] += len(columns[0])
+        self.seconds[table] += time.perf_counter() - started
+
+
+def defer_constraints(conn) -> list[tuple]:
+    with conn.cursor() as cur:
+        cur.execute(DEFERRED_SQL, {'tables': list(TABLES)})
+        deferred = cur.fetchall()
+        for kind, table, name, _ in deferred:
+            if kind == 'constraint':
+                cur.execute(sql.SQL('ALTER TABLE {} DROP CONSTRAINT {}').format(
+                    sql.SQL(table), sql.Identifier(name)))
+            else:
+                cur.execute(sql.SQL('DROP INDEX {}').format(sql.SQL(name)))
+    conn.commit()
+    return deferred
+
+
+def restore_constraints(conn, deferred: list[tuple]):
+    """Сначала индексы, затем внешние ключи: проверка ключа - один проход по таблице"""
+    with conn.cursor() as cur:
+        cur.execute("SET maintenance_work_mem = '512MB'")
+        for kind, table, name, definition in sorted(deferred, key=lambda item: item[0] != 'index'):
+            if kind == 'index':
+                cur.execute(definition)
+            else:
+                cur.execute(sql.SQL('ALTER TABLE {} ADD CONSTRAINT {} {}').format(
+                    sql.SQL(table), sql.Identifier(name), sql.SQL(definition)))
+    conn.commit()
+
+
+def migrate(conn):
+    """Схема с нуля: все миграции по порядку; база должна быть пустой"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL AS exists", (f'{SCHEMA}.users',))
+        if cur.fetchone()[0]:
+            raise SystemExit(f'{SCHEMA}.users already exists, --migrate needs an empty database')
+        cur.execute(sql.SQL('CREATE SCHEMA IF NOT EXISTS {}').format(sql.Identifier(SCHEMA)))
+        cur.execute(sql.SQL('ALTER DATABASE {} SET search_path = {}').format(
+            sql.Identifier(conn.info.dbname), sql.Identifier(SCHEMA)))
+        cur.execute(sql.SQL('SET search_path = {}').format(sql.Identifier(SCHEMA)))
+        for path in sorted(glob.glob(os.path.join(MIGRATIONS, 'V*.sql'))):
+            with open(path, encoding='utf-8') as f:
+                cur.execute(f.read())
+    conn.commit()
+
+
+def user_activity(rng, count: int) -> dict:
+    """Счётчики игроков: четверть не играла, у остальных число игр логнормально, умение ~ Beta(4, 6)"""
+    played = rng.random(count) > 0.25
+    games = np.where(played, np.clip(np.rint(rng.lognormal(2.3, 1.2, count)), 1, 3000), 0).astype(np.int64)
+    wins = rng.binomial(games, rng.beta(4, 6, count))
+    return {
+        'games': games,
+        'wins': wins,
+        'streak': np.minimum(games, rng.geometric(0.35, count) - 1),
+        'kills': rng.binomial(games, 0.12),
+        'caught': rng.binomial(games, 0.04),
+    }
+
+
+def load_users(loader: Loader, rng, first_id: int, total: int, start: int, now: int,
+               achievements: list) -> np.ndarray:
+    """Пользователи, рейтинг и достижения; возвращает число игр каждого для выбора игроков в комнаты"""
+    # Регистрации растут к концу периода: момент - степенное распределение на [start, now]
+    created = np.sort(start + ((now - start) * rng.power(2, total)).astype(np.int64))
+    games = np.empty(total, dtype=np.int64)
+    scores = {}
+
+    for offset in range(0, total, USER_CHUNK):
+        count = min(USER_CHUNK, total - offset)
+        ids = np.arange(first_id + offset, first_id + offset + count)
+        born = created[offset:offset + count]
+        stats = user_activity(rng, count)
+        updated = born + ((now - born) * rng.random(count)).astype(np.int64)
+        games[offset:offset + count] = stats['games']
+
+        id_text = text(ids)
+        loader.copy('users', [
+            id_text,
+            nullable(text(5_000_000_000 + ids), rng.random(count) < 0.7),
+            [f'{NAMES[i % len(NAMES)]}_{i}' for i in ids.tolist()],
+            text(stats['games']), text(stats['wins']), text(stats['streak']), text(stats['kills']),
+            text(stats['caught']), stamps(born), stamps(updated),
+        ])
+
+        ranked = stats['games'] > 0
+        ranked_games, ranked_wins = stats['games'][ranked], stats['wins'][ranked]
+        # ROUND() Postgres округляет половину от нуля, как (2 * 100 * wins + games) // (2 * games)
+        win_rate = (200 * ranked_wins + ranked_games) // (2 * ranked_games)
+        loader.copy('leaderboard', [text(ids[ranked]), text(ranked_games), text(ranked_wins), text(win_rate)])
+        keys, counts = np.unique(ranked_wins * 101 + win_rate, return_counts=True)
+        for key, users in zip(keys.tolist(), counts.tolist()):
+            scores[key] = scores.get(key, 0) + users
+
+        unlocked_user, unlocked_id = [], []
+        for achievement_id, requirement_type, value in achievements:
+            reached = stats[PROGRESS[requirement_type]] >= value
+            unlocked_user.append(ids[reached])
+            unlocked_id.append(np.full(reached.sum(), achievement_id))
+        unlocked_user = np.concatenate(unlocked_user)
+        position = unlocked_user - ids[0]
+        unlocked_at = born[position] + ((updated[position] - born[position]) * rng.random(len(position)))
+        loader.copy('user_achievements', [text(unlocked_user), text(np.concatenate(unlocked_id)),
+                                          stamps(unlocked_at.astype(np.int64))])
+
+    with loader.conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO leaderboard_scores (total_wins, win_rate, users)
+            SELECT * FROM unnest(%s::int[], %s::int[], %s::int[])
+            ON CONFLICT (total_wins, win_rate) DO UPDATE SET users = leaderboard_scores.users + EXCLUDED.users
+        """, ([key // 101 for key in scores], [key % 101 for key in scores], list(scores.values())))
+    loader.conn.commit()
+    return games
+
+
+def room_times(rng, total: int, start: int, now: int) -> np.ndarray:
+    """Моменты создания: день с ростом к концу периода, час по суточному профилю HOURLY"""
+    days = max(1, (now - start) // 86400)
+    day = (days * rng.power(1.5, total)).astype(np.int64)
+    hour = rng.choice(24, size=total, p=HOURLY / HOURLY.sum())
+    created = start + day * 86400 + hour * 3600 + rng.integers(0, 3600, total)
+    return np.sort(np.minimum(created, now - 7200))
+
+
+def pick_users(rng, cdf: np.ndarray, first_user: int, seat_room: np.ndarray) -> np.ndarray:
+    """Игроки мест с вероятностью по активности (число игр + 1), без повторов внутри комнаты"""
+    users = np.searchsorted(cdf, rng.random(len(seat_room)) * cdf[-1]) + first_user
+    while True:
+        order = np.lexsort((users, seat_room))
+        same = (seat_room[order][1:] == seat_room[order][:-1]) & (users[order][1:] == users[order][:-1])
+        repeated = order[1:][same]
+        if not len(repeated):
+            return users
+        users[repeated] = np.searchsorted(cdf, rng.random(len(repeated)) * cdf[-1]) + first_user
+
+
+def deal(rng, role_sets: np.ndarray, counts: np.ndarray) -> list[np.ndarray]:
+    """Роли мест по таблицам utils.role_table, перемешанные в каждой комнате"""
+    roles = [None] * len(counts)
+    for role_set in np.unique(role_sets):
+        for n in np.unique(counts[role_sets == role_set]):
+            rooms = np.flatnonzero((role_sets == role_set) & (counts == n))
+            deck = np.array(role_table(int(n), str(role_set)))
+            for room, dealt in zip(rooms.tolist(), rng.permuted(np.broadcast_to(deck, (len(rooms), n)), axis=1)):
+                roles[room] = dealt
+    return roles
+
+
+def load_rooms(loader: Loader, rng, first_id: int, total: int, start: int, now: int,
+               first_user: int, games: np.ndarray):
+    cdf = np.cumsum(games + 1, dtype=np.float64)
+    created_all = room_times(rng, total, start, now)
+    # Последние ACTIVE_SHARE комнат ещё идут или ждут игроков: созданы за последние два часа
+    active_from = int(total * (1 - ACTIVE_SHARE))
+    created_all[active_from:] = np.sort(now - rng.integers(60, 7200, total - active_from))
+
+    for offset in range(0, total, ROOM_CHUNK):
+        count = min(ROOM_CHUNK, total - offset)
+        ids = np.arange(first_id + offset, first_id + offset + count)
+        created = created_all[offset:offset + count]
+        active = np.arange(offset, offset + count) >= active_from
+        waiting = active & (rng.random(count) < 0.4)
+        started = ~waiting
+        finished = ~active
+
+        max_players = rng.choice(MAX_PLAYERS, size=count, p=MAX_PLAYERS_SHARE)
+        counts = np.where(started, np.clip(rng.binomial(max_players, 0.85), 4, max_players),
+                          rng.integers(1, max_players))
+        rounds = np.where(started, np.clip(1 + rng.poisson(np.where(finished, 2.5, 1.5)), 1, MAX_ROUNDS), 0)
+        role_sets = np.where(rng.random(count) < EXTENDED_SHARE, 'extended', 'classic')
+        started_at = created + rng.exponential(180, count).astype(np.int64) + 30
+        ended_at = started_at + rounds * ROUND_SECONDS + rng.integers(0, ROUND_SECONDS, count)
+        phases = np.where(finished, 'finished', np.where(waiting, 'lobby', rng.choice(list(PHASE_SECONDS), count)))
+
+        seat_room = np.repeat(np.arange(count), counts)
+        seat = cumcount(counts)
+        seat_start = np.cumsum(counts) - counts
+        seat_user = pick_users(rng, cdf, first_user, seat_room)
+        seat_role = np.full(len(seat_room), NULL, dtype=object)
+        in_game = np.flatnonzero(started)
+        for room, dealt in zip(in_game.tolist(), deal(rng, role_sets[in_game], counts[in_game])):
+            seat_role[seat_start[room]:seat_start[room] + counts[room]] = dealt
+        alive_share = np.where(finished, 0.45, np.where(waiting, 1.0, 0.75))
+        seat_alive = rng.random(len(seat_room)) < alive_share[seat_room]
+
+        loader.copy('rooms', [
+            text(ids), [f'Комната {i}' for i in ids.tolist()], text(seat_user[seat_start]), text(max_players),
+            np.where(finished, 'finished', np.where(waiting, 'waiting', 'playing')).tolist(), phases.tolist(),
+            nullable(stamps(np.full(count, now) + rng.integers(5, 60, count)), active & started),
+            text(rounds), text(counts), role_sets.tolist(),
+            nullable(text(rng.integers(0, 2 ** 63 - 1, count, dtype=np.int64)), started),
+            text(1 + counts + 3 * rounds), stamps(created),
+            nullable(stamps(started_at), started), nullable(stamps(ended_at), finished),
+        ])
+        loader.copy('room_players', [
+            text(ids[seat_room]), text(seat_user), seat_role.tolist(),
+            np.where(seat_alive, 't', 'f').tolist(),
+            stamps(created[seat_room] + 20 * seat + rng.integers(0, 20, len(seat))), text(1 + seat),
+        ])
+        load_actions(loader, rng, ids, started, counts, rounds, started_at, seat_room, seat_start, seat_user,
+                     seat_role)
+
+
+def load_actions(loader: Loader, rng, ids, started, counts, rounds, started_at, seat_room, seat_start,
+                 seat_user, seat_role):
+    """
+    Действия идущих и завершённых игр по кругам: ночные действия ролей из engine.NIGHT_ACTIONS
+    с исходами (killed, reveal_*), затем голоса - по одному от каждого из первых живых мест.
+    """
+    rounds = np.where(started, rounds, 0)
+    night_type = np.array([NIGHT_ACTIONS.get(role, '') for role in seat_role.tolist()], dtype=object)
+    acting = np.flatnonzero(night_type != '')
+    act_seat = np.repeat(acting, rounds[seat_room[acting]])
+    act_round = 1 + cumcount(rounds[seat_room[acting]])
+    act_room = seat_room[act_seat]
+    act_target = seat_start[act_room] + (rng.integers(0, 1 << 30, len(act_seat)) % counts[act_room])
+    act_type = night_type[act_seat]
+
+    kill = (act_type == 'kill') & (rng.random(len(act_seat)) < 0.6)
+    check = act_type == 'check'
+    outcome_seat = np.concatenate([act_seat[kill], act_seat[check]])
+    outcome_target = np.concatenate([act_target[kill], act_target[check]])
+    outcome_type = np.concatenate([np.full(kill.sum(), 'killed', dtype=object),
+                                   np.where(seat_role[act_target[check]] == 'mafia', 'reveal_mafia',
+                                            'reveal_innocent').astype(object)])
+    outcome_round = np.concatenate([act_round[kill], act_round[check]])
+
+    pair_room = np.repeat(np.arange(len(ids)), rounds)
+    pair_round = 1 + cumcount(rounds)
+    voters = np.clip(counts[pair_room] - 2 * (pair_round - 1), 2, counts[pair_room])
+    vote_room = np.repeat(pair_room, voters)
+    vote_round = np.repeat(pair_round, voters)
+    vote_seat = seat_start[vote_room] + cumcount(voters)
+    vote_target = seat_start[vote_room] + (rng.integers(0, 1 << 30, len(vote_room)) % counts[vote_room])
+
+    actor = np.concatenate([act_seat, outcome_seat, vote_seat])
+    target = np.concatenate([act_target, outcome_target, vote_target])
+    round_number = np.concatenate([act_round, outcome_round, vote_round])
+    room = seat_room[actor]
+    phase = np.concatenate([np.full(len(act_seat) + len(outcome_seat), 'night', dtype=object),
+                            np.full(len(vote_seat), 'voting', dtype=object)])
+    offset = np.where(phase == 'night', 0, PHASE_SECONDS['night'] + PHASE_SECONDS['day'])
+    created = started_at[room] + (round_number - 1) * ROUND_SECONDS + offset + rng.integers(0, 60, len(actor))
+    loader.copy('game_actions', [
+        text(ids[room]), text(seat_user[actor]), text(seat_user[target]),
+        np.concatenate([act_type, outcome_type, np.full(len(vote_seat), 'vote', dtype=object)]).tolist(),
+        phase.tolist(), text(round_number), stamps(created),
+    ])
+
+
+def seed(conn, scale: float, seed_value: int, days: int, keep_constraints: bool = False) -> Loader:
+    rng = np.random.default_rng(seed_value)
+    loader = Loader(conn)
+    now = int(time.time())
+    start = now - days * 86400
+
+    with conn.cursor() as cur:
+        cur.execute("SET synchronous_commit = off")
+        cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users")
+        first_user = cur.fetchone()[0]
+        cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM rooms")
+        first_room = cur.fetchone()[0]
+        cur.execute("SELECT id, requirement_type, requirement_value FROM achievements "
+                    "WHERE requirement_type = ANY(%s) ORDER BY id", (list(PROGRESS),))
+        achievements = cur.fetchall()
+    conn.commit()
+
+    deferred = [] if keep_constraints else defer_constraints(conn)
+    try:
+        # без повторов внутри комнаты пользователей должно хватать на самую большую комнату
+        users = max(int(MAX_PLAYERS.max()), int(USERS_PER_SCALE * scale))
+        games = load_users(loader, rng, first_user, users, start, now, achievements)
+        load_rooms(loader, rng, first_room, max(1, int(ROOMS_PER_SCALE * scale)), start, now, first_user, games)
+    finally:
+        conn.rollback()
+        started = time.perf_counter()
+        restore_constraints(conn, deferred)
+        loader.seconds['constraints'] = time.perf_counter() - started
+
+    with conn.cursor() as cur:
+        for table in ('users', 'rooms'):
+            cur.execute(sql.SQL("SELECT setval(pg_get_serial_sequence({}, 'id'), (SELECT MAX(id) FROM {}))").format(
+                sql.Literal(table), sql.Identifier(table)))
+    conn.commit()
+
+    # Карта видимости как после autovacuum: без неё планировщик не выбирает index-only scan
+    started = time.perf_counter()
+    conn.autocommit = True
+    for table in TABLES:
+        conn.execute(sql.SQL('VACUUM (ANALYZE) {}').format(sql.Identifier(table)))
+    conn.autocommit = False
+    loader.seconds['vacuum'] = time.perf_counter() - started
+    return loader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0, help='1 - миллион пользователей и 100 тыс. комнат')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--days', type=int, default=180, help='период регистраций и комнат')
+    parser.add_argument('--migrate', action='store_true', help='сначала создать схему миграциями db_migrations')
+    parser.add_argument('--keep-constraints', action='store_true',
+                        help='не снимать внешние ключи и индексы на время загрузки (медленнее)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with psycopg.connect(os.environ['DATABASE_URL']) as conn:
+        if args.migrate:
+            migrate(conn)
+        loader = seed(conn, args.scale, args.seed, args.days, args.keep_constraints)
+
+    total = sum(loader.rows.values())
+    for table, rows in loader.rows.items():
+        seconds = loader.seconds[table]
+        print(f'{table:<18}{rows:>11,} rows {seconds:8.1f} s {rows / max(seconds, 1e-9):>10,.0f} rows/s')
+    for step in ('constraints', 'vacuum'):
+        print(f"{step:<29}{loader.seconds[step]:8.1f} s")
+    elapsed = time.perf_counter() - started
+    print(f"{'total':<18}{total:>11,} rows {elapsed:8.1f} s {total / elapsed:>10,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Нагрузочная проверка вместимости room/join и room/add-bot при конкурентных запросах.
+
+Сотни одновременных вступлений и добавлений ботов в одну комнату через handler
+в процессе; после прогона проверяется, что игроков не больше лимита и что
+rooms.player_count совпадает с фактическим числом записей room_players.
+    DATABASE_URL=postgresql://postgres@localhost/mafia python tools/stress_join_room.py --joins 400 --bots 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+
+import db  # noqa: E402
+import index  # noqa: E402
+
+
+def call(method: str, path: str, body: dict) -> dict:
+    return index.handler({
+        'httpMethod': method,
+        'queryStringParameters': {'path': path},
+        'body': json.dumps(body)
+    }, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--joins', type=int, default=400, help='число вступлений живых игроков')
+    parser.add_argument('--bots', type=int, default=100, help='число запросов room/add-bot')
+    parser.add_argument('--max-players', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=64, help='одновременных запросов (не больше max_connections)')
+    args = parser.parse_args()
+
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO users (username) SELECT 'stress-' || g FROM generate_series(1, %s) g RETURNING id",
+        (args.joins + 1,)
+    )
+    user_ids = [row['id'] for row in cur.fetchall()]
+    conn.commit()
+    cur.close()
+    db.release_db(conn)
+
+    host_id, joiners = user_ids[0], user_ids[1:]
+    room = json.loads(call('POST', 'room/create', {
+        'name': 'stress', 'host_user_id': host_id, 'max_players': args.max_players
+    })['body'])
+
+    requests = [('POST', 'room/join', {'room_id': room['id'], 'user_id': u}) for u in joiners]
+    requests += [('POST', 'room/add-bot', {'room_id': room['id']}) for _ in range(args.bots)]
+    requests += [('POST', 'room/join', {'room_id': room['id'], 'user_id': u}) for u in joiners[:args.bots]]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        responses = list(pool.map(lambda r: call(*r), requests))
+    elapsed = time.perf_counter() - started
+
+    outcomes = Counter()
+    for (_, path, _), response in zip(requests, responses):
+        body = json.loads(response['body'])
+        outcomes[(path, response['statusCode'], body.get('error') or body.get('joined', 'ok'))] += 1
+
+    conn = db.get_db()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT r.player_count, COUNT(rp.id) AS actual, COUNT(rp.id) FILTER (WHERE NOT rp.is_bot) AS humans
+        FROM rooms r
+        LEFT JOIN room_players rp ON rp.room_id = r.id
+        WHERE r.id = %s
+        GROUP BY r.id
+    """, (room['id'],))
+    state = cur.fetchone()
+    cur.close()
+    db.release_db(conn)
+
+    for outcome, count in sorted(outcomes.items(), key=str):
+        print(f'{count:6}  {outcome}')
+    print(f"{len(requests)} requests in {elapsed:.2f}s ({len(requests) / elapsed:.0f} req/s)")
+    print(f"player_count={state['player_count']} actual={state['actual']} humans={state['humans']}")
+
+    failures = []
+    if state['player_count'] != state['actual']:
+        failures.append('player_count counter drifted from room_players')
+    if state['humans'] > min(args.max_players, index.MAX_PLAYERS):
+        failures.append('joins overshot max_players')
+    if state['actual'] > index.MAX_PLAYERS:
+        failures.append(f'room exceeded the hard cap of {index.MAX_PLAYERS}')
+    if any(status >= 500 for (_, status, _) in outcomes):
+        failures.append('server errors under contention')
+    if failures:
+        sys.exit('FAIL: ' + '; '.join(failures))
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()